@@ -0,0 +1,125 @@
+"""Seeded generator of synthetic `My Clippings.txt` files for benchmarks.
+
+Usage:
+    python -m benchmarks.corpus <clippings_count> <output_file> [--seed SEED]
+"""
+
+import argparse
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+
+SEPARATOR = "=========="
+BOM = "\ufeff"
+
+TITLES = [
+    "Mały Książę",
+    "Dziennik",
+    "Rozmyślania",
+    "Deep Work",
+    "Les Misérables",
+    "Война и мир",
+    "Der Prozess",
+    "Cien años de soledad",
+    "Dune (Dune Chronicles, Book 1)",
+    "ノルウェイの森",
+]
+AUTHORS = [
+    "Antoine de Saint-Exupery",
+    "Anne Frank",
+    "Marek Aureliusz",
+    "Cal Newport",
+    "Victor Hugo",
+    "Лев Толстой",
+    "Franz Kafka",
+    "Gabriel García Márquez",
+    "Frank Herbert",
+    "村上 春樹",
+]
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+    "zażółć gęślą jaźń cœur naïve façade über straße mañana ünïcödé"
+).split()
+TYPES = ["Highlight"] * 6 + ["Note"] * 3 + ["Bookmark"]
+
+
+def _content(rng: random.Random, clipping_type: str) -> str:
+    """Return random content of clipping, occasionally a very long one."""
+    if clipping_type == "Bookmark":
+        return ""
+    words = rng.randint(200, 1000) if rng.random() < 0.02 else rng.randint(3, 60)
+    return " ".join(rng.choices(WORDS, k=words))
+
+
+def _record(rng: random.Random, book: int, timestamp: datetime) -> str:
+    """Return single clipping, in one of four shapes recognised by the parser."""
+    clipping_type = rng.choice(TYPES)
+    title = f"{TITLES[book % len(TITLES)]} {book // len(TITLES)}"
+    author = AUTHORS[book % len(AUTHORS)]
+    start = rng.randint(1, 20_000)
+    location = f"{start}-{start + rng.randint(0, 5)}"
+    if clipping_type == "Note" or rng.random() < 0.2:
+        location = str(start)
+    page = rng.randint(1, 900)
+    shape = rng.randrange(4)
+    if shape == 0:
+        header = f"{title} ({author})\n- Your {clipping_type} at location {location}"
+    elif shape == 1:
+        header = (
+            f"{title} ({author})\n"
+            f"- Your {clipping_type} on page {page} | location {location}"
+        )
+    elif shape == 2:
+        header = f"{title}  \n- Your {clipping_type} on page {page}"
+    else:
+        header = f"{title}  \n- Your {clipping_type} on page {page}-{page}"
+    bom = BOM if rng.random() < 0.3 else ""
+    added_on = f"{timestamp:%A}, {timestamp.day} {timestamp:%B %Y %H:%M:%S}"
+    content = _content(rng, clipping_type)
+    return f"{bom}{header} | Added on {added_on}\n\n{content}\n{SEPARATOR}\n"
+
+
+def generate_corpus(
+    clippings_count: int, output_file: Path, seed: int = 0, newline: str = "\r\n"
+) -> None:
+    """Write synthetic clippings file with given number of clippings.
+
+    Clippings are grouped in reading sessions of a single book, as on a real
+    device. The same seed always produces the same file.
+
+    Parameters
+    ----------
+    clippings_count : int
+        number of clippings in the file
+    output_file : Path
+        path of the created file
+    seed : int, optional
+        seed of random generator, by default 0
+    newline : str, optional
+        line ending used in the file, by default as on Kindle devices
+    """
+    rng = random.Random(seed)
+    books = max(1, clippings_count // 200)
+    timestamp = datetime(2015, 1, 1)
+    with open(output_file, "w", encoding="utf-8", newline=newline) as file:
+        file.write(BOM)
+        written = 0
+        while written < clippings_count:
+            book = rng.randrange(books)
+            for _ in range(min(rng.randint(1, 30), clippings_count - written)):
+                timestamp += timedelta(seconds=rng.randint(5, 3600))
+                file.write(_record(rng, book, timestamp))
+                written += 1
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("clippings_count", type=int)
+    parser.add_argument("output_file", type=Path)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    generate_corpus(args.clippings_count, args.output_file, args.seed)
+
+
+if __name__ == "__main__":
+    main()
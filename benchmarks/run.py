@@ -0,0 +1,199 @@
+"""Benchmarks of kindleparse pipeline stages on synthetic clippings files.
+
+Each stage (`parse_my_clippings`, `sort_clippings`, `dump_book_to_markdown`) is
+timed and its peak memory is measured with `tracemalloc` in a separate run, so
+tracing does not distort the timings. Results are written as JSON and can be
+compared with results of another commit.
+
+Usage:
+    python -m benchmarks.run [--sizes 1000 100000 1000000] [--output FILE]
+    python -m benchmarks.run --compare BASELINE_FILE [--output FILE]
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+import kindle_parser  # noqa: E402
+
+from benchmarks.corpus import generate_corpus  # noqa: E402
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+DEFAULT_OUTPUT = Path("benchmark-results.json")
+REGRESSION_THRESHOLD = 0.10
+
+
+def _stages(corpus: Path, output_dir: Path) -> list[tuple[str, Callable]]:
+    """Return pipeline stages, each taking the result of the previous one."""
+    return [
+        (
+            "parse_my_clippings",
+            lambda _: list(kindle_parser.parse_my_clippings(corpus)),
+        ),
+        ("sort_clippings", kindle_parser.sort_clippings),
+        (
+            "dump_book_to_markdown",
+            lambda mapping: kindle_parser.dump_book_to_markdown(mapping, output_dir),
+        ),
+    ]
+
+
+def _run_pipeline(corpus: Path, measure_memory: bool) -> dict[str, float]:
+    """Run all stages once, returning time or peak memory of each of them."""
+    results = {}
+    with tempfile.TemporaryDirectory() as output_dir:
+        value = None
+        for name, stage in _stages(corpus, Path(output_dir)):
+            if measure_memory:
+                tracemalloc.start()
+                value = stage(value)
+                results[name] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            else:
+                start = time.perf_counter()
+                value = stage(value)
+                results[name] = time.perf_counter() - start
+    return results
+
+
+def run_benchmarks(
+    sizes: list[int], repeat: int = 3, measure_memory: bool = True, seed: int = 0
+) -> dict:
+    """Benchmark pipeline on generated corpora of given sizes.
+
+    Parameters
+    ----------
+    sizes : list[int]
+        numbers of clippings in generated corpora
+    repeat : int, optional
+        number of timed runs, the fastest one is reported, by default 3
+    measure_memory : bool, optional
+        whether to measure peak memory of stages, by default True
+    seed : int, optional
+        seed of corpus generator, by default 0
+
+    Returns
+    -------
+    dict
+        machine-readable results
+    """
+    results = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "seed": seed,
+        "corpora": {},
+    }
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        for size in sizes:
+            corpus = Path(corpus_dir) / f"My Clippings {size}.txt"
+            generate_corpus(size, corpus, seed)
+            timings = [_run_pipeline(corpus, False) for _ in range(repeat)]
+            memory = _run_pipeline(corpus, True) if measure_memory else {}
+            stages = {}
+            for name in timings[0]:
+                seconds = min(timing[name] for timing in timings)
+                stages[name] = {
+                    "seconds": seconds,
+                    "clippings_per_second": size / seconds if seconds else None,
+                    "peak_memory_bytes": memory.get(name),
+                }
+            results["corpora"][str(size)] = {
+                "file_bytes": corpus.stat().st_size,
+                "stages": stages,
+            }
+            print(_format_corpus(size, stages), flush=True)
+    return results
+
+
+def compare_results(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """Return descriptions of stages which got slower or use more memory.
+
+    Parameters
+    ----------
+    baseline : dict
+        results of the reference commit
+    current : dict
+        results of the current commit
+    threshold : float
+        relative change treated as regression, e.g. 0.1 for 10%
+
+    Returns
+    -------
+    list[str]
+        descriptions of regressions, empty when there are none
+    """
+    regressions = []
+    for size, corpus in current["corpora"].items():
+        baseline_corpus = baseline["corpora"].get(size)
+        if baseline_corpus is None:
+            continue
+        for name, stage in corpus["stages"].items():
+            baseline_stage = baseline_corpus["stages"].get(name, {})
+            for metric in ["seconds", "peak_memory_bytes"]:
+                old, new = baseline_stage.get(metric), stage.get(metric)
+                if old and new and (new - old) / old > threshold:
+                    regressions.append(
+                        f"{name} ({size} clippings): {metric} {old:.4g} -> {new:.4g} "
+                        f"(+{(new - old) / old:.0%})"
+                    )
+    return regressions
+
+
+def _format_corpus(size: int, stages: dict) -> str:
+    lines = [f"{size} clippings:"]
+    for name, stage in stages.items():
+        memory = stage["peak_memory_bytes"]
+        lines.append(
+            f"  {name:<24} {stage['seconds']:>9.3f} s"
+            + (f" {memory / 2**20:>9.1f} MiB" if memory is not None else "")
+        )
+    return "\n".join(lines)
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--compare", type=Path, help="results of another commit")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.repeat, not args.no_memory, args.seed)
+    args.output.write_text(json.dumps(results, indent=2))
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        if regressions := compare_results(baseline, results, args.threshold):
+            raise SystemExit("Regressions found:\n" + "\n".join(regressions))
+        print(f"No regressions compared to {baseline.get('commit')}")
+
+
+if __name__ == "__main__":
+    main()
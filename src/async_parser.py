@@ -0,0 +1,203 @@
+"""Module with asyncio API for parsing clippings and writing markdown files."""
+
+from clipping import Book, Clipping
+import filters
+import kindle_parser
+import manifest
+import stats
+import templates
+
+import asyncio
+from collections.abc import AsyncIterable, Mapping
+from pathlib import Path
+from typing import AsyncGenerator
+
+
+async def read_chunks(
+    file_location: Path, chunk_size: int = kindle_parser.CHUNK_SIZE
+) -> AsyncGenerator[bytes, None]:
+    """Read file chunk by chunk without blocking the event loop.
+
+    Each read is a short call in the default executor of the loop, so no thread
+    is kept busy for the whole file and other tasks run between chunks.
+    Compressed files are decompressed, as in `kindle_parser.open_clippings`.
+
+    Parameters
+    ----------
+    file_location : Path
+        path to the file
+    chunk_size : int, optional
+        number of bytes read at once, by default CHUNK_SIZE
+
+    Yields
+    ------
+    AsyncGenerator[bytes, None]
+        asynchronous generator yielding chunks of the file
+    """
+    file = await asyncio.to_thread(kindle_parser.open_clippings, file_location)
+    try:
+        while chunk := await asyncio.to_thread(file.read, chunk_size):
+            yield chunk
+    finally:
+        file.close()
+
+
+async def parse_clippings(
+    chunks: AsyncIterable[bytes],
+    normalization: str | None = kindle_parser.NORMALIZATION,
+    clipping_filter: filters.ClippingFilter | None = None,
+) -> AsyncGenerator[Clipping, None]:
+    """Parse clippings from a stream of chunks, e.g. body of uploaded file.
+
+    Only the currently incomplete clipping is kept in the buffer, and clippings
+    completed by each chunk are yielded before the next chunk is awaited, so the
+    whole file is never kept in memory.
+
+    Parameters
+    ----------
+    chunks : AsyncIterable[bytes]
+        chunks of Kindle file with clippings, of any size
+    normalization : str | None, optional
+        Unicode normalization form, by default NORMALIZATION
+    clipping_filter : filters.ClippingFilter | None, optional
+        criteria of parsed clippings, by default all clippings are parsed
+
+    Yields
+    ------
+    AsyncGenerator[Clipping, None]
+        asynchronous generator yielding parsed Clippings
+    """
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *raw_clippings, buffer = buffer.split(kindle_parser.CLIPPING_SEPARATOR)
+        for clipping in kindle_parser._parse_raw_clippings(
+            raw_clippings, normalization, clipping_filter
+        ):
+            yield clipping
+    for clipping in kindle_parser._parse_raw_clippings(
+        [buffer], normalization, clipping_filter
+    ):
+        yield clipping
+
+
+async def parse_my_clippings(
+    file_location: Path,
+    chunk_size: int = kindle_parser.CHUNK_SIZE,
+    normalization: str | None = kindle_parser.NORMALIZATION,
+    clipping_filter: filters.ClippingFilter | None = None,
+) -> AsyncGenerator[Clipping, None]:
+    """Read file with clippings and yield them, like `kindle_parser.parse_my_clippings`.
+
+    Parameters
+    ----------
+    file_location : Path
+        path to Kindle file with clippings
+    chunk_size : int, optional
+        number of bytes read from file at once, by default CHUNK_SIZE
+    normalization : str | None, optional
+        Unicode normalization form, by default NORMALIZATION
+    clipping_filter : filters.ClippingFilter | None, optional
+        criteria of parsed clippings, by default all clippings are parsed
+
+    Yields
+    ------
+    AsyncGenerator[Clipping, None]
+        asynchronous generator yielding parsed Clippings
+    """
+    async for clipping in parse_clippings(
+        read_chunks(file_location, chunk_size), normalization, clipping_filter
+    ):
+        yield clipping
+
+
+async def dump_book_to_markdown(
+    mapping: Mapping[Book, list[Clipping]],
+    target_location: Path,
+    concurrency: int = kindle_parser.WRITERS,
+    template: templates.Template | None = None,
+) -> kindle_parser.DumpSummary:
+    """Write markdown file of each book, like `kindle_parser.dump_book_to_markdown`.
+
+    Books are rendered in turn in the event loop, and at most `concurrency`
+    rendered books wait to be written. Files are written atomically in the
+    default executor, and unchanged files are skipped with the same manifest,
+    so both functions may be used on the same directory.
+
+    Parameters
+    ----------
+    mapping : Mapping[Book, list[Clipping]]
+        mapping books and clippings
+    target_location : Path
+        target directory in which new files should be created
+    concurrency : int, optional
+        maximal number of files written at once, by default WRITERS
+    template : templates.Template | None, optional
+        template of markdown files, by default the default template
+
+    Returns
+    -------
+    kindle_parser.DumpSummary
+        numbers of written and skipped files
+
+    Raises
+    ------
+    FileNotFoundError
+        when target directory does not exist
+    """
+    if not await asyncio.to_thread(target_location.is_dir):
+        raise FileNotFoundError(f"{target_location} is not a directory!")
+
+    render = (
+        kindle_parser.render_book
+        if template is None
+        else templates.compile_template(template)
+    )
+    manifest_file = target_location / manifest.MANIFEST_FILENAME
+    hashes = await asyncio.to_thread(manifest.load_manifest, manifest_file)
+    summary = kindle_parser.DumpSummary()
+    slots = asyncio.Semaphore(concurrency)
+    tasks: set[asyncio.Task] = set()
+
+    async def write(filename: str, content: str, content_hash: str) -> None:
+        try:
+            await asyncio.to_thread(
+                kindle_parser._write_atomically, target_location / filename, content
+            )
+        finally:
+            slots.release()
+        hashes[filename] = content_hash
+        summary.written += 1
+
+    try:
+        with stats.timer("dump_book_to_markdown"):
+            for book, clippings in mapping.items():
+                filename = f"{str(book)}.md"
+                content = render(book, clippings)
+                content_hash = manifest.content_hash(content)
+                if hashes.get(filename) == content_hash and await asyncio.to_thread(
+                    (target_location / filename).exists
+                ):
+                    summary.skipped += 1
+                    continue
+
+                await slots.acquire()
+                # Finished writes are dropped, raising the first error early
+                for task in [task for task in tasks if task.done()]:
+                    tasks.discard(task)
+                    task.result()
+                tasks.add(asyncio.create_task(write(filename, content, content_hash)))
+                # Let other tasks of the loop run between rendered books
+                await asyncio.sleep(0)
+            if tasks:
+                await asyncio.gather(*tasks)
+    finally:
+        if tasks:
+            # Writes still running after an error are awaited, so files written
+            # meanwhile are recorded in the manifest
+            await asyncio.gather(*tasks, return_exceptions=True)
+        if summary.written:
+            await asyncio.to_thread(manifest.save_manifest, hashes, manifest_file)
+        stats.count("books written", summary.written)
+        stats.count("books unchanged", summary.skipped)
+    return summary
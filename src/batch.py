@@ -0,0 +1,284 @@
+"""Module with batch processing of many clippings files in a process pool."""
+
+import formats
+import kindle_parser
+import templates
+
+import os
+import traceback
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from pathlib import Path
+from time import perf_counter
+
+PATTERN = "My Clippings.txt"
+# Threads writing files in each worker; files of single user are few
+BATCH_WRITERS = 2
+
+
+@dataclass(frozen=True)
+class BatchJob:
+    """Single clippings file and directory (or zip archive) for its markdown files."""
+
+    input_file: Path
+    output_dir: Path
+
+
+@dataclass
+class JobResult:
+    """Outcome of processing single file, with error message when it failed."""
+
+    job: BatchJob
+    clippings: int = 0
+    bytes_read: int = 0
+    written: int = 0
+    skipped: int = 0
+    seconds: float = 0.0
+    error: str | None = None
+
+
+@dataclass
+class BatchSummary:
+    """Results of all files of the batch and aggregate throughput."""
+
+    results: list[JobResult] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def failed(self) -> list[JobResult]:
+        return [result for result in self.results if result.error is not None]
+
+    def format(self) -> str:
+        """Return human-readable summary of the batch.
+
+        Returns
+        -------
+        str
+            numbers of files, clippings and bytes, with their rates per second
+        """
+        succeeded = [result for result in self.results if result.error is None]
+        clippings = sum(result.clippings for result in succeeded)
+        megabytes = sum(result.bytes_read for result in succeeded) / 1024 / 1024
+        seconds = self.seconds or float("inf")
+        return "\n".join(
+            [
+                f"Files: {len(self.results)}, succeeded: {len(succeeded)}, "
+                f"failed: {len(self.failed)}",
+                f"Written files: {sum(result.written for result in succeeded)}, "
+                f"unchanged files: {sum(result.skipped for result in succeeded)}",
+                f"Time: {self.seconds:.2f} s, "
+                f"{len(self.results) / seconds:.1f} files/s, "
+                f"{clippings / seconds:.0f} clippings/s, "
+                f"{megabytes / seconds:.2f} MiB/s",
+            ]
+        )
+
+
+def find_jobs(
+    input_dir: Path, output_dir: Path, pattern: str = PATTERN
+) -> list[BatchJob]:
+    """Find clippings files in directory tree, mirroring the tree in output.
+
+    For example `users/alice/My Clippings.txt` is written to `output/alice`.
+
+    Parameters
+    ----------
+    input_dir : Path
+        root of directory tree with clippings files
+    output_dir : Path
+        root of directory tree for markdown files
+    pattern : str, optional
+        glob pattern of names of clippings files, by default PATTERN
+
+    Returns
+    -------
+    list[BatchJob]
+        jobs sorted by path of input file
+    """
+    return [
+        BatchJob(input_file, output_dir / input_file.parent.relative_to(input_dir))
+        for input_file in sorted(input_dir.rglob(pattern))
+        if input_file.is_file()
+    ]
+
+
+def load_jobs(manifest_file: Path) -> list[BatchJob]:
+    """Load jobs from manifest file.
+
+    Each non-empty line contains path of clippings file and path of output
+    directory, separated with a tab. Relative paths are resolved against
+    directory of the manifest.
+
+    Parameters
+    ----------
+    manifest_file : Path
+        path to manifest file
+
+    Returns
+    -------
+    list[BatchJob]
+        jobs in order of the manifest
+
+    Raises
+    ------
+    ValueError
+        when a line does not contain two paths
+    """
+    jobs = []
+    with open(manifest_file, encoding="utf-8") as file:
+        for number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            paths = line.rstrip("\r\n").split("\t")
+            if len(paths) != 2 or not all(paths):
+                raise ValueError(
+                    f"Line {number} of {manifest_file} has to contain input file "
+                    "and output directory separated with a tab"
+                )
+            input_file, output_dir = (manifest_file.parent / path for path in paths)
+            jobs.append(BatchJob(input_file, output_dir))
+    return jobs
+
+
+def _initialize_worker(format_files: list[Path]) -> None:
+    """Register reader formats in worker process.
+
+    Parameters
+    ----------
+    format_files : list[Path]
+        JSON files with reader formats
+    """
+    for format_file in format_files:
+        formats.load_format(format_file)
+
+
+def _error_message(error: BaseException) -> str:
+    """Return exception with its type as a single line of the report."""
+    # Messages of parsing errors contain whole clipping, so they are joined
+    # into single line
+    return " ".join("".join(traceback.format_exception_only(error)).split())
+
+
+def process_job(
+    job: BatchJob,
+    order: str = "location",
+    template: templates.Template | None = None,
+    normalization: str | None = kindle_parser.NORMALIZATION,
+) -> JobResult:
+    """Parse single clippings file and write its books, catching any error.
+
+    Parameters
+    ----------
+    job : BatchJob
+        clippings file and output directory
+    order : str, optional
+        order of clippings in each book, by default `location`
+    template : templates.Template | None, optional
+        template of markdown files, by default the default template
+    normalization : str | None, optional
+        Unicode normalization form, by default NORMALIZATION
+
+    Returns
+    -------
+    JobResult
+        numbers of processed clippings and files, or error of the file
+    """
+    result = JobResult(job)
+    start = perf_counter()
+    try:
+        clippings = list(
+            kindle_parser.parse_my_clippings(
+                job.input_file, normalization=normalization
+            )
+        )
+        result.clippings = len(clippings)
+        result.bytes_read = os.path.getsize(job.input_file)
+        if job.output_dir.suffix.lower() == ".zip":
+            job.output_dir.parent.mkdir(parents=True, exist_ok=True)
+        else:
+            job.output_dir.mkdir(parents=True, exist_ok=True)
+        mapping = kindle_parser.order_clippings(
+            kindle_parser.sort_clippings(clippings), order
+        )
+        summary = kindle_parser.dump_book_to_markdown(
+            mapping, job.output_dir, BATCH_WRITERS, template
+        )
+        result.written, result.skipped = summary.written, summary.skipped
+    except Exception as error:
+        result.error = _error_message(error)
+    result.seconds = perf_counter() - start
+    return result
+
+
+def _process_jobs(
+    jobs: list[BatchJob],
+    order: str,
+    template: templates.Template | None,
+    normalization: str | None,
+) -> list[JobResult]:
+    """Process jobs one by one, used as a task of worker process."""
+    return [process_job(job, order, template, normalization) for job in jobs]
+
+
+def run_batch(
+    jobs: Iterable[BatchJob],
+    workers: int = 1,
+    order: str = "location",
+    template: templates.Template | None = None,
+    normalization: str | None = kindle_parser.NORMALIZATION,
+    format_files: Iterable[Path] = (),
+) -> Iterator[JobResult]:
+    """Process clippings files in a pool of worker processes.
+
+    Each worker imports the parser once and processes many files, and failure
+    of one file (e.g. `ValueError` of unknown format of clipping) is reported
+    in its result without stopping other files. When a worker dies (e.g.
+    killed for running out of memory), jobs of groups that were not finished
+    are reported as failed. Jobs are sent to workers in small groups, to limit
+    communication with them.
+
+    Parameters
+    ----------
+    jobs : Iterable[BatchJob]
+        clippings files and their output directories
+    workers : int, optional
+        number of worker processes, by default 1 (no pool is created then)
+    order : str, optional
+        order of clippings in each book, by default `location`
+    template : templates.Template | None, optional
+        template of markdown files, by default the default template
+    normalization : str | None, optional
+        Unicode normalization form, by default NORMALIZATION
+    format_files : Iterable[Path], optional
+        JSON files with reader formats, registered in each worker
+
+    Yields
+    ------
+    Iterator[JobResult]
+        results of jobs in their order
+    """
+    jobs = list(jobs)
+    if workers == 1 or len(jobs) <= 1:
+        for job in jobs:
+            yield process_job(job, order, template, normalization)
+        return
+
+    group_size = max(1, min(16, len(jobs) // (4 * workers)))
+    groups = [jobs[i : i + group_size] for i in range(0, len(jobs), group_size)]
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_initialize_worker,
+        initargs=(list(format_files),),
+    ) as executor:
+        futures = [
+            executor.submit(_process_jobs, group, order, template, normalization)
+            for group in groups
+        ]
+        for group, future in zip(groups, futures):
+            try:
+                yield from future.result()
+            except BrokenProcessPool as error:
+                for job in group:
+                    yield JobResult(job, error=_error_message(error))
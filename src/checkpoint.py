@@ -0,0 +1,225 @@
+"""Module with incremental parsing of append-only `My Clippings.txt` files."""
+
+from clipping import Book, Clipping
+import kindle_parser
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO
+
+CHECKPOINT_FILENAME = ".kindleparse-checkpoint.json"
+
+
+@dataclass
+class Checkpoint:
+    """State of already processed part of clippings file.
+
+    `offset` points right after the last separator that was processed and
+    `digest` is SHA-256 of all bytes before it. `ranges` keep byte ranges of
+    processed clippings for each book, so that books receiving new clippings
+    can be rendered again without parsing the whole file.
+    """
+
+    offset: int = 0
+    digest: str = hashlib.sha256().hexdigest()
+    ranges: dict[Book, list[tuple[int, int]]] = field(default_factory=dict)
+
+
+def load_checkpoint(checkpoint_file: Path) -> Checkpoint | None:
+    """Load checkpoint from JSON file.
+
+    Parameters
+    ----------
+    checkpoint_file : Path
+        path to checkpoint file
+
+    Returns
+    -------
+    Checkpoint | None
+        loaded checkpoint or None when file is missing or malformed
+    """
+    try:
+        with open(checkpoint_file, encoding="utf-8") as file:
+            data = json.load(file)
+        return Checkpoint(
+            offset=data["offset"],
+            digest=data["digest"],
+            ranges={
+                Book(author=book["author"], title=book["title"]): [
+                    (start, end) for start, end in book["ranges"]
+                ]
+                for book in data["books"]
+            },
+        )
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_checkpoint(checkpoint: Checkpoint, checkpoint_file: Path) -> None:
+    """Atomically save checkpoint to JSON file.
+
+    Parameters
+    ----------
+    checkpoint : Checkpoint
+        checkpoint to be saved
+    checkpoint_file : Path
+        path to checkpoint file
+    """
+    data = {
+        "offset": checkpoint.offset,
+        "digest": checkpoint.digest,
+        "books": [
+            {"author": book.author, "title": book.title, "ranges": ranges}
+            for book, ranges in checkpoint.ranges.items()
+        ],
+    }
+    temporary_file = checkpoint_file.with_name(checkpoint_file.name + ".tmp")
+    with open(temporary_file, "w", encoding="utf-8") as file:
+        json.dump(data, file)
+    os.replace(temporary_file, checkpoint_file)
+
+
+def _hash_prefix(file: BinaryIO, size: int) -> "hashlib._Hash":
+    """Hash first `size` bytes of the file, leaving file position right after them.
+
+    Parameters
+    ----------
+    file : BinaryIO
+        file opened in binary mode
+    size : int
+        number of bytes to hash
+
+    Returns
+    -------
+    hashlib._Hash
+        SHA-256 object which can be further updated
+    """
+    digest = hashlib.sha256()
+    file.seek(0)
+    while size > 0 and (chunk := file.read(min(size, kindle_parser.CHUNK_SIZE))):
+        digest.update(chunk)
+        size -= len(chunk)
+    return digest
+
+
+def _add_range(
+    ranges: dict[Book, list[tuple[int, int]]], book: Book, start: int, end: int
+) -> None:
+    """Add byte range to ranges of the book, merging it with adjacent range.
+
+    Parameters
+    ----------
+    ranges : dict[Book, list[tuple[int, int]]]
+        byte ranges for each book
+    book : Book
+        book of the clipping
+    start : int
+        offset of the clipping
+    end : int
+        offset right after separator following the clipping
+    """
+    book_ranges = ranges.setdefault(book, [])
+    if book_ranges and book_ranges[-1][1] == start:
+        book_ranges[-1] = (book_ranges[-1][0], end)
+    else:
+        book_ranges.append((start, end))
+
+
+def _read_ranges(
+    file: BinaryIO, ranges: list[tuple[int, int]], normalization: str | None
+) -> list[Clipping]:
+    """Parse clippings from given byte ranges of the file.
+
+    Parameters
+    ----------
+    file : BinaryIO
+        file opened in binary mode
+    ranges : list[tuple[int, int]]
+        byte ranges, each ending right after a separator
+    normalization : str | None
+        Unicode normalization form
+
+    Returns
+    -------
+    list[Clipping]
+        parsed Clippings
+    """
+    clippings = []
+    for start, end in ranges:
+        file.seek(start)
+        raw_clippings = file.read(end - start).split(kindle_parser.CLIPPING_SEPARATOR)
+        clippings.extend(
+            kindle_parser._parse_raw_clippings(raw_clippings, normalization)
+        )
+    return clippings
+
+
+def parse_my_clippings_incrementally(
+    file_location: Path,
+    checkpoint: Checkpoint | None,
+    normalization: str | None = kindle_parser.NORMALIZATION,
+) -> tuple[dict[Book, list[Clipping]], Checkpoint]:
+    """Parse only clippings appended to the file since the checkpoint.
+
+    Part of the file before checkpoint's offset is verified against its digest.
+    When it differs (e.g. file was truncated or edited on the device), whole
+    file is parsed again. Clippings after the last separator are parsed, but
+    not included in new checkpoint, as they may still be incomplete.
+
+    Parameters
+    ----------
+    file_location : Path
+        path to Kindle file with clippings
+    checkpoint : Checkpoint | None
+        checkpoint from previous run, None to parse whole file
+    normalization : str | None, optional
+        Unicode normalization form, which should be the same in all runs, by
+        default kindle_parser.NORMALIZATION
+
+    Returns
+    -------
+    tuple[dict[Book, list[Clipping]], Checkpoint]
+        mapping of books which received new clippings to all their clippings,
+        as returned by `sort_clippings`, and checkpoint to be used in next run
+    """
+    separator = kindle_parser.CLIPPING_SEPARATOR
+    with open(file_location, "rb") as file:
+        size = file.seek(0, os.SEEK_END)
+        if checkpoint is None or checkpoint.offset > size:
+            checkpoint = Checkpoint()
+        digest = _hash_prefix(file, checkpoint.offset)
+        if digest.hexdigest() != checkpoint.digest:
+            checkpoint = Checkpoint()
+            digest = _hash_prefix(file, 0)
+
+        ranges = {book: list(ranges) for book, ranges in checkpoint.ranges.items()}
+        offset = checkpoint.offset
+        new_clippings = []
+        raw_clippings = kindle_parser._iter_raw_clippings(file)
+        previous = next(raw_clippings)
+        for raw_clipping in raw_clippings:
+            # Clipping followed by separator is complete
+            end = offset + len(previous) + len(separator)
+            digest.update(previous + separator)
+            clipping = kindle_parser._parse_raw_clipping(previous, normalization)
+            if clipping is not None:
+                new_clippings.append(clipping)
+                _add_range(ranges, clipping.book, offset, end)
+            offset = end
+            previous = raw_clipping
+        clipping = kindle_parser._parse_raw_clipping(previous, normalization)
+        if clipping is not None:
+            new_clippings.append(clipping)
+
+        clippings = []
+        for book in dict.fromkeys(clipping.book for clipping in new_clippings):
+            clippings.extend(
+                _read_ranges(file, checkpoint.ranges.get(book, []), normalization)
+            )
+        clippings.extend(new_clippings)
+
+    new_checkpoint = Checkpoint(offset=offset, digest=digest.hexdigest(), ranges=ranges)
+    return kindle_parser.sort_clippings(clippings), new_checkpoint
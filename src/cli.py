@@ -1,19 +1,465 @@
 """Module with CLI interface basic functions."""
 
+import argparse
+import os
 import sys
+import batch
+import checkpoint
+import dedup
+import editions
+import filters
+import formats
 import kindle_parser
+import merge
+import parse_cache
+import partitions
+import server
+import stats
+import store
+import templates
+from contextlib import closing
+from datetime import date, datetime, time
+from itertools import chain
 from pathlib import Path
+from time import perf_counter
 
-DESCRIPTION = """kindleparse tool that parses clippings from Kindle's `My Clipping.txt` into manageable markdown files.
+DESCRIPTION = """kindleparse tool that parses clippings from Kindle's `My Clipping.txt` into manageable markdown files."""
 
-Usage: 
-    kindleparse <input_file> <output_dir>
-
-Example: 
+EPILOG = """Example:
     kindleparse "My Clippings.txt" some_directory
+    kindleparse paperwhite.txt oasis.txt some_directory
+
+Clippings collected with `--store` can be searched with:
+    kindleparse search clippings.db "query"
+
+Clippings can be served over local HTTP/JSON API with:
+    kindleparse serve "My Clippings.txt"
+
+Clippings files of many users can be processed in a process pool with:
+    kindleparse batch users_directory output_directory --workers 8
 """
 
 
+def _positive_int(value: str) -> int:
+    """Convert CLI argument to integer greater than zero.
+
+    Parameters
+    ----------
+    value : str
+        raw CLI argument
+
+    Returns
+    -------
+    int
+        converted value
+
+    Raises
+    ------
+    argparse.ArgumentTypeError
+        when value is not a positive integer
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer")
+    return number
+
+
+def _datetime(value: str, end_of_day: bool = False) -> datetime:
+    """Convert CLI argument in ISO format to datetime.
+
+    Parameters
+    ----------
+    value : str
+        raw CLI argument, e.g. `2021-02-03` or `2021-02-03T23:00`
+    end_of_day : bool, optional
+        whether date without time means the end of the day instead of its
+        beginning, by default False
+
+    Returns
+    -------
+    datetime
+        converted value
+
+    Raises
+    ------
+    argparse.ArgumentTypeError
+        when value is not a date or date with time in ISO format
+    """
+    try:
+        if end_of_day and len(value) == len("YYYY-MM-DD"):
+            return datetime.combine(date.fromisoformat(value), time.max)
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{value} is not a date in ISO format")
+
+
+def _end_datetime(value: str) -> datetime:
+    """Convert CLI argument in ISO format to datetime, up to the end of the day."""
+    return _datetime(value, end_of_day=True)
+
+
+def build_clipping_filter(args: argparse.Namespace) -> filters.ClippingFilter | None:
+    """Create filter of clippings from CLI arguments.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        arguments parsed with `build_parser()`
+
+    Returns
+    -------
+    filters.ClippingFilter | None
+        filter of clippings or None when no criteria are given
+    """
+    if not (args.book or args.author or args.type or args.since or args.until):
+        return None
+    return filters.ClippingFilter(
+        book=args.book,
+        author=args.author,
+        clipping_types=tuple(args.type),
+        since=args.since,
+        until=args.until,
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Create parser of CLI arguments.
+
+    Returns
+    -------
+    argparse.ArgumentParser
+        parser for kindleparse arguments
+    """
+    parser = argparse.ArgumentParser(
+        prog="kindleparse",
+        description=DESCRIPTION,
+        epilog=EPILOG,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "input_files",
+        type=Path,
+        nargs="+",
+        help="Kindle's clippings files, possibly compressed with gzip, bz2 or xz; "
+        "clippings of multiple devices are merged in order of time and duplicates "
+        "are dropped",
+    )
+    parser.add_argument(
+        "output_dir",
+        type=Path,
+        help="directory for markdown files, or path ending with .zip to write "
+        "them into a single zip archive",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=_positive_int,
+        default=1,
+        help="number of processes used for parsing, by default 1",
+    )
+    parser.add_argument(
+        "--writers",
+        type=_positive_int,
+        default=kindle_parser.WRITERS,
+        help=f"number of threads writing files, by default {kindle_parser.WRITERS}",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="parse only clippings added since previous run into the same directory",
+    )
+    parser.add_argument(
+        "--order",
+        choices=list(kindle_parser.SORT_KEYS),
+        default="location",
+        help="order of clippings in each book, by default location",
+    )
+    parser.add_argument(
+        "--template",
+        type=Path,
+        help="JSON file with templates of header and clippings of markdown files",
+    )
+    parser.add_argument(
+        "--normalization",
+        choices=[form for form in formats.NORMALIZATIONS if form] + ["none"],
+        default=kindle_parser.NORMALIZATION,
+        help="Unicode normalization form of parsed text, by default "
+        f"{kindle_parser.NORMALIZATION}",
+    )
+    parser.add_argument(
+        "--reader-format",
+        type=Path,
+        action="append",
+        default=[],
+        help="JSON file with format of metadata lines of another reader or "
+        "language; may be given multiple times",
+    )
+    parser.add_argument(
+        "--book", help="parse only clippings of books with this part of the title"
+    )
+    parser.add_argument(
+        "--author", help="parse only clippings of authors with this part of the name"
+    )
+    parser.add_argument(
+        "--type",
+        action="append",
+        default=[],
+        help="parse only clippings of this type, e.g. Highlight; may be given "
+        "multiple times",
+    )
+    parser.add_argument(
+        "--since",
+        type=_datetime,
+        metavar="DATE",
+        help="parse only clippings added at this date (ISO format) or later",
+    )
+    parser.add_argument(
+        "--until",
+        type=_end_datetime,
+        metavar="DATE",
+        help="parse only clippings added at this date (ISO format) or earlier",
+    )
+    parser.add_argument(
+        "--deduplicate",
+        action="store_true",
+        help="drop highlights which were later extended into longer ones",
+    )
+    parser.add_argument(
+        "--merge-editions",
+        action="store_true",
+        help="merge books with similar clippings (e.g. other editions or titles "
+        "of the same book) into a single book",
+    )
+    parser.add_argument(
+        "--merge-report",
+        type=Path,
+        help="JSON file with report of books merged with --merge-editions",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="print time spent in each stage and counters of processed items to "
+        "standard error",
+    )
+    parser.add_argument(
+        "--stats-format",
+        choices=["text", "json"],
+        default="text",
+        help="format of statistics, by default text",
+    )
+    parser.add_argument(
+        "--cache",
+        type=Path,
+        help="binary cache of parsed clippings, used while input file is unchanged",
+    )
+    parser.add_argument(
+        "--memory-limit",
+        type=_positive_int,
+        metavar="MIB",
+        help="group clippings in bounded memory, spilling them to temporary "
+        "files above given number of mebibytes",
+    )
+    parser.add_argument(
+        "--store",
+        type=Path,
+        help="SQLite database collecting clippings from all runs; books are "
+        "rendered from it, so they keep clippings removed from the device",
+    )
+    return parser
+
+
+def build_search_parser() -> argparse.ArgumentParser:
+    """Create parser of CLI arguments of `search` subcommand.
+
+    Returns
+    -------
+    argparse.ArgumentParser
+        parser for kindleparse search arguments
+    """
+    parser = argparse.ArgumentParser(
+        prog="kindleparse search",
+        description="Search clippings collected with `--store` option.",
+    )
+    parser.add_argument("store", type=Path, help="SQLite database with clippings")
+    parser.add_argument("query", help="words which have to appear in clipping")
+    parser.add_argument("--book", help="part of the title of the book")
+    parser.add_argument("--author", help="part of the name of the author")
+    parser.add_argument("--type", help="type of clippings, e.g. Highlight")
+    parser.add_argument(
+        "--limit",
+        type=_positive_int,
+        default=20,
+        help="maximal number of printed clippings, by default 20",
+    )
+    return parser
+
+
+def search(args: argparse.Namespace) -> None:
+    """Print clippings matching the query.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        arguments parsed with `build_search_parser()`
+    """
+    if not args.store.is_file():
+        raise FileNotFoundError(f"Store {args.store} does not exist")
+    with closing(store.open_store(args.store)) as connection:
+        clippings = store.search_clippings(
+            connection, args.query, args.book, args.author, args.type, args.limit
+        )
+    for clipping in clippings:
+        if clipping.location[0] is not None:
+            position = "location {}-{}".format(*clipping.location)
+        else:
+            position = f"page {clipping.page}"
+        print(f"{clipping.book} ({clipping.clipping_type}, {position})")
+        print(f"    {clipping.content}")
+
+
+def build_serve_parser() -> argparse.ArgumentParser:
+    """Create parser of CLI arguments of `serve` subcommand.
+
+    Returns
+    -------
+    argparse.ArgumentParser
+        parser for kindleparse serve arguments
+    """
+    parser = argparse.ArgumentParser(
+        prog="kindleparse serve",
+        description="Serve books, clippings and markdown files over HTTP, "
+        "parsing clippings again only when the file changes.",
+    )
+    parser.add_argument("input_file", type=Path, help="Kindle's clippings file")
+    parser.add_argument(
+        "--host", default=server.HOST, help=f"address, by default {server.HOST}"
+    )
+    parser.add_argument(
+        "--port",
+        type=_positive_int,
+        default=server.PORT,
+        help=f"port, by default {server.PORT}",
+    )
+    parser.add_argument(
+        "--order",
+        choices=list(kindle_parser.SORT_KEYS),
+        default="location",
+        help="order of clippings in each book, by default location",
+    )
+    parser.add_argument(
+        "--template",
+        type=Path,
+        help="JSON file with templates of header and clippings of markdown files",
+    )
+    return parser
+
+
+def build_batch_parser() -> argparse.ArgumentParser:
+    """Create parser of CLI arguments of `batch` subcommand.
+
+    Returns
+    -------
+    argparse.ArgumentParser
+        parser for kindleparse batch arguments
+    """
+    parser = argparse.ArgumentParser(
+        prog="kindleparse batch",
+        description="Process many clippings files, each into its own directory, "
+        "in a pool of processes. Files which fail are reported at the end, "
+        "without stopping the others.",
+    )
+    parser.add_argument(
+        "source",
+        type=Path,
+        help="directory tree with clippings files, or manifest file with lines "
+        "containing clippings file and output directory separated with a tab",
+    )
+    parser.add_argument(
+        "output_dir",
+        type=Path,
+        nargs="?",
+        help="root of output directories, mirroring the tree of source directory",
+    )
+    parser.add_argument(
+        "--pattern",
+        default=batch.PATTERN,
+        help=f"name pattern of clippings files in source directory, by default "
+        f"{batch.PATTERN!r}",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=_positive_int,
+        default=os.cpu_count() or 1,
+        help="number of worker processes, by default number of CPUs",
+    )
+    parser.add_argument(
+        "--order",
+        choices=list(kindle_parser.SORT_KEYS),
+        default="location",
+        help="order of clippings in each book, by default location",
+    )
+    parser.add_argument(
+        "--template",
+        type=Path,
+        help="JSON file with templates of header and clippings of markdown files",
+    )
+    parser.add_argument(
+        "--normalization",
+        choices=[form for form in formats.NORMALIZATIONS if form] + ["none"],
+        default=kindle_parser.NORMALIZATION,
+        help="Unicode normalization form of parsed text, by default "
+        f"{kindle_parser.NORMALIZATION}",
+    )
+    parser.add_argument(
+        "--reader-format",
+        type=Path,
+        action="append",
+        default=[],
+        help="JSON file with format of metadata lines of another reader or "
+        "language; may be given multiple times",
+    )
+    return parser
+
+
+def run_batch(args: argparse.Namespace, parser: argparse.ArgumentParser) -> None:
+    """Process all files of the batch and print failures and summary.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        arguments parsed with `build_batch_parser()`
+    parser : argparse.ArgumentParser
+        parser reporting invalid combination of arguments
+    """
+    if args.source.is_dir():
+        if args.output_dir is None:
+            parser.error("output_dir is required when source is a directory")
+        jobs = batch.find_jobs(args.source, args.output_dir, args.pattern)
+    elif args.output_dir is not None:
+        parser.error("output_dir cannot be used with manifest file")
+    else:
+        jobs = batch.load_jobs(args.source)
+    template = templates.load_template(args.template) if args.template else None
+    normalization = None if args.normalization == "none" else args.normalization
+    for format_file in args.reader_format:
+        formats.load_format(format_file)
+
+    summary = batch.BatchSummary()
+    start = perf_counter()
+    for result in batch.run_batch(
+        jobs, args.workers, args.order, template, normalization, args.reader_format
+    ):
+        summary.results.append(result)
+        if result.error is not None:
+            print(f"Failed {result.job.input_file}: {result.error}", file=sys.stderr)
+    summary.seconds = perf_counter() - start
+    print(summary.format())
+
+
 def main(argv: list[str] = sys.argv[1:]) -> None:
     """Minimal CLI interface for kindleparse.
 
@@ -23,26 +469,161 @@ def main(argv: list[str] = sys.argv[1:]) -> None:
         CLI arguments, by default sys.argv[1:]
 
     Default value here is provided for CLI installed with `pip` to be working.
+    Arguments starting with `search`, `serve` or `batch` run the subcommand.
 
     Raises
     ------
     SystemExit
-        _description_
+        when arguments are invalid
     """
-    # Verification of list of args
-    if len(argv) != 2:
-        raise SystemExit(DESCRIPTION)
+    if argv[:1] == ["search"]:
+        search(build_search_parser().parse_args(argv[1:]))
+        return
+    if argv[:1] == ["batch"]:
+        batch_parser = build_batch_parser()
+        run_batch(batch_parser.parse_args(argv[1:]), batch_parser)
+        return
+    if argv[:1] == ["serve"]:
+        serve_parser = build_serve_parser()
+        args = serve_parser.parse_args(argv[1:])
+        if kindle_parser.detect_compression(args.input_file) is not None:
+            serve_parser.error("serve does not support compressed input")
+        template = templates.load_template(args.template) if args.template else None
+        server.serve(args.input_file, args.host, args.port, args.order, template)
+        return
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.incremental and len(args.input_files) > 1:
+        parser.error("--incremental supports a single input file")
+    if args.incremental and (
+        args.output_dir.suffix.lower() == ".zip"
+        or kindle_parser.detect_compression(args.input_files[0]) is not None
+    ):
+        parser.error("--incremental supports neither compressed input nor zip output")
+    if args.cache and (args.incremental or len(args.input_files) > 1):
+        parser.error("--cache supports a single input file, without --incremental")
+    # Cache is loaded and written as a whole, and shards parsed in parallel are
+    # buffered, so memory would not be bounded with them
+    if args.memory_limit and (
+        args.incremental
+        or args.store
+        or args.deduplicate
+        or args.cache
+        or args.jobs > 1
+    ):
+        parser.error(
+            "--memory-limit cannot be used with --incremental, --store, "
+            "--deduplicate, --cache or --jobs"
+        )
+    if args.merge_editions and (args.incremental or args.memory_limit):
+        parser.error(
+            "--merge-editions cannot be used with --incremental or --memory-limit"
+        )
+    if args.merge_report and not args.merge_editions:
+        parser.error("--merge-report requires --merge-editions")
+    if args.incremental and build_clipping_filter(args) is not None:
+        parser.error(
+            "--book, --author, --type, --since and --until cannot be used with "
+            "--incremental"
+        )
+    if not args.stats:
+        run(args)
+        return
+
+    with stats.collect() as collected:
+        run(args)
+    print(collected.format(args.stats_format), file=sys.stderr)
+
 
+def run(args: argparse.Namespace) -> None:
+    """Run whole pipeline with parsed CLI arguments.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        arguments parsed with `build_parser()`
+    """
     # Parse paths
-    input_file = Path(argv[0])
-    output_dir = Path(argv[1])
-    if not output_dir.exists():
+    input_files = args.input_files
+    output_dir = args.output_dir
+    if output_dir.suffix.lower() == ".zip":
+        output_dir.parent.mkdir(parents=True, exist_ok=True)
+    elif not output_dir.exists():
         output_dir.mkdir()
+    template = templates.load_template(args.template) if args.template else None
+    normalization = None if args.normalization == "none" else args.normalization
+    for format_file in args.reader_format:
+        formats.load_format(format_file)
+    clipping_filter = build_clipping_filter(args)
 
     # Trigger logic
-    clippings = kindle_parser.parse_my_clippings(input_file)
-    mapping = kindle_parser.sort_clippings(clippings)
-    kindle_parser.dump_book_to_markdown(mapping, output_dir)
+    grouped = None
+    if args.incremental:
+        checkpoint_file = output_dir / checkpoint.CHECKPOINT_FILENAME
+        mapping, new_checkpoint = checkpoint.parse_my_clippings_incrementally(
+            input_files[0], checkpoint.load_checkpoint(checkpoint_file), normalization
+        )
+    else:
+        if args.cache:
+            # Cache keeps all clippings of the file, so it is filtered after loading
+            clippings = parse_cache.parse_my_clippings_cached(
+                input_files[0], args.cache, args.jobs, normalization
+            )
+            if clipping_filter is not None:
+                clippings = filters.filter_clippings(
+                    clippings, clipping_filter, normalization
+                )
+        elif len(input_files) == 1:
+            clippings = kindle_parser.parse_my_clippings(
+                input_files[0],
+                jobs=args.jobs,
+                normalization=normalization,
+                clipping_filter=clipping_filter,
+            )
+        else:
+            clippings = merge.merge_my_clippings(
+                input_files,
+                jobs=args.jobs,
+                normalization=normalization,
+                clipping_filter=clipping_filter,
+            )
+        if args.memory_limit:
+            mapping = grouped = partitions.group_clippings(
+                clippings, args.memory_limit * 1024 * 1024
+            )
+        else:
+            mapping = kindle_parser.sort_clippings(clippings)
+
+    if args.store:
+        with closing(store.open_store(args.store)) as connection:
+            store.ingest_clippings(connection, chain.from_iterable(mapping.values()))
+            books = mapping if args.incremental else None
+            mapping = store.load_books(connection, books)
+
+    if args.merge_editions:
+        mapping, merges = editions.merge_same_books(mapping)
+        if args.merge_report:
+            editions.save_report(merges, args.merge_report)
+
+    if args.deduplicate:
+        mapping, dropped = dedup.deduplicate_highlights(mapping)
+        print(f"Dropped superseded highlights: {dropped}")
+
+    try:
+        mapping = kindle_parser.order_clippings(mapping, args.order)
+        summary = kindle_parser.dump_book_to_markdown(
+            mapping, output_dir, args.writers, template
+        )
+    finally:
+        # Partition files may be larger than memory, so they are removed even
+        # when writing fails or is interrupted
+        if grouped is not None:
+            grouped.close()
+    if args.incremental:
+        checkpoint.save_checkpoint(new_checkpoint, checkpoint_file)
+
+    print(f"Written files: {summary.written}, unchanged files: {summary.skipped}")
 
 
 if __name__ == "__main__":
@@ -1,7 +1,15 @@
+from array import array
+from collections.abc import Iterable, Iterator
 from dataclasses import dataclass
+from functools import lru_cache
+import json
+import struct
 
+# Value stored in integer columns of ClippingTable in place of None
+MISSING = -1
 
-@dataclass(eq=True, frozen=True)
+
+@dataclass(eq=True, frozen=True, slots=True)
 class Book:
     author: str
     title: str
@@ -13,7 +21,29 @@ class Book:
             return f"{self.author} - {self.title}"
 
 
-@dataclass(eq=True, frozen=True)
+@lru_cache(maxsize=4096)
+def intern_book(author: str, title: str) -> Book:
+    """Return shared Book instance for given author and title.
+
+    Clippings of the same book repeat the same title and author thousands of times,
+    so sharing single instance (and its strings) saves a lot of memory.
+
+    Parameters
+    ----------
+    author : str
+        author of the book
+    title : str
+        title of the book
+
+    Returns
+    -------
+    Book
+        Book instance shared between all calls with the same arguments
+    """
+    return Book(author=author, title=title)
+
+
+@dataclass(eq=True, frozen=True, slots=True)
 class Clipping:
     book: Book
     clipping_type: str
@@ -47,3 +77,262 @@ class Clipping:
             return f"> {self.content}\n\n"
         else:
             raise ValueError(f"Unknown type of clipping: {self.clipping_type}")
+
+
+class _TextColumn:
+    """Column of strings kept as concatenated UTF-8 bytes with array of offsets."""
+
+    def __init__(self) -> None:
+        self._data = bytearray()
+        self._offsets = array("Q", [0])
+
+    def append(self, text: str) -> None:
+        self._data += text.encode("utf-8")
+        self._offsets.append(len(self._data))
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("column index out of range")
+        return self._data[self._offsets[index] : self._offsets[index + 1]].decode(
+            "utf-8"
+        )
+
+
+class ClippingTable:
+    """Columnar, memory-lean container of clippings.
+
+    Books and clipping types are stored once and referenced by small integer IDs,
+    locations and pages are kept in `array` buffers and timestamps and contents
+    as UTF-8 encoded buffers. Clippings are created only when they are accessed,
+    so the table can hold millions of them.
+    """
+
+    def __init__(self, clippings: Iterable[Clipping] = ()) -> None:
+        self.books: list[Book] = []
+        self.clipping_types: list[str] = []
+        self._book_ids: dict[Book, int] = {}
+        self._type_ids: dict[str, int] = {}
+        self._book_column = array("I")
+        self._type_column = array("B")
+        self._location_start_column = array("q")
+        self._location_end_column = array("q")
+        self._page_column = array("q")
+        self._timestamps = _TextColumn()
+        self._contents = _TextColumn()
+        self.extend(clippings)
+
+    def append(self, clipping: Clipping) -> None:
+        """Add clipping at the end of the table.
+
+        Parameters
+        ----------
+        clipping : Clipping
+            clipping to be added
+        """
+        if (book_id := self._book_ids.get(clipping.book)) is None:
+            book_id = self._book_ids[clipping.book] = len(self.books)
+            self.books.append(clipping.book)
+        if (type_id := self._type_ids.get(clipping.clipping_type)) is None:
+            type_id = self._type_ids[clipping.clipping_type] = len(self.clipping_types)
+            self.clipping_types.append(clipping.clipping_type)
+
+        location_start, location_end = clipping.location
+        self._book_column.append(book_id)
+        self._type_column.append(type_id)
+        self._location_start_column.append(
+            MISSING if location_start is None else location_start
+        )
+        self._location_end_column.append(
+            MISSING if location_end is None else location_end
+        )
+        self._page_column.append(MISSING if clipping.page is None else clipping.page)
+        self._timestamps.append(clipping.timestamp)
+        self._contents.append(clipping.content)
+
+    def extend(self, clippings: Iterable[Clipping]) -> None:
+        """Add clippings at the end of the table.
+
+        Parameters
+        ----------
+        clippings : Iterable[Clipping]
+            clippings to be added
+        """
+        for clipping in clippings:
+            self.append(clipping)
+
+    def __len__(self) -> int:
+        return len(self._contents)
+
+    def __getitem__(self, index: int) -> Clipping:
+        """Return clipping stored at given position.
+
+        Parameters
+        ----------
+        index : int
+            position of the clipping, negative values count from the end
+
+        Returns
+        -------
+        Clipping
+            clipping created from the columns of the table
+
+        Raises
+        ------
+        IndexError
+            when index is out of range
+        """
+        content = self._contents[index]
+        location_start = self._location_start_column[index]
+        location_end = self._location_end_column[index]
+        page = self._page_column[index]
+        return Clipping(
+            book=self.books[self._book_column[index]],
+            clipping_type=self.clipping_types[self._type_column[index]],
+            timestamp=self._timestamps[index],
+            content=content,
+            location=(None, None)
+            if location_start == MISSING
+            else (location_start, location_end),
+            page=None if page == MISSING else page,
+        )
+
+    def __iter__(self) -> Iterator[Clipping]:
+        books, clipping_types = self.books, self.clipping_types
+        timestamps, timestamp_offsets = (
+            self._timestamps._data,
+            self._timestamps._offsets,
+        )
+        contents, content_offsets = self._contents._data, self._contents._offsets
+        for index, (book_id, type_id, location_start, location_end, page) in enumerate(
+            zip(
+                self._book_column,
+                self._type_column,
+                self._location_start_column,
+                self._location_end_column,
+                self._page_column,
+            )
+        ):
+            yield Clipping(
+                book=books[book_id],
+                clipping_type=clipping_types[type_id],
+                timestamp=timestamps[
+                    timestamp_offsets[index] : timestamp_offsets[index + 1]
+                ].decode("utf-8"),
+                content=contents[
+                    content_offsets[index] : content_offsets[index + 1]
+                ].decode("utf-8"),
+                location=(None, None)
+                if location_start == MISSING
+                else (location_start, location_end),
+                page=None if page == MISSING else page,
+            )
+
+    def _buffers(self) -> list[array | bytearray]:
+        return [
+            self._book_column,
+            self._type_column,
+            self._location_start_column,
+            self._location_end_column,
+            self._page_column,
+            self._timestamps._offsets,
+            self._timestamps._data,
+            self._contents._offsets,
+            self._contents._data,
+        ]
+
+    def to_bytes(self) -> bytes:
+        """Serialize the table into compact binary form.
+
+        Books and clipping types are written as a JSON string table, followed by
+        raw buffers of all columns, each prefixed with its size. Integers use
+        native byte order, so the data should be read on the same platform.
+
+        Returns
+        -------
+        bytes
+            serialized table
+        """
+        strings = json.dumps(
+            {
+                "books": [[book.author, book.title] for book in self.books],
+                "clipping_types": self.clipping_types,
+            },
+            ensure_ascii=False,
+        ).encode("utf-8")
+        parts = [struct.pack("<Q", len(strings)), strings]
+        for buffer in self._buffers():
+            data = buffer.tobytes() if isinstance(buffer, array) else bytes(buffer)
+            parts += [struct.pack("<Q", len(data)), data]
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "ClippingTable":
+        """Load table serialized with `to_bytes`.
+
+        Buffers of columns are copied as they are, without parsing each value.
+
+        Parameters
+        ----------
+        data : bytes
+            serialized table
+
+        Returns
+        -------
+        ClippingTable
+            loaded table
+
+        Raises
+        ------
+        ValueError
+            when data is truncated or inconsistent
+        """
+        view = memoryview(data)
+        position = 0
+
+        def take() -> memoryview:
+            nonlocal position
+            if position + 8 > len(view):
+                raise ValueError("Truncated clipping table")
+            (size,) = struct.unpack_from("<Q", view, position)
+            position += 8 + size
+            if position > len(view):
+                raise ValueError("Truncated clipping table")
+            return view[position - size : position]
+
+        strings = json.loads(bytes(take()))
+        table = cls()
+        table.books = [intern_book(author, title) for author, title in strings["books"]]
+        table.clipping_types = strings["clipping_types"]
+        table._book_ids = {book: index for index, book in enumerate(table.books)}
+        table._type_ids = {
+            clipping_type: index
+            for index, clipping_type in enumerate(table.clipping_types)
+        }
+        table._timestamps._offsets = array("Q")
+        table._contents._offsets = array("Q")
+        for buffer in table._buffers():
+            if isinstance(buffer, array):
+                buffer.frombytes(take())
+            else:
+                buffer += take()
+
+        count = len(table._book_column)
+        if position != len(view) or any(
+            len(column) != count for column in table._buffers()[:5]
+        ):
+            raise ValueError("Inconsistent clipping table")
+        if count and (
+            max(table._book_column) >= len(table.books)
+            or max(table._type_column) >= len(table.clipping_types)
+        ):
+            raise ValueError("Inconsistent clipping table")
+        for text_column in (table._timestamps, table._contents):
+            offsets = text_column._offsets
+            if len(offsets) != count + 1 or offsets[-1] != len(text_column._data):
+                raise ValueError("Inconsistent clipping table")
+        return table
@@ -0,0 +1,138 @@
+"""Module with removal of highlights superseded by their later extensions."""
+
+from clipping import Book, Clipping
+
+from bisect import bisect_left
+from collections.abc import Iterator
+
+
+def _later_indices(tree: list[int], first_leaf: int, index: int) -> Iterator[int]:
+    """Yield indices greater than `index` stored in leaves from `first_leaf` on.
+
+    Each node of the segment tree keeps the maximal index in its leaves, so
+    only subtrees containing a later index are visited.
+
+    Parameters
+    ----------
+    tree : list[int]
+        segment tree with leaves in the second half, -1 in empty leaves
+    first_leaf : int
+        position of the first leaf searched
+    index : int
+        index of the covered highlight
+
+    Yields
+    ------
+    Iterator[int]
+        indices of highlights in searched leaves, later than `index`
+    """
+    size = len(tree) // 2
+    nodes = []
+    left, right = first_leaf + size, 2 * size
+    while left < right:
+        if left & 1:
+            nodes.append(left)
+            left += 1
+        if right & 1:
+            right -= 1
+            nodes.append(right)
+        left, right = left // 2, right // 2
+    nodes = [node for node in nodes if tree[node] > index]
+    while nodes:
+        node = nodes.pop()
+        if node >= size:
+            yield tree[node]
+        else:
+            nodes.extend(
+                child for child in (2 * node, 2 * node + 1) if tree[child] > index
+            )
+
+
+def _superseded_highlights(clippings: list[Clipping]) -> set[int]:
+    """Find highlights contained in a later highlight of the same book.
+
+    Highlight is superseded when a highlight later in the list covers its whole
+    location range (or page range, when location is missing) and its content
+    contains content of the former one. Intervals are swept in order of their
+    start, so all intervals seen before start at or before the current one.
+    They are kept in a segment tree ordered by end, with maximal index of each
+    subtree, so only intervals which cover the current one and are later in
+    the list are found, in O(log n) each, and only their content is compared.
+
+    Parameters
+    ----------
+    clippings : list[Clipping]
+        clippings of single book, in order of the file
+
+    Returns
+    -------
+    set[int]
+        indices of superseded highlights
+    """
+    intervals: dict[str, list[tuple[int, int, int]]] = {"location": [], "page": []}
+    for index, clipping in enumerate(clippings):
+        if clipping.clipping_type != "Highlight":
+            continue
+        if clipping.location[0] is not None:
+            intervals["location"].append((*clipping.location, index))
+        elif clipping.page is not None:
+            intervals["page"].append((clipping.page, clipping.page, index))
+
+    superseded = set()
+    for kind_intervals in intervals.values():
+        # Each interval has its own leaf, in order of end
+        by_end = sorted((end, index) for _, end, index in kind_intervals)
+        ends = [end for end, _ in by_end]
+        leaves = {index: leaf for leaf, (_, index) in enumerate(by_end)}
+        tree = [-1] * (2 * len(by_end))
+        # Covering intervals come first: by start, longer first, later first
+        kind_intervals.sort(
+            key=lambda interval: (interval[0], -interval[1], -interval[2])
+        )
+        for _, end, index in kind_intervals:
+            content = clippings[index].content
+            if any(
+                content in clippings[later].content
+                for later in _later_indices(tree, bisect_left(ends, end), index)
+            ):
+                superseded.add(index)
+                continue
+            node = leaves[index] + len(by_end)
+            tree[node] = index
+            while node > 1:
+                node //= 2
+                tree[node] = max(tree[2 * node], tree[2 * node + 1])
+    return superseded
+
+
+def deduplicate_highlights(
+    mapping: dict[Book, list[Clipping]],
+) -> tuple[dict[Book, list[Clipping]], int]:
+    """Drop highlights which were later extended into longer ones.
+
+    Kindle creates new clipping each time highlight is extended, e.g. location
+    6-6 and then 6-7 with the same text at the beginning. Only the latest one is
+    kept. Clippings are expected in order of the file, so this should be done
+    before `order_clippings`.
+
+    Parameters
+    ----------
+    mapping : dict[Book, list[Clipping]]
+        mapping books and clippings
+
+    Returns
+    -------
+    tuple[dict[Book, list[Clipping]], int]
+        mapping without superseded highlights and number of dropped highlights
+    """
+    result = {}
+    dropped = 0
+    for book, clippings in mapping.items():
+        superseded = _superseded_highlights(clippings)
+        dropped += len(superseded)
+        result[book] = [
+            clipping
+            for index, clipping in enumerate(clippings)
+            if index not in superseded
+        ]
+    return result, dropped
@@ -0,0 +1,278 @@
+"""Module with detection of the same book under different titles or editions."""
+
+from clipping import Book, Clipping
+import stats
+
+import json
+import operator
+import re
+import zlib
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+
+# Number of words in a shingle of clipping content
+SHINGLE_WORDS = 3
+# Books with fewer distinct shingles are never merged, as their few short
+# clippings may be common phrases
+MIN_SHINGLES = 8
+# Signature is split into bands of rows; books whose rows of any band are equal
+# become candidates, so ~87% of books with similarity 0.5 are compared, and
+# ~99% of books with similarity 0.6
+SIGNATURE_SIZE = 128
+BAND_ROWS = 4
+THRESHOLD = 0.5
+# Each book is compared with at most this many earlier books of the same bucket,
+# so buckets of very common content do not make comparisons quadratic
+MAX_BUCKET_CANDIDATES = 32
+
+Signature = tuple[int | None, ...]
+
+_WORD = re.compile(r"\w+")
+# Odd 64-bit multiplier spreading CRC of shingle over the whole hash
+_HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+_HASH_MASK = 2**64 - 1
+
+
+def _shingles(clippings: Iterable[Clipping]) -> set[str]:
+    """Return set of word shingles of content of clippings.
+
+    Parameters
+    ----------
+    clippings : Iterable[Clipping]
+        clippings of single book
+
+    Returns
+    -------
+    set[str]
+        groups of SHINGLE_WORDS consecutive case-folded words
+    """
+    shingles = set()
+    for clipping in clippings:
+        words = _WORD.findall(clipping.content.casefold())
+        shingles.update(
+            map(" ".join, zip(*(words[start:] for start in range(SHINGLE_WORDS))))
+        )
+    return shingles
+
+
+def book_signature(
+    clippings: Iterable[Clipping], size: int = SIGNATURE_SIZE
+) -> Signature | None:
+    """Compute MinHash signature of content of book's clippings.
+
+    One hash is computed for each shingle, and its value is kept when it is the
+    minimum of its bin (one permutation hashing), so cost does not depend on
+    the size of the signature. Bins without any shingle are None.
+
+    Parameters
+    ----------
+    clippings : Iterable[Clipping]
+        clippings of single book
+    size : int, optional
+        number of bins of the signature, by default SIGNATURE_SIZE
+
+    Returns
+    -------
+    Signature | None
+        minimal hash of each bin, or None when book has fewer than MIN_SHINGLES
+        shingles
+    """
+    shingles = _shingles(clippings)
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    bins: list[int | None] = [None] * size
+    for shingle in shingles:
+        digest = zlib.crc32(shingle.encode("utf-8")) * _HASH_MULTIPLIER & _HASH_MASK
+        value, index = divmod(digest, size)
+        if (current := bins[index]) is None or value < current:
+            bins[index] = value
+    return tuple(bins)
+
+
+def estimate_similarity(first: Signature, second: Signature) -> float:
+    """Estimate Jaccard similarity of shingles of two books from their signatures.
+
+    Parameters
+    ----------
+    first : Signature
+        signature of the first book
+    second : Signature
+        signature of the second book, of the same size
+
+    Returns
+    -------
+    float
+        fraction of equal bins among bins not empty in both signatures
+    """
+    equal = sum(map(operator.eq, first, second))
+    used = len(first)
+    if None in first and None in second:
+        empty = sum(a is None and b is None for a, b in zip(first, second))
+        equal, used = equal - empty, used - empty
+    return equal / used if used else 0.0
+
+
+@dataclass
+class EditionMerge:
+    """Books merged into canonical one, with similarity of each to its match."""
+
+    book: Book
+    merged: dict[Book, float] = field(default_factory=dict)
+
+
+def find_same_books(
+    signatures: Mapping[Book, Signature],
+    threshold: float = THRESHOLD,
+    band_rows: int = BAND_ROWS,
+) -> list[list[tuple[Book, Book, float]]]:
+    """Find groups of books with similar signatures, with locality sensitive hashing.
+
+    Signatures are split into bands and books are put into buckets by rows of
+    each band, so only books sharing a bucket are compared, instead of all
+    pairs. Similarity of candidates is estimated from signatures, and books are
+    grouped transitively by pairs above the threshold.
+
+    Parameters
+    ----------
+    signatures : Mapping[Book, Signature]
+        signatures of books, in order of the books
+    threshold : float, optional
+        minimal estimated similarity of books merged together, by default
+        THRESHOLD
+    band_rows : int, optional
+        number of rows in each band, by default BAND_ROWS
+
+    Returns
+    -------
+    list[list[tuple[Book, Book, float]]]
+        for each group of at least two books, pairs of matched books with their
+        similarity
+    """
+    buckets: dict[tuple, list[Book]] = {}
+    compared: set[tuple[Book, Book]] = set()
+    parents: dict[Book, Book] = {}
+    pairs: list[tuple[Book, Book, float]] = []
+
+    def root(book: Book) -> Book:
+        while (parent := parents.get(book, book)) != book:
+            parents[book] = parents.get(parent, parent)
+            book = parent
+        return book
+
+    for book, signature in signatures.items():
+        for start in range(0, len(signature), band_rows):
+            rows = signature[start : start + band_rows]
+            if None in rows:
+                continue
+            bucket = buckets.setdefault((start, rows), [])
+            for candidate in bucket[-MAX_BUCKET_CANDIDATES:]:
+                if (candidate, book) in compared or root(candidate) == root(book):
+                    continue
+                compared.add((candidate, book))
+                similarity = estimate_similarity(signatures[candidate], signature)
+                if similarity >= threshold:
+                    parents[root(book)] = root(candidate)
+                    pairs.append((candidate, book, similarity))
+            bucket.append(book)
+    stats.count("edition candidates compared", len(compared))
+
+    groups: dict[Book, list[tuple[Book, Book, float]]] = {}
+    for pair in pairs:
+        groups.setdefault(root(pair[0]), []).append(pair)
+    return list(groups.values())
+
+
+def _canonical_book(books: Iterable[Book], mapping: Mapping[Book, list]) -> Book:
+    """Choose the book keeping clippings of the group.
+
+    Book with author is preferred, then book with most clippings, then book
+    with the shortest title (without suffixes of sources).
+    """
+    return max(
+        books,
+        key=lambda book: (bool(book.author), len(mapping[book]), -len(book.title)),
+    )
+
+
+def merge_same_books(
+    mapping: Mapping[Book, list[Clipping]],
+    threshold: float = THRESHOLD,
+) -> tuple[dict[Book, list[Clipping]], list[EditionMerge]]:
+    """Merge books with similar content of clippings into a single book.
+
+    Each group of similar books is replaced with its canonical book, at the
+    position of the first book of the group, and clippings of the group are
+    assigned to it in order of the books. Overlapping highlights of different
+    editions are kept; they can be dropped with `dedup.deduplicate_highlights`.
+
+    Parameters
+    ----------
+    mapping : Mapping[Book, list[Clipping]]
+        mapping books and clippings
+    threshold : float, optional
+        minimal estimated Jaccard similarity of shingles of merged books, by
+        default THRESHOLD
+
+    Returns
+    -------
+    tuple[dict[Book, list[Clipping]], list[EditionMerge]]
+        mapping with merged books and report of merges
+    """
+    with stats.timer("book signatures"):
+        signatures = {
+            book: signature
+            for book, clippings in mapping.items()
+            if (signature := book_signature(clippings)) is not None
+        }
+    with stats.timer("find same books"):
+        groups = find_same_books(signatures, threshold)
+
+    canonical: dict[Book, Book] = {}
+    merges = []
+    for pairs in groups:
+        books = list(dict.fromkeys(book for pair in pairs for book in pair[:2]))
+        edition_merge = EditionMerge(_canonical_book(books, mapping))
+        for first, second, similarity in pairs:
+            for book in (first, second):
+                if book != edition_merge.book and book not in edition_merge.merged:
+                    edition_merge.merged[book] = similarity
+        for book in books:
+            canonical[book] = edition_merge.book
+        merges.append(edition_merge)
+
+    result: dict[Book, list[Clipping]] = {}
+    for book, clippings in mapping.items():
+        target = canonical.get(book, book)
+        if target != book:
+            clippings = [replace(clipping, book=target) for clipping in clippings]
+        result.setdefault(target, []).extend(clippings)
+    stats.count(
+        "books merged", sum(len(edition_merge.merged) for edition_merge in merges)
+    )
+    return result, merges
+
+
+def save_report(merges: list[EditionMerge], report_file: Path) -> None:
+    """Save merges of books as JSON file.
+
+    Parameters
+    ----------
+    merges : list[EditionMerge]
+        merges returned by `merge_same_books`
+    report_file : Path
+        path of report file
+    """
+    report = [
+        {
+            "author": edition_merge.book.author,
+            "title": edition_merge.book.title,
+            "merged": [
+                {"author": book.author, "title": book.title, "similarity": similarity}
+                for book, similarity in edition_merge.merged.items()
+            ],
+        }
+        for edition_merge in merges
+    ]
+    with open(report_file, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=4)
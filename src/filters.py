@@ -0,0 +1,141 @@
+"""Module with filters of clippings, checked before content of clipping is read."""
+
+from clipping import Book, Clipping
+import timestamps
+
+import unicodedata
+from collections.abc import Iterable
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Generator
+
+
+@dataclass(eq=True, frozen=True)
+class ClippingFilter:
+    """Criteria of clippings to be kept.
+
+    Title and author are matched as case-insensitive parts of the book's title
+    and author, after they are normalized the same way as parsed clippings
+    (see `normalized`), and time range includes both its ends. Criteria which are not
+    given match all clippings. Bookmarks never match, as they are not rendered
+    anyway, and clippings with unknown timestamp do not match a time range.
+    """
+
+    book: str | None = None
+    author: str | None = None
+    clipping_types: tuple[str, ...] = ()
+    since: datetime | None = None
+    until: datetime | None = None
+
+    def normalized(self, normalization: str | None) -> "ClippingFilter":
+        """Return filter with title and author normalized like parsed clippings.
+
+        Parameters
+        ----------
+        normalization : str | None
+            Unicode normalization form of parsed clippings, or None when their
+            text is kept as it is
+
+        Returns
+        -------
+        ClippingFilter
+            filter matching clippings parsed with given normalization
+        """
+        if normalization is None:
+            return self
+
+        def normalize(text: str | None) -> str | None:
+            return text and unicodedata.normalize(normalization, text)
+
+        book, author = normalize(self.book), normalize(self.author)
+        if (book, author) == (self.book, self.author):
+            return self
+        return replace(self, book=book, author=author)
+
+    def may_match_title_line(self, title_line: str) -> bool:
+        """Check whether clippings with given title line may match the filter.
+
+        Title and author are parts of the title line, so clippings whose title
+        line does not contain the requested title and author can be rejected
+        before their metadata line is parsed.
+
+        Parameters
+        ----------
+        title_line : str
+            first line of the clipping
+
+        Returns
+        -------
+        bool
+            False when no clipping with this title line matches the filter
+        """
+        title_line = title_line.casefold()
+        return (not self.book or self.book.casefold() in title_line) and (
+            not self.author or self.author.casefold() in title_line
+        )
+
+    def matches(self, book: Book, clipping_type: str, timestamp: str) -> bool:
+        """Check whether clipping with given metadata should be kept.
+
+        Criteria are checked from the cheapest one, and only the metadata line
+        is needed, so content of rejected clippings is never decoded.
+
+        Parameters
+        ----------
+        book : Book
+            book of the clipping
+        clipping_type : str
+            type of the clipping, e.g. Highlight
+        timestamp : str
+            raw timestamp of the clipping
+
+        Returns
+        -------
+        bool
+            True when clipping matches all criteria
+        """
+        if clipping_type == "Bookmark":
+            return False
+        if self.clipping_types and clipping_type not in self.clipping_types:
+            return False
+        if self.book and self.book.casefold() not in book.title.casefold():
+            return False
+        if self.author and self.author.casefold() not in book.author.casefold():
+            return False
+        if self.since is None and self.until is None:
+            return True
+        time = timestamps.parse_timestamp(timestamp)
+        if time is None:
+            return False
+        return (self.since is None or time >= self.since) and (
+            self.until is None or time <= self.until
+        )
+
+
+def filter_clippings(
+    clippings: Iterable[Clipping],
+    clipping_filter: ClippingFilter,
+    normalization: str | None,
+) -> Generator[Clipping, None, None]:
+    """Yield clippings matching the filter, e.g. clippings loaded from cache.
+
+    Parameters
+    ----------
+    clippings : Iterable[Clipping]
+        clippings to be filtered
+    clipping_filter : ClippingFilter
+        criteria of kept clippings
+    normalization : str | None
+        Unicode normalization form the clippings were parsed with
+
+    Yields
+    ------
+    Generator[Clipping, None, None]
+        generator yielding matching Clippings
+    """
+    clipping_filter = clipping_filter.normalized(normalization)
+    for clipping in clippings:
+        if clipping_filter.matches(
+            clipping.book, clipping.clipping_type, clipping.timestamp
+        ):
+            yield clipping
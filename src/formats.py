@@ -0,0 +1,299 @@
+"""Module with formats of metadata lines of different readers and languages."""
+
+import timestamps
+
+import json
+import unicodedata
+from dataclasses import dataclass, field, fields, replace
+from pathlib import Path
+
+
+@dataclass(frozen=True)
+class ReaderFormat:
+    """Grammar of metadata line of clippings of a reader model or language.
+
+    Metadata line starts with one of `prefixes`, followed by clipping type
+    (translated to English with `clipping_types`, when given) and position,
+    e.g. `- Ihre Markierung bei Position 6-7 | Hinzugefügt am ...`. Timestamps
+    in another language than English are parsed with `timestamp_format`.
+    """
+
+    name: str
+    prefixes: tuple[str, ...]
+    clipping_types: dict[str, str] = field(default_factory=dict)
+    at_location: str = "at location "
+    on_page: str = "on page "
+    location_separator: str = " | location "
+    timestamp_separator: str = " | Added on "
+    timestamp_format: timestamps.LocalizedTimestampFormat | None = None
+
+
+KINDLE_EN = ReaderFormat(name="kindle_en", prefixes=("- Your ",))
+KINDLE_DE = ReaderFormat(
+    name="kindle_de",
+    prefixes=("- Ihre ", "- Ihr "),
+    clipping_types={
+        "Markierung": "Highlight",
+        "Notiz": "Note",
+        "Lesezeichen": "Bookmark",
+    },
+    at_location="bei Position ",
+    on_page="auf Seite ",
+    location_separator=" | Position ",
+    timestamp_separator=" | Hinzugefügt am ",
+    # Dienstag, 5. Mai 2020 23:26:59
+    timestamp_format=timestamps.LocalizedTimestampFormat(
+        pattern="{weekday}, {day}. {month} {year} {time}",
+        weekdays=(
+            "Montag",
+            "Dienstag",
+            "Mittwoch",
+            "Donnerstag",
+            "Freitag",
+            "Samstag",
+            "Sonntag",
+        ),
+        months=(
+            "Januar",
+            "Februar",
+            "März",
+            "April",
+            "Mai",
+            "Juni",
+            "Juli",
+            "August",
+            "September",
+            "Oktober",
+            "November",
+            "Dezember",
+        ),
+    ),
+)
+KINDLE_IT = ReaderFormat(
+    name="kindle_it",
+    prefixes=("- La tua ", "- Il tuo "),
+    clipping_types={
+        "evidenziazione": "Highlight",
+        "nota": "Note",
+        "segnalibro": "Bookmark",
+    },
+    at_location="alla posizione ",
+    on_page="a pagina ",
+    location_separator=" | posizione ",
+    timestamp_separator=" | Aggiunto in data ",
+    # martedì 5 maggio 2020 23:26:59
+    timestamp_format=timestamps.LocalizedTimestampFormat(
+        pattern="{weekday} {day} {month} {year} {time}",
+        weekdays=(
+            "lunedì",
+            "martedì",
+            "mercoledì",
+            "giovedì",
+            "venerdì",
+            "sabato",
+            "domenica",
+        ),
+        months=(
+            "gennaio",
+            "febbraio",
+            "marzo",
+            "aprile",
+            "maggio",
+            "giugno",
+            "luglio",
+            "agosto",
+            "settembre",
+            "ottobre",
+            "novembre",
+            "dicembre",
+        ),
+    ),
+)
+
+# Unicode normalization forms of parsed text; None keeps text as it is
+NORMALIZATIONS = (None, "NFC", "NFD", "NFKC", "NFKD")
+
+FORMATS: dict[str, ReaderFormat] = {}
+# Registered prefixes (for each normalization form) and numbers of spaces in
+# them, so the format of a line is found with a single lookup for each distinct
+# length, instead of a trial of every format
+_PREFIXES: dict[str | None, dict[str, ReaderFormat]] = {
+    normalization: {} for normalization in NORMALIZATIONS
+}
+_PREFIX_SPACES: list[int] = []
+
+
+def _normalize(reader_format: ReaderFormat, normalization: str | None) -> ReaderFormat:
+    """Normalize all texts of the format the same way as parsed clippings.
+
+    Parameters
+    ----------
+    reader_format : ReaderFormat
+        format as declared
+    normalization : str | None
+        Unicode normalization form, or None to keep texts as they are
+
+    Returns
+    -------
+    ReaderFormat
+        format with normalized texts
+    """
+    if normalization is None:
+        return reader_format
+
+    def normalize(text: str) -> str:
+        return unicodedata.normalize(normalization, text)
+
+    return replace(
+        reader_format,
+        prefixes=tuple(map(normalize, reader_format.prefixes)),
+        clipping_types={
+            normalize(word): clipping_type
+            for word, clipping_type in reader_format.clipping_types.items()
+        },
+        at_location=normalize(reader_format.at_location),
+        on_page=normalize(reader_format.on_page),
+        location_separator=normalize(reader_format.location_separator),
+        timestamp_separator=normalize(reader_format.timestamp_separator),
+    )
+
+
+def register_format(reader_format: ReaderFormat) -> ReaderFormat:
+    """Add format to the formats recognized by `parse_clipping`.
+
+    Format registered again under the same name replaces the previous one.
+
+    Parameters
+    ----------
+    reader_format : ReaderFormat
+        format to be registered
+
+    Returns
+    -------
+    ReaderFormat
+        registered format
+
+    Raises
+    ------
+    ValueError
+        when format has no prefixes, a prefix does not end with space or it is
+        already used by another format
+    """
+    if not reader_format.prefixes:
+        raise ValueError(f"Format {reader_format.name} has no prefixes")
+    normalized = {
+        normalization: _normalize(reader_format, normalization)
+        for normalization in NORMALIZATIONS
+    }
+    for normalization, normalized_format in normalized.items():
+        for prefix in normalized_format.prefixes:
+            if not prefix.endswith(" "):
+                raise ValueError(f"Prefix {prefix!r} has to end with a space")
+            owner = _PREFIXES[normalization].get(prefix)
+            if owner is not None and owner.name != reader_format.name:
+                raise ValueError(f"Prefix {prefix!r} is already used by {owner.name}")
+
+    for prefixes in _PREFIXES.values():
+        for prefix, owner in list(prefixes.items()):
+            if owner.name == reader_format.name:
+                del prefixes[prefix]
+    FORMATS[reader_format.name] = reader_format
+    if reader_format.timestamp_format is not None:
+        timestamps.register_timestamp_format(
+            reader_format.name, reader_format.timestamp_format
+        )
+    for normalization, normalized_format in normalized.items():
+        for prefix in normalized_format.prefixes:
+            _PREFIXES[normalization][prefix] = normalized_format
+    _PREFIX_SPACES[:] = sorted(
+        {prefix.count(" ") for prefixes in _PREFIXES.values() for prefix in prefixes}
+    )
+    return reader_format
+
+
+def find_format(
+    metadata: str, normalization: str | None = "NFKD"
+) -> tuple[ReaderFormat, str] | None:
+    """Find format of metadata line by its prefix.
+
+    Cost of the lookup depends on the number of distinct prefix lengths (in
+    words), not on the number of registered formats.
+
+    Parameters
+    ----------
+    metadata : str
+        metadata line, e.g. `- Your Highlight at location 6-7 | Added on ...`
+    normalization : str | None, optional
+        Unicode normalization form of the line, by default NFKD
+
+    Returns
+    -------
+    tuple[ReaderFormat, str] | None
+        format of the line (with texts in the same normalization form) and the
+        rest of the line after the prefix, or None when line does not start
+        with any registered prefix
+    """
+    prefixes = _PREFIXES[normalization]
+    for spaces in _PREFIX_SPACES:
+        words = metadata.split(" ", spaces)
+        if len(words) <= spaces:
+            return None
+        rest = words[-1]
+        reader_format = prefixes.get(metadata[: len(metadata) - len(rest)])
+        if reader_format is not None:
+            return reader_format, rest
+    return None
+
+
+def load_format(format_file: Path) -> ReaderFormat:
+    """Load format from JSON file and register it.
+
+    File has to contain `name` and `prefixes`; other fields of ReaderFormat
+    default to the grammar of English Kindle. `timestamp_format` is an object
+    with `pattern`, `weekdays` and `months` of LocalizedTimestampFormat.
+
+    Parameters
+    ----------
+    format_file : Path
+        path to JSON file
+
+    Returns
+    -------
+    ReaderFormat
+        registered format
+
+    Raises
+    ------
+    ValueError
+        when file is not a valid format
+    """
+    with open(format_file, encoding="utf-8") as file:
+        data = json.load(file)
+    names = {format_field.name for format_field in fields(ReaderFormat)}
+    if not isinstance(data, dict) or not {"name", "prefixes"} <= data.keys():
+        raise ValueError(
+            f"Format in {format_file} has to be a JSON object with name and prefixes"
+        )
+    if unknown := data.keys() - names:
+        raise ValueError(f"Format in {format_file} has unknown fields: {unknown}")
+    data["prefixes"] = tuple(data["prefixes"])
+    if (timestamp_format := data.get("timestamp_format")) is not None:
+        if not isinstance(timestamp_format, dict) or timestamp_format.keys() != {
+            "pattern",
+            "weekdays",
+            "months",
+        }:
+            raise ValueError(
+                f"Timestamp format in {format_file} has to be a JSON object with "
+                "pattern, weekdays and months"
+            )
+        data["timestamp_format"] = timestamps.LocalizedTimestampFormat(
+            pattern=timestamp_format["pattern"],
+            weekdays=tuple(timestamp_format["weekdays"]),
+            months=tuple(timestamp_format["months"]),
+        )
+    return register_format(ReaderFormat(**data))
+
+
+for _reader_format in (KINDLE_EN, KINDLE_DE, KINDLE_IT):
+    register_format(_reader_format)
@@ -1,44 +1,230 @@
-from clipping import Book, Clipping
+from clipping import Book, Clipping, intern_book
+import filters
+import formats
+import manifest
+import partitions
+import stats
+import templates
+import timestamps
 
-import re
+import bz2
+import gzip
+import lzma
+import os
+import secrets
+import sys
+import zipfile
 from pathlib import Path
-from typing import Generator
+from typing import Any, BinaryIO, Callable, Generator, Iterable, Mapping
 import unicodedata
-from collections import defaultdict
-
-# TODO: Add configuration files for readers different than Kindle Paperwhite 4
-# TODO: Simplify below regexes as now they unnecessarily complicated
-# TODO: Add more specific exceptions
-# TODO: Use `re.VERBOSE` to increase readability of these regexes
-PATTERN_A: re.Pattern = re.compile(
-    r"(?P<title>.*) \((?P<author>.*)\)\n- Your (?P<type>\w+) at location ((?P<location_start>\d+)-(?P<location_end>\d+)|(?P<location>\d+)) \| Added on (?P<timestamp>.*)\n\n(?P<content>.*)"
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
 )
+from contextlib import nullcontext
+from functools import lru_cache
+from time import perf_counter
+
+CLIPPING_SEPARATOR = b"=========="
+CHUNK_SIZE = 64 * 1024
+SHARD_SIZE = 4 * 1024 * 1024
+# Shards submitted to the pool ahead of the consumer, for each worker
+SHARDS_AHEAD = 2
+WRITERS = 8
+NORMALIZATION = "NFKD"
+# Compression of clippings files: magic bytes, file extension and opener
+COMPRESSIONS: dict[str, tuple[bytes, str, Callable[..., BinaryIO]]] = {
+    "gzip": (b"\x1f\x8b", ".gz", gzip.open),
+    "bz2": (b"BZh", ".bz2", bz2.open),
+    "xz": (b"\xfd7zXZ\x00", ".xz", lzma.open),
+}
 
-PATTERN_B: re.Pattern = re.compile(
-    r"(?P<title>.*) \((?P<author>.*)\)\n- Your (?P<type>\w+) on page (?P<page>\d+) \| location ((?P<location_start>\d+)-(?P<location_end>\d+)|(?P<location>\d+)) \| Added on (?P<timestamp>.*)\n\n(?P<content>.*)"
+# Shapes of metadata line, used as names of counters in statistics
+SHAPES = (
+    "shape: at location",
+    "shape: on page | location",
+    "shape: on page",
+    "shape: on page range",
 )
 
+# TODO: Add more specific exceptions
 
-PATTERN_C: re.Pattern = re.compile(
-    r"(?P<title>.*)\n- Your (?P<type>\w+) on page (?P<page>(\d+)) \| Added on (?P<timestamp>.*)\n\n(?P<content>.*)"
-)
 
-PATTERN_D: re.Pattern = re.compile(
-    r"(?P<title>.*)\n- Your (?P<type>\w+) on page (?P<page>\d+)-\d+ \| Added on (?P<timestamp>.*)\n\n(?P<content>.*)"
-)
+def _parse_range(text: str) -> tuple[int, int] | None:
+    """Parse `start-end` or single `number` range, as used for locations and pages.
+
+    Parameters
+    ----------
+    text : str
+        text containing the range, e.g. `1224-1227` or `1226`
+
+    Returns
+    -------
+    tuple[int, int] | None
+        start and end of range (equal for single number) or None if text is not
+        a valid range
+    """
+    start, dash, end = text.partition("-")
+    if not start.isdecimal():
+        return None
+    if not dash:
+        return int(start), int(start)
+    if not end.isdecimal():
+        return None
+    return int(start), int(end)
+
+
+def _split_title_and_author(title_line: str) -> tuple[str, str] | None:
+    """Split `Title (Author)` line into title and author.
+
+    The last parenthesised part of the line is treated as author, so titles
+    containing parentheses themselves are preserved.
+
+    Parameters
+    ----------
+    title_line : str
+        first line of the clipping
+
+    Returns
+    -------
+    tuple[str, str] | None
+        stripped title and author, or None when line has no author part
+    """
+    if not title_line.endswith(")"):
+        return None
+    title, separator, author = title_line[:-1].rpartition(" (")
+    if not separator:
+        return None
+    return title.strip(), author
+
+
+def _parse_position(
+    position: str, reader_format: formats.ReaderFormat
+) -> tuple[tuple[int, int] | tuple[None, None], int | None, bool, str] | None:
+    """Parse position part of metadata line, between clipping type and timestamp.
+
+    Parameters
+    ----------
+    position : str
+        position part, e.g. `on page 80 | location 1224-1227`
+    reader_format : formats.ReaderFormat
+        format of the metadata line
+
+    Returns
+    -------
+    tuple[tuple[int, int] | tuple[None, None], int | None, bool, str] | None
+        location, page, flag telling whether title line contains author and
+        name of the shape (one of SHAPES), or None when position has unknown
+        format
+    """
+    if position.startswith(reader_format.at_location):
+        location = _parse_range(position[len(reader_format.at_location) :])
+        return (location, None, True, SHAPES[0]) if location else None
+
+    if not position.startswith(reader_format.on_page):
+        return None
+    pages, separator, locations = position[len(reader_format.on_page) :].partition(
+        reader_format.location_separator
+    )
+    if separator:
+        location = _parse_range(locations)
+        if location is None or not pages.isdecimal():
+            return None
+        return location, int(pages), True, SHAPES[1]
+
+    page_range = _parse_range(pages)
+    if page_range is None:
+        return None
+    shape = SHAPES[2] if pages.isdecimal() else SHAPES[3]
+    return (None, None), page_range[0], False, shape
+
+
+def _parse_metadata(
+    title_line: str, metadata_line: str, normalization: str | None = NORMALIZATION
+) -> tuple[Book, str, str, tuple[int, int] | tuple[None, None], int | None] | None:
+    """Parse title and metadata lines of clipping, without its content.
 
+    Parameters
+    ----------
+    title_line : str
+        first line of the clipping, with title and author
+    metadata_line : str
+        second line of the clipping, with type, position and timestamp
+    normalization : str | None, optional
+        Unicode normalization form of the text, by default NORMALIZATION
+
+    Returns
+    -------
+    tuple[Book, str, str, tuple[int, int] | tuple[None, None], int | None] | None
+        book, clipping type, timestamp, location and page of the clipping, or
+        None when lines have unknown format
+    """
+    found = formats.find_format(metadata_line, normalization)
+    if found is None:
+        return None
+    reader_format, metadata = found
+
+    clipping_type, _, position = metadata.partition(" ")
+    if reader_format.clipping_types:
+        clipping_type = reader_format.clipping_types.get(clipping_type, "")
+    position, separator, timestamp = position.partition(
+        reader_format.timestamp_separator
+    )
+    parsed_position = _parse_position(position, reader_format) if separator else None
+    if parsed_position is None or not clipping_type.replace("_", "").isalnum():
+        return None
+    location, page, with_author, shape = parsed_position
 
-def parse_clipping(clipping: str) -> Clipping:
+    if not with_author:
+        title, author = title_line.strip(), ""
+    elif title_and_author := _split_title_and_author(title_line):
+        title, author = title_and_author
+    else:
+        return None
+    if stats.ACTIVE is not None:
+        stats.ACTIVE.count(shape)
+    return (
+        intern_book(author, title),
+        sys.intern(clipping_type),
+        timestamp,
+        location,
+        page,
+    )
+
+
+def parse_clipping(
+    clipping: str, normalization: str | None = NORMALIZATION
+) -> Clipping:
     """Given clipping in a str format, return it as Clipping format.
 
     Clipping format may contain both Highlight and Note.
     Book object is created, too, to make it possible later
     to filter all clippings by book author/title.
 
+    Metadata line is read once and the shape of the clipping is chosen directly
+    from it. Supported shapes are:
+
+        - Your Highlight at location 6-7 | Added on ...
+        - Your Highlight on page 80 | location 1224-1227 | Added on ...
+        - Your Note on page 1 | Added on ...
+        - Your Highlight on page 1-1 | Added on ...
+
+    Only the first two shapes (with location) separate author from the title.
+    Wording of metadata line depends on the reader and its language, and it is
+    looked up in `formats` registry by the beginning of the line.
+
     Parameters
     ----------
     clipping : str
         multiline text string with clipping from Kindle
+    normalization : str | None, optional
+        Unicode normalization form of the text, used to match wording of
+        metadata line, by default NORMALIZATION
 
     Returns
     -------
@@ -50,68 +236,554 @@ def parse_clipping(clipping: str) -> Clipping:
     ValueError
         when unknown format of clipping is used in provided clipping
     """
-    for pattern in [PATTERN_A, PATTERN_B, PATTERN_C, PATTERN_D]:
-        if match := pattern.search(clipping):
-            break
-    else:
+    lines = clipping.lstrip().split("\n", 3)
+    metadata = None
+    if len(lines) == 4 and not lines[2]:
+        metadata = _parse_metadata(lines[0], lines[1], normalization)
+    if metadata is None:
         raise ValueError(f"Pattern for clipping:\n\n{clipping}\n\nis not defined!")
+    book, clipping_type, timestamp, location, page = metadata
 
-    try:
-        author = match.group("author")
-    except IndexError:
-        author = ""
+    return Clipping(
+        book=book,
+        timestamp=timestamp,
+        clipping_type=clipping_type,
+        content=lines[3].partition("\n")[0],
+        location=location,
+        page=page,
+    )
 
-    title = match.group("title").strip()
 
-    book = Book(author=author, title=title)
+def detect_compression(file_location: Path) -> str | None:
+    """Detect compression of the file by its magic bytes or extension.
 
-    location: tuple[int, int] | tuple[None, None]
-    if "location" in match.groupdict() and match.group("location") is not None:
-        location = (int(match.group("location")), int(match.group("location")))
-    elif "location" not in match.groupdict():
-        location = (None, None)
-    else:
-        location = (
-            int(match.group("location_start")),
-            int(match.group("location_end")),
+    Parameters
+    ----------
+    file_location : Path
+        path to the file
+
+    Returns
+    -------
+    str | None
+        name of compression (one of COMPRESSIONS) or None for plain file
+    """
+    with open(file_location, "rb") as file:
+        head = file.read(max(len(magic) for magic, _, _ in COMPRESSIONS.values()))
+    for name, (magic, _, _) in COMPRESSIONS.items():
+        if head.startswith(magic):
+            return name
+    suffix = Path(file_location).suffix.lower()
+    for name, (_, extension, _) in COMPRESSIONS.items():
+        if suffix == extension:
+            return name
+    return None
+
+
+def open_clippings(file_location: Path) -> BinaryIO:
+    """Open file with clippings in binary mode, decompressing it on the fly.
+
+    Parameters
+    ----------
+    file_location : Path
+        path to plain or compressed (gzip, bz2 or xz) Kindle file
+
+    Returns
+    -------
+    BinaryIO
+        file yielding uncompressed content
+    """
+    if (compression := detect_compression(file_location)) is None:
+        return open(file_location, "rb")
+    stats.count(f"{compression} input")
+    return COMPRESSIONS[compression][2](file_location, "rb")
+
+
+def _iter_raw_clippings(
+    file: BinaryIO, chunk_size: int = CHUNK_SIZE
+) -> Generator[bytes, None, None]:
+    """Scan binary file chunk by chunk and yield raw clippings between separators.
+
+    Only the currently incomplete clipping is kept in the buffer, so memory usage
+    does not depend on the size of the file.
+
+    Parameters
+    ----------
+    file : BinaryIO
+        file opened in binary mode
+    chunk_size : int, optional
+        number of bytes read at once, by default CHUNK_SIZE
+
+    Yields
+    ------
+    Generator[bytes, None, None]
+        generator yielding raw, undecoded clippings
+    """
+    buffer = b""
+    while chunk := file.read(chunk_size):
+        buffer += chunk
+        *raw_clippings, buffer = buffer.split(CLIPPING_SEPARATOR)
+        yield from raw_clippings
+    yield buffer
+
+
+def _decode_clipping(
+    raw_clipping: bytes, normalization: str | None = NORMALIZATION
+) -> str:
+    """Decode single raw clipping and normalize its content.
+
+    Different books may have different encodings, hence the normalization.
+    Line endings are unified the same way as in files opened in text mode.
+    ASCII clippings and clippings already in the normalization form (e.g.
+    English ones with typographic quotes) are not copied again.
+
+    Parameters
+    ----------
+    raw_clipping : bytes
+        raw clipping as read from file
+    normalization : str | None, optional
+        Unicode normalization form, or None to keep text as it is, by default
+        NORMALIZATION
+
+    Returns
+    -------
+    str
+        decoded and normalized clipping
+    """
+    clipping = raw_clipping.decode("utf-8")
+    if "\r" in clipping:
+        clipping = clipping.replace("\r\n", "\n").replace("\r", "\n")
+    if clipping.isascii():
+        return clipping
+    if normalization and not unicodedata.is_normalized(normalization, clipping):
+        clipping = unicodedata.normalize(normalization, clipping)
+    return clipping.replace("\ufeff", "") if "\ufeff" in clipping else clipping
+
+
+@lru_cache(maxsize=4096)
+def _title_line_may_match(
+    clipping_filter: filters.ClippingFilter,
+    raw_title_line: bytes,
+    normalization: str | None,
+) -> bool:
+    """Check raw title line with the filter, once for each distinct title line.
+
+    Parameters
+    ----------
+    clipping_filter : filters.ClippingFilter
+        criteria of parsed clippings
+    raw_title_line : bytes
+        first line of raw clipping
+    normalization : str | None
+        Unicode normalization form
+
+    Returns
+    -------
+    bool
+        False when no clipping with this title line matches the filter
+    """
+    title_line = _decode_clipping(raw_title_line.rstrip(b"\r"), normalization)
+    return clipping_filter.may_match_title_line(title_line)
+
+
+def _parse_raw_clipping(
+    raw_clipping: bytes,
+    normalization: str | None = NORMALIZATION,
+    clipping_filter: filters.ClippingFilter | None = None,
+) -> Clipping | None:
+    """Decode single raw clipping and parse it.
+
+    With a filter, only title and metadata lines are decoded and parsed first,
+    and content is decoded only when clipping matches the filter. Raw clippings
+    whose lines cannot be split this way are decoded and parsed as a whole.
+
+    Parameters
+    ----------
+    raw_clipping : bytes
+        raw clipping as read from file
+    normalization : str | None, optional
+        Unicode normalization form, by default NORMALIZATION
+    clipping_filter : filters.ClippingFilter | None, optional
+        criteria of parsed clippings, already normalized with
+        `ClippingFilter.normalized`; by default all clippings are parsed
+
+    Returns
+    -------
+    Clipping | None
+        parsed Clipping or None when raw clipping is empty or does not match
+        the filter
+    """
+    if clipping_filter is not None:
+        lines = raw_clipping.lstrip().split(b"\n", 3)
+        if len(lines) == 4 and not lines[2].rstrip(b"\r"):
+            if not _title_line_may_match(clipping_filter, lines[0], normalization):
+                return None
+            header = _decode_clipping(
+                lines[0].rstrip(b"\r") + b"\n" + lines[1].rstrip(b"\r"), normalization
+            )
+            title_line, _, metadata_line = header.partition("\n")
+            metadata = _parse_metadata(title_line, metadata_line, normalization)
+            if metadata is not None:
+                book, clipping_type, timestamp, location, page = metadata
+                if not clipping_filter.matches(book, clipping_type, timestamp):
+                    return None
+                content = _decode_clipping(
+                    lines[3].partition(b"\n")[0].rstrip(b"\r"), normalization
+                )
+                return Clipping(
+                    book=book,
+                    timestamp=timestamp,
+                    clipping_type=clipping_type,
+                    content=content.partition("\n")[0],
+                    location=location,
+                    page=page,
+                )
+
+    clipping = _decode_clipping(raw_clipping, normalization)
+    if not clipping.strip():
+        return None
+    parsed = parse_clipping(clipping, normalization)
+    if clipping_filter is not None and not clipping_filter.matches(
+        parsed.book, parsed.clipping_type, parsed.timestamp
+    ):
+        return None
+    return parsed
+
+
+def _parse_raw_clippings(
+    raw_clippings: Iterable[bytes],
+    normalization: str | None = NORMALIZATION,
+    clipping_filter: filters.ClippingFilter | None = None,
+) -> Generator[Clipping, None, None]:
+    """Decode raw clippings and parse them, skipping empty ones.
+
+    Parameters
+    ----------
+    raw_clippings : Iterable[bytes]
+        raw clippings split on separator
+    normalization : str | None, optional
+        Unicode normalization form, by default NORMALIZATION
+    clipping_filter : filters.ClippingFilter | None, optional
+        criteria of parsed clippings, by default all clippings are parsed
+
+    Yields
+    ------
+    Generator[Clipping, None, None]
+        generator yielding parsed Clippings
+    """
+    if clipping_filter is not None:
+        # Criteria are compared with normalized titles and authors
+        clipping_filter = clipping_filter.normalized(normalization)
+    if stats.ACTIVE is not None:
+        yield from _parse_raw_clippings_with_stats(
+            raw_clippings, normalization, clipping_filter, stats.ACTIVE
         )
+        return
 
-    page = int(match.group("page")) if "page" in match.groupdict() else None
-    return Clipping(
-        book=book,
-        timestamp=match.group("timestamp"),
-        clipping_type=match.group("type"),
-        content=match.group("content"),
-        location=location,
-        page=page,
+    for raw_clipping in raw_clippings:
+        clipping = _parse_raw_clipping(raw_clipping, normalization, clipping_filter)
+        if clipping is not None:
+            yield clipping
+
+
+def _parse_raw_clippings_with_stats(
+    raw_clippings: Iterable[bytes],
+    normalization: str | None,
+    clipping_filter: filters.ClippingFilter | None,
+    collected: stats.Stats,
+) -> Generator[Clipping, None, None]:
+    """Do the same as `_parse_raw_clippings`, measuring time of each step.
+
+    Parameters
+    ----------
+    raw_clippings : Iterable[bytes]
+        raw clippings split on separator
+    normalization : str | None
+        Unicode normalization form
+    clipping_filter : filters.ClippingFilter | None
+        criteria of parsed clippings
+    collected : stats.Stats
+        statistics to be updated
+
+    Yields
+    ------
+    Generator[Clipping, None, None]
+        generator yielding parsed Clippings
+    """
+    if clipping_filter is not None:
+        # Decoding and parsing are interleaved, so they are measured together
+        for raw_clipping in collected.timed("read and split", raw_clippings):
+            start = perf_counter()
+            clipping = _parse_raw_clipping(raw_clipping, normalization, clipping_filter)
+            collected.add_time("filter and parse", perf_counter() - start)
+            if clipping is None:
+                if raw_clipping.strip():
+                    collected.count("clippings filtered out")
+                continue
+            collected.count("clippings parsed")
+            yield clipping
+        return
+
+    for raw_clipping in collected.timed("read and split", raw_clippings):
+        start = perf_counter()
+        clipping = _decode_clipping(raw_clipping, normalization)
+        decoded = perf_counter()
+        collected.add_time("decode and normalize", decoded - start)
+        if clipping.strip():
+            parsed = parse_clipping(clipping, normalization)
+            collected.add_time("parse_clipping", perf_counter() - decoded)
+            collected.count("clippings parsed")
+            yield parsed
+
+
+def _find_shard_boundaries(file: BinaryIO, shard_count: int) -> list[int]:
+    """Split file into byte ranges of similar size, each ending right after separator.
+
+    Parameters
+    ----------
+    file : BinaryIO
+        file opened in binary mode
+    shard_count : int
+        requested number of shards; less may be returned for files with
+        few separators
+
+    Returns
+    -------
+    list[int]
+        sorted offsets, starting with 0 and ending with size of the file
+    """
+    size = file.seek(0, os.SEEK_END)
+    boundaries = [0]
+    for shard in range(1, shard_count):
+        offset = max(size * shard // shard_count, boundaries[-1])
+        file.seek(offset)
+        buffer = b""
+        while chunk := file.read(CHUNK_SIZE):
+            buffer += chunk
+            if (position := buffer.find(CLIPPING_SEPARATOR)) != -1:
+                boundaries.append(offset + position + len(CLIPPING_SEPARATOR))
+                break
+            # Keep the tail in case separator is split between chunks
+            offset += len(buffer) - len(CLIPPING_SEPARATOR) + 1
+            buffer = buffer[-len(CLIPPING_SEPARATOR) + 1 :]
+        else:
+            break
+    boundaries.append(size)
+    return sorted(set(boundaries))
+
+
+def _initialize_worker(reader_formats: list[formats.ReaderFormat]) -> None:
+    """Register reader formats of the parent in worker process.
+
+    Workers started with `spawn` or `forkserver` only know the built-in
+    formats, not those loaded e.g. with `formats.load_format`.
+
+    Parameters
+    ----------
+    reader_formats : list[formats.ReaderFormat]
+        formats registered in the parent process
+    """
+    for reader_format in reader_formats:
+        if formats.FORMATS.get(reader_format.name) != reader_format:
+            formats.register_format(reader_format)
+
+
+def _parse_shard(
+    file_location: Path,
+    start: int,
+    end: int,
+    normalization: str | None,
+    clipping_filter: filters.ClippingFilter | None = None,
+) -> list[Clipping]:
+    """Parse clippings from given byte range of the file.
+
+    Used as a task for worker processes in parallel mode.
+
+    Parameters
+    ----------
+    file_location : Path
+        path to Kindle file with clippings
+    start : int
+        offset right after a separator (or beginning of file)
+    end : int
+        offset right after a separator (or end of file)
+    normalization : str | None
+        Unicode normalization form
+    clipping_filter : filters.ClippingFilter | None, optional
+        criteria of parsed clippings, by default all clippings are parsed
+
+    Returns
+    -------
+    list[Clipping]
+        parsed Clippings in file order
+    """
+    with open(file_location, "rb") as file:
+        file.seek(start)
+        data = file.read(end - start)
+    return list(
+        _parse_raw_clippings(
+            data.split(CLIPPING_SEPARATOR), normalization, clipping_filter
+        )
     )
 
 
-def parse_my_clippings(file_location: Path) -> Generator[Clipping, None, None]:
-    """Read file with clippings and yield split clippings as Clippings.
+def _parse_shard_with_stats(
+    file_location: Path,
+    start: int,
+    end: int,
+    normalization: str | None,
+    clipping_filter: filters.ClippingFilter | None = None,
+) -> tuple[list[Clipping], stats.Stats]:
+    """Do the same as `_parse_shard`, returning statistics of the worker too."""
+    with stats.collect() as collected:
+        clippings = _parse_shard(
+            file_location, start, end, normalization, clipping_filter
+        )
+    return clippings, collected
+
+
+def create_parser_pool(jobs: int) -> ProcessPoolExecutor:
+    """Create process pool parsing shards of files, e.g. shared by many files.
+
+    Parameters
+    ----------
+    jobs : int
+        number of worker processes
+
+    Returns
+    -------
+    ProcessPoolExecutor
+        pool whose workers know formats registered in this process
+    """
+    return ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_initialize_worker,
+        initargs=(list(formats.FORMATS.values()),),
+    )
+
+
+def _parse_my_clippings_in_parallel(
+    file_location: Path,
+    jobs: int,
+    normalization: str | None,
+    clipping_filter: filters.ClippingFilter | None = None,
+    executor: ProcessPoolExecutor | None = None,
+) -> Generator[Clipping, None, None]:
+    """Parse shards of the file in a process pool, yielding in file order.
+
+    At most SHARDS_AHEAD shards for each worker are parsed ahead of the
+    consumer, so parsed clippings of the whole file are not buffered.
 
     Parameters
     ----------
     file_location : Path
         path to Kindle file with clippings
+    jobs : int
+        number of worker processes
+    normalization : str | None
+        Unicode normalization form
+    clipping_filter : filters.ClippingFilter | None, optional
+        criteria of parsed clippings, by default all clippings are parsed
+    executor : ProcessPoolExecutor | None, optional
+        pool from `create_parser_pool`, by default a new pool is created for
+        the file
 
     Yields
     ------
     Generator[Clipping, None, None]
         generator yielding parsed Clippings
     """
-    CLIPPING_SEPARATOR = "=========="
+    with open(file_location, "rb") as file:
+        size = file.seek(0, os.SEEK_END)
+        shard_count = max(jobs, -(-size // SHARD_SIZE))
+        boundaries = _find_shard_boundaries(file, shard_count)
+
+    if len(boundaries) <= 2:
+        yield from _parse_shard(file_location, 0, size, normalization, clipping_filter)
+        return
+
+    # Statistics of workers are added to those of the parent, so timers of
+    # parsing stages are sums of time spent by all workers
+    collected = stats.ACTIVE
+    task = _parse_shard if collected is None else _parse_shard_with_stats
+
+    def shard_clippings(future: Future) -> list[Clipping]:
+        if collected is None:
+            return future.result()
+        clippings, worker_stats = future.result()
+        collected.merge(worker_stats)
+        return clippings
+
+    pending: deque[Future] = deque()
+    with (
+        create_parser_pool(jobs) if executor is None else nullcontext(executor) as pool
+    ):
+        for start, end in zip(boundaries[:-1], boundaries[1:]):
+            pending.append(
+                pool.submit(
+                    task, file_location, start, end, normalization, clipping_filter
+                )
+            )
+            if len(pending) >= SHARDS_AHEAD * jobs:
+                yield from shard_clippings(pending.popleft())
+        while pending:
+            yield from shard_clippings(pending.popleft())
+
+
+def parse_my_clippings(
+    file_location: Path,
+    chunk_size: int = CHUNK_SIZE,
+    jobs: int = 1,
+    normalization: str | None = NORMALIZATION,
+    clipping_filter: filters.ClippingFilter | None = None,
+    executor: ProcessPoolExecutor | None = None,
+) -> Generator[Clipping, None, None]:
+    """Read file with clippings and yield split clippings as Clippings.
+
+    File is read in chunks and each clipping is yielded as soon as its separator
+    is found, so the whole file is never kept in memory.
+
+    With `jobs` greater than 1, file is split into byte ranges aligned to
+    separators, which are parsed in a pool of worker processes. Clippings are
+    still yielded in the order of the file.
+
+    Files compressed with gzip, bz2 or xz (recognised by magic bytes or
+    extension) are decompressed while they are read. They cannot be split
+    into byte ranges, so they are always parsed in a single process.
+
+    Parameters
+    ----------
+    file_location : Path
+        path to Kindle file with clippings
+    chunk_size : int, optional
+        number of bytes read from file at once, by default CHUNK_SIZE
+    jobs : int, optional
+        number of worker processes used for parsing, by default 1
+    normalization : str | None, optional
+        Unicode normalization form of parsed text (NFC, NFD, NFKC or NFKD), or
+        None to keep text as it is in the file, by default NORMALIZATION
+    clipping_filter : filters.ClippingFilter | None, optional
+        criteria of yielded clippings; clippings which do not match it, and all
+        Bookmarks, are rejected by their title and metadata lines, before
+        content is decoded. By default all clippings are yielded
+    executor : ProcessPoolExecutor | None, optional
+        pool from `create_parser_pool` used with `jobs` greater than 1, e.g.
+        shared by files parsed at once; by default a new pool is created
 
-    with open(file_location, encoding="utf-8-sig") as file:
-        # Read file and normalize its content - different books may have different encodings
-        file_content = (
-            unicodedata.normalize("NFKD", file.read()).strip().replace("\ufeff", "")
+    Yields
+    ------
+    Generator[Clipping, None, None]
+        generator yielding parsed Clippings
+    """
+    if jobs > 1 and detect_compression(file_location) is None:
+        yield from _parse_my_clippings_in_parallel(
+            file_location, jobs, normalization, clipping_filter, executor
         )
-        raw_clippings = file_content.split(CLIPPING_SEPARATOR)
+        return
 
-    for clipping in raw_clippings:
-        if clipping:
-            yield parse_clipping(clipping)
+    with open_clippings(file_location) as file:
+        yield from _parse_raw_clippings(
+            _iter_raw_clippings(file, chunk_size), normalization, clipping_filter
+        )
 
 
 def sort_clippings(clippings: list[Clipping]) -> dict[Book, list[Clipping]]:
@@ -155,45 +827,307 @@ def sort_clippings(clippings: list[Clipping]) -> dict[Book, list[Clipping]]:
         mapping of books to clippings
     """
     result = defaultdict(list)
-    for clipping in clippings:
-        if clipping.clipping_type == "Bookmark":
-            continue
-        result[clipping.book].append(clipping)
+    bookmarks = 0
+    with stats.timer("sort_clippings"):
+        for clipping in clippings:
+            if clipping.clipping_type == "Bookmark":
+                bookmarks += 1
+                continue
+            result[clipping.book].append(clipping)
+    stats.count("bookmarks skipped", bookmarks)
     return result
 
 
+def _location_key(clipping: Clipping) -> tuple:
+    """Return key ordering clippings by location, then by page and time."""
+    location_start, location_end = clipping.location
+    return (
+        location_start is None,
+        location_start or 0,
+        location_end or 0,
+        clipping.page is None,
+        clipping.page or 0,
+        timestamps.clipping_time(clipping),
+    )
+
+
+def _page_key(clipping: Clipping) -> tuple:
+    """Return key ordering clippings by page, then by location and time."""
+    location_start, location_end = clipping.location
+    return (
+        clipping.page is None,
+        clipping.page or 0,
+        location_start is None,
+        location_start or 0,
+        location_end or 0,
+        timestamps.clipping_time(clipping),
+    )
+
+
+SORT_KEYS: dict[str, Callable[[Clipping], Any]] = {
+    "location": _location_key,
+    "page": _page_key,
+    "time": timestamps.clipping_time,
+}
+
+
+def order_clippings(
+    mapping: Mapping[Book, list[Clipping]], order: str = "location"
+) -> Mapping[Book, list[Clipping]]:
+    """Sort clippings of each book by location, page or time.
+
+    Sort key of each clipping is computed once and sorting is stable, so
+    clippings with equal keys stay in order of the file. Mappings other than
+    dict (e.g. `partitions.PartitionedClippings`) are sorted lazily, as each
+    book is accessed.
+
+    Parameters
+    ----------
+    mapping : Mapping[Book, list[Clipping]]
+        mapping books and clippings
+    order : str, optional
+        one of SORT_KEYS: `location`, `page` or `time`, by default `location`
+
+    Returns
+    -------
+    Mapping[Book, list[Clipping]]
+        mapping books and sorted clippings
+
+    Raises
+    ------
+    ValueError
+        when order is unknown
+    """
+    if order not in SORT_KEYS:
+        raise ValueError(f"Unknown order of clippings: {order}")
+    key = SORT_KEYS[order]
+    if not isinstance(mapping, dict):
+        return partitions.TransformedClippings(
+            mapping, lambda clippings: sorted(clippings, key=key)
+        )
+    with stats.timer("order_clippings"):
+        return {book: sorted(clippings, key=key) for book, clippings in mapping.items()}
+
+
+_render_default = templates.compile_template(templates.Template())
+
+
+def render_book(book: Book, clippings: list[Clipping]) -> str:
+    """Render markdown file content with all notes and highlights of the book.
+
+    Default template is used, see `templates` module for custom ones.
+
+    Parameters
+    ----------
+    book : Book
+        book to be rendered
+    clippings : list[Clipping]
+        non-empty list of clippings of the book
+
+    Returns
+    -------
+    str
+        content of markdown file
+    """
+    return _render_default(book, clippings)
+
+
+@dataclass
+class DumpSummary:
+    """Numbers of markdown files written and skipped as unchanged."""
+
+    written: int = 0
+    skipped: int = 0
+
+
+def _create_temporary_file(directory: Path) -> tuple[int, str]:
+    """Create new hidden file with a random name, opened for writing.
+
+    Unlike `tempfile.mkstemp`, which creates files readable only by the owner,
+    the file gets the same mode as one created with `open` under the current
+    umask.
+
+    Parameters
+    ----------
+    directory : Path
+        directory of the file, e.g. of the file it will replace
+
+    Returns
+    -------
+    tuple[int, str]
+        file descriptor and path of the file
+    """
+    while True:
+        name = os.path.join(directory, f".{secrets.token_hex(8)}.tmp")
+        try:
+            return os.open(name, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666), name
+        except FileExistsError:
+            continue
+
+
+def _write_atomically(filename: Path, content: str) -> None:
+    """Write content to a temporary file and move it in place of target file.
+
+    Target file is never left half-written, even when process is killed. It
+    gets the same mode as a file created with `open`.
+
+    Parameters
+    ----------
+    filename : Path
+        path of target file
+    content : str
+        content of the file
+    """
+    descriptor, temporary_name = _create_temporary_file(filename.parent)
+    try:
+        with open(descriptor, "w", encoding="utf-8") as file:
+            file.write(content)
+        os.replace(temporary_name, filename)
+    except BaseException:
+        os.unlink(temporary_name)
+        raise
+
+
+def _dump_books_to_zip(
+    mapping: Mapping[Book, list[Clipping]],
+    archive_location: Path,
+    render: templates.BookRenderer,
+) -> DumpSummary:
+    """Render each book straight into a member of a new zip archive.
+
+    Archive is written to a temporary file and moved in place of the target,
+    so it is never left half-written.
+
+    Parameters
+    ----------
+    mapping : Mapping[Book, list[Clipping]]
+        mapping books and clippings
+    archive_location : Path
+        path of zip archive, replaced when it exists
+    render : templates.BookRenderer
+        function rendering markdown file of a book
+
+    Returns
+    -------
+    DumpSummary
+        number of books written to the archive
+    """
+    summary = DumpSummary()
+    descriptor, temporary_name = _create_temporary_file(archive_location.parent)
+    try:
+        with (
+            stats.timer("dump_book_to_markdown"),
+            open(descriptor, "wb") as file,
+            zipfile.ZipFile(file, "w", zipfile.ZIP_DEFLATED) as archive,
+        ):
+            for book, clippings in mapping.items():
+                with stats.timer("render"):
+                    content = render(book, clippings).encode("utf-8")
+                archive.writestr(f"{str(book)}.md", content)
+                summary.written += 1
+                if stats.ACTIVE is not None:
+                    stats.ACTIVE.count("bytes written", len(content))
+        os.replace(temporary_name, archive_location)
+    except BaseException:
+        os.unlink(temporary_name)
+        raise
+    stats.count("books written", summary.written)
+    return summary
+
+
 def dump_book_to_markdown(
-    mapping: dict[Book, list[Clipping]], target_location: Path
-) -> None:
+    mapping: Mapping[Book, list[Clipping]],
+    target_location: Path,
+    workers: int = WRITERS,
+    template: templates.Template | None = None,
+) -> DumpSummary:
     """Create file for each book and dump all notes and highlights to this file.
 
+    Hashes of written files are kept in a manifest in target directory, and
+    files whose content would not change are not written again, so they keep
+    their modification time.
+
+    Each book is rendered into single buffer, which is written to a temporary
+    file and moved in place by a pool of threads, so files always appear
+    complete and latency of slow (e.g. network) file systems overlaps. Books
+    are accessed one by one, so partitions of `partitions.PartitionedClippings`
+    are loaded in turn.
+
+    When target location is a path ending with `.zip` (and not an existing
+    directory), books are instead rendered straight into a single zip archive
+    in one pass, without manifest and without creating separate files.
+
     Parameters
     ----------
-    mapping : dict[Book, list[Clipping]]
+    mapping : Mapping[Book, list[Clipping]]
         mapping books and clippings
     target_location : Path
-        target directory in which new files should be created
+        target directory in which new files should be created, or path of zip
+        archive
+    workers : int, optional
+        number of threads writing files, by default WRITERS
+    template : templates.Template | None, optional
+        template of markdown files, by default the same as in `render_book`
+
+    Returns
+    -------
+    DumpSummary
+        numbers of written and skipped files
 
     Raises
     ------
     FileNotFoundError
-        when target directory does not exist
+        when target directory (or directory of zip archive) does not exist
     """
+    render = render_book if template is None else templates.compile_template(template)
+    if target_location.suffix.lower() == ".zip" and not target_location.is_dir():
+        return _dump_books_to_zip(mapping, target_location, render)
     if target_location.is_dir() is False:
         # TODO: Improve handling this exception
         raise FileNotFoundError(f"{target_location} is not a directory!")
 
-    for book, clippings in mapping.items():
-        filename = target_location / f"{str(book)}.md"
-        with open(filename, "w") as file:
-            # TODO: Templating would be nice here.
-            file.write(f"# {str(book)}\n\n")
-            # TODO: Sort clippings by their timestamps.
-            # TODO: Split functionality for headers and content
-            # TODO: As templates are added,
-            file.write(f"**First note**: {clippings[0].timestamp}\n")
-            file.write(f"**Last note**: {clippings[-1].timestamp}\n\n")
-            file.write("## Notes & Highlights from Kindle\n\n")
-
-            for clipping in clippings:
-                file.write(str(clipping))
+    manifest_file = target_location / manifest.MANIFEST_FILENAME
+    hashes = manifest.load_manifest(manifest_file)
+    summary = DumpSummary()
+    pending: dict[Future, tuple[str, str]] = {}
+
+    def collect(futures: Iterable[Future]) -> None:
+        for future in futures:
+            future.result()
+            filename, content_hash = pending.pop(future)
+            hashes[filename] = content_hash
+            summary.written += 1
+
+    try:
+        with (
+            stats.timer("dump_book_to_markdown"),
+            ThreadPoolExecutor(max_workers=workers) as executor,
+        ):
+            for book, clippings in mapping.items():
+                filename = f"{str(book)}.md"
+                with stats.timer("render"):
+                    content = render(book, clippings)
+                content_hash = manifest.content_hash(content)
+                if (
+                    hashes.get(filename) == content_hash
+                    and (target_location / filename).exists()
+                ):
+                    summary.skipped += 1
+                    continue
+
+                # Limit number of rendered books waiting in memory
+                if len(pending) >= 2 * workers:
+                    collect(wait(pending, return_when=FIRST_COMPLETED).done)
+                future = executor.submit(
+                    _write_atomically, target_location / filename, content
+                )
+                pending[future] = (filename, content_hash)
+                if stats.ACTIVE is not None:
+                    stats.ACTIVE.count("bytes written", len(content.encode("utf-8")))
+            collect(list(pending))
+    finally:
+        if summary.written:
+            manifest.save_manifest(hashes, manifest_file)
+        stats.count("books written", summary.written)
+        stats.count("books unchanged", summary.skipped)
+    return summary
@@ -0,0 +1,62 @@
+"""Module with manifest of content hashes of already written markdown files."""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+MANIFEST_FILENAME = ".kindleparse-manifest.json"
+
+
+def content_hash(content: str) -> str:
+    """Return hash identifying content of markdown file.
+
+    Parameters
+    ----------
+    content : str
+        rendered content of the file
+
+    Returns
+    -------
+    str
+        SHA-256 hex digest of UTF-8 encoded content
+    """
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def load_manifest(manifest_file: Path) -> dict[str, str]:
+    """Load mapping of file names to hashes of their content.
+
+    Parameters
+    ----------
+    manifest_file : Path
+        path to manifest file
+
+    Returns
+    -------
+    dict[str, str]
+        mapping of file names to content hashes, empty when manifest is missing
+        or malformed
+    """
+    try:
+        with open(manifest_file, encoding="utf-8") as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def save_manifest(manifest: dict[str, str], manifest_file: Path) -> None:
+    """Atomically save mapping of file names to hashes of their content.
+
+    Parameters
+    ----------
+    manifest : dict[str, str]
+        mapping of file names to content hashes
+    manifest_file : Path
+        path to manifest file
+    """
+    temporary_file = manifest_file.with_name(manifest_file.name + ".tmp")
+    with open(temporary_file, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, ensure_ascii=False, indent=0, sort_keys=True)
+    os.replace(temporary_file, manifest_file)
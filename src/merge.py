@@ -0,0 +1,119 @@
+"""Module with merging of clippings files from multiple devices."""
+
+from clipping import Clipping
+import filters
+import kindle_parser
+import stats
+import timestamps
+
+import hashlib
+import heapq
+from collections.abc import Iterable
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Generator
+
+
+def _clipping_digest(clipping: Clipping) -> bytes:
+    """Return digest identifying clipping regardless of device and time.
+
+    Digest of fixed size is kept instead of the clipping itself, so memory used
+    for detection of duplicates does not depend on length of their content.
+
+    Parameters
+    ----------
+    clipping : Clipping
+        clipping to be identified
+
+    Returns
+    -------
+    bytes
+        digest of book, type, location, page and content of the clipping
+    """
+    key = "\0".join(
+        map(
+            str,
+            (
+                clipping.book.author,
+                clipping.book.title,
+                clipping.clipping_type,
+                *clipping.location,
+                clipping.page,
+                clipping.content,
+            ),
+        )
+    )
+    return hashlib.blake2b(key.encode(), digest_size=16).digest()
+
+
+def merge_clippings(
+    streams: Iterable[Iterable[Clipping]],
+) -> Generator[Clipping, None, None]:
+    """Merge streams of clippings in order of their timestamps, dropping duplicates.
+
+    Each stream is expected in chronological order, as clippings are appended to
+    the file on the device. Only the current clipping of each stream is kept in
+    the heap. Clipping with the same book, type, location, page and content as an
+    earlier one (e.g. the same passage highlighted on another device) is dropped.
+    Digests of yielded clippings are kept for that, so memory grows with the
+    number of unique clippings (by 16 bytes of digest and overhead of the set).
+
+    Parameters
+    ----------
+    streams : Iterable[Iterable[Clipping]]
+        streams of clippings, e.g. from `parse_my_clippings`
+
+    Yields
+    ------
+    Generator[Clipping, None, None]
+        generator yielding merged Clippings
+    """
+    seen: set[bytes] = set()
+    for clipping in heapq.merge(*streams, key=timestamps.clipping_time):
+        digest = _clipping_digest(clipping)
+        if digest in seen:
+            stats.count("duplicates dropped")
+            continue
+        seen.add(digest)
+        yield clipping
+
+
+def merge_my_clippings(
+    file_locations: Iterable[Path],
+    chunk_size: int = kindle_parser.CHUNK_SIZE,
+    jobs: int = 1,
+    normalization: str | None = kindle_parser.NORMALIZATION,
+    clipping_filter: filters.ClippingFilter | None = None,
+) -> Generator[Clipping, None, None]:
+    """Read files with clippings from multiple devices and yield merged Clippings.
+
+    Files are read in parallel streams, as in `parse_my_clippings`, and merged
+    with `merge_clippings`. With `jobs` greater than 1, all files share a single
+    process pool, and only a few shards of each file are parsed ahead, so
+    memory depends on the number of files, not on their size.
+
+    Parameters
+    ----------
+    file_locations : Iterable[Path]
+        paths to Kindle files with clippings
+    chunk_size : int, optional
+        number of bytes read from each file at once, by default CHUNK_SIZE
+    jobs : int, optional
+        number of worker processes used for parsing each file, by default 1
+    normalization : str | None, optional
+        Unicode normalization form, by default NORMALIZATION
+    clipping_filter : filters.ClippingFilter | None, optional
+        criteria of merged clippings, by default all clippings are merged
+
+    Yields
+    ------
+    Generator[Clipping, None, None]
+        generator yielding merged Clippings
+    """
+    with kindle_parser.create_parser_pool(jobs) if jobs > 1 else nullcontext() as pool:
+        yield from merge_clippings(
+            kindle_parser.parse_my_clippings(
+                file_location, chunk_size, jobs, normalization, clipping_filter, pool
+            )
+            for file_location in file_locations
+        )
@@ -0,0 +1,176 @@
+"""Module with binary cache of parsed clippings files."""
+
+from clipping import ClippingTable
+import formats
+import kindle_parser
+import stats
+
+import hashlib
+import json
+import os
+import struct
+import sys
+from pathlib import Path
+
+CACHE_MAGIC = b"KPCACHE1"
+
+
+def _file_digest(file_location: Path) -> str:
+    """Return SHA-256 hex digest of the file.
+
+    Parameters
+    ----------
+    file_location : Path
+        path to the file
+
+    Returns
+    -------
+    str
+        digest of content of the file
+    """
+    digest = hashlib.sha256()
+    with open(file_location, "rb") as file:
+        while chunk := file.read(kindle_parser.CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _parser_key(normalization: str | None) -> dict:
+    """Return settings which change parsed clippings, apart from the file itself.
+
+    Parameters
+    ----------
+    normalization : str | None
+        Unicode normalization form
+
+    Returns
+    -------
+    dict
+        normalization, registered reader formats and byte order of the platform
+    """
+    return {
+        "normalization": normalization,
+        "formats": hashlib.sha256(repr(formats.FORMATS).encode()).hexdigest(),
+        "byteorder": sys.byteorder,
+    }
+
+
+def save_cache(table: ClippingTable, cache_file: Path, key: dict) -> None:
+    """Atomically write parsed clippings with the key of their source.
+
+    Parameters
+    ----------
+    table : ClippingTable
+        parsed clippings
+    cache_file : Path
+        path to cache file
+    key : dict
+        size, modification time and digest of the source and parser settings
+    """
+    header = json.dumps(key).encode("utf-8")
+    temporary_file = cache_file.with_name(cache_file.name + ".tmp")
+    with open(temporary_file, "wb") as file:
+        file.write(CACHE_MAGIC + struct.pack("<Q", len(header)) + header)
+        file.write(table.to_bytes())
+    os.replace(temporary_file, cache_file)
+
+
+def load_cache(
+    cache_file: Path,
+    file_location: Path,
+    normalization: str | None = kindle_parser.NORMALIZATION,
+) -> ClippingTable | None:
+    """Load parsed clippings of the file, if cache is still valid.
+
+    Cache is valid when size and modification time of the file are unchanged.
+    When only modification time differs (e.g. file was copied again from the
+    device), content digest is compared and cache is updated when it matches.
+
+    Parameters
+    ----------
+    cache_file : Path
+        path to cache file
+    file_location : Path
+        path to Kindle file with clippings
+    normalization : str | None, optional
+        Unicode normalization form, by default NORMALIZATION
+
+    Returns
+    -------
+    ClippingTable | None
+        cached clippings or None when cache is missing, malformed or stale
+    """
+    try:
+        with open(cache_file, "rb") as file:
+            data = file.read()
+        if data[: len(CACHE_MAGIC)] != CACHE_MAGIC:
+            return None
+        (header_size,) = struct.unpack_from("<Q", data, len(CACHE_MAGIC))
+        start = len(CACHE_MAGIC) + 8
+        key = json.loads(data[start : start + header_size])
+        status = os.stat(file_location)
+        if (
+            not isinstance(key, dict)
+            or key.get("parser") != _parser_key(normalization)
+            or key.get("size") != status.st_size
+        ):
+            return None
+        table = ClippingTable.from_bytes(data[start + header_size :])
+        if key.get("mtime_ns") != status.st_mtime_ns:
+            if key.get("digest") != _file_digest(file_location):
+                return None
+            save_cache(table, cache_file, {**key, "mtime_ns": status.st_mtime_ns})
+    except (OSError, ValueError, KeyError, TypeError, struct.error):
+        return None
+    return table
+
+
+def parse_my_clippings_cached(
+    file_location: Path,
+    cache_file: Path,
+    jobs: int = 1,
+    normalization: str | None = kindle_parser.NORMALIZATION,
+) -> ClippingTable:
+    """Return clippings of the file, parsing it only when cache is not valid.
+
+    On cache hit, file is not parsed at all. Otherwise it is parsed with
+    `parse_my_clippings` and the cache is rebuilt.
+
+    Parameters
+    ----------
+    file_location : Path
+        path to Kindle file with clippings
+    cache_file : Path
+        path to cache file, created when missing
+    jobs : int, optional
+        number of worker processes used for parsing, by default 1
+    normalization : str | None, optional
+        Unicode normalization form, by default NORMALIZATION
+
+    Returns
+    -------
+    ClippingTable
+        parsed clippings in order of the file
+    """
+    with stats.timer("load parse cache"):
+        table = load_cache(cache_file, file_location, normalization)
+    if table is not None:
+        stats.count("parse cache hits")
+        return table
+
+    stats.count("parse cache misses")
+    # Key is taken before parsing, so changes made meanwhile invalidate cache
+    status = os.stat(file_location)
+    key = {
+        "size": status.st_size,
+        "mtime_ns": status.st_mtime_ns,
+        "digest": _file_digest(file_location),
+        "parser": _parser_key(normalization),
+    }
+    table = ClippingTable(
+        kindle_parser.parse_my_clippings(
+            file_location, jobs=jobs, normalization=normalization
+        )
+    )
+    save_cache(table, cache_file, key)
+    return table
@@ -0,0 +1,204 @@
+"""Module with grouping of clippings by book in bounded memory."""
+
+from clipping import Book, Clipping
+import stats
+
+import json
+import sys
+import tempfile
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from pathlib import Path
+
+MEMORY_LIMIT = 256 * 1024 * 1024
+# Estimated size of Clipping instance with its location tuple and list entry,
+# without strings
+CLIPPING_SIZE = 200
+
+
+def _clipping_size(clipping: Clipping) -> int:
+    """Estimate memory used by clipping kept in a list.
+
+    Parameters
+    ----------
+    clipping : Clipping
+        clipping kept in memory
+
+    Returns
+    -------
+    int
+        estimated size in bytes; book and clipping type are shared, so they are
+        not included
+    """
+    return (
+        CLIPPING_SIZE
+        + sys.getsizeof(clipping.content)
+        + sys.getsizeof(clipping.timestamp)
+    )
+
+
+class PartitionedClippings(Mapping[Book, list[Clipping]]):
+    """Clippings grouped by book, partly spilled to per-book files on disk.
+
+    Clippings are kept in memory until their estimated size exceeds the memory
+    limit. Then clippings of each book are appended to the partition file of the
+    book and memory is released. Clippings of a book are loaded again only when
+    the book is accessed, so the whole corpus is never in memory at once.
+
+    Books are in order of their first clipping, and clippings of each book in
+    order of the input, the same as in `sort_clippings`. Partitions are removed
+    when the object is closed.
+    """
+
+    def __init__(
+        self,
+        memory_limit: int = MEMORY_LIMIT,
+        directory: Path | None = None,
+    ) -> None:
+        self.memory_limit = memory_limit
+        self._temporary_directory = tempfile.TemporaryDirectory(
+            prefix="kindleparse-", dir=directory
+        )
+        self.directory = Path(self._temporary_directory.name)
+        self._partitions: dict[Book, Path | None] = {}
+        self._spilled_books = 0
+        self._buffers: dict[Book, list[Clipping]] = {}
+        self._buffered_size = 0
+
+    def append(self, clipping: Clipping) -> None:
+        """Add clipping to its book, spilling all books when memory limit is hit.
+
+        Parameters
+        ----------
+        clipping : Clipping
+            clipping to be added
+        """
+        if clipping.book not in self._partitions:
+            self._partitions[clipping.book] = None
+        self._buffers.setdefault(clipping.book, []).append(clipping)
+        self._buffered_size += _clipping_size(clipping)
+        if self._buffered_size > self.memory_limit:
+            self.spill()
+
+    def spill(self) -> None:
+        """Append clippings kept in memory to partition files of their books."""
+        with stats.timer("spill partitions"):
+            for book, clippings in self._buffers.items():
+                if (partition := self._partitions[book]) is None:
+                    self._spilled_books += 1
+                    partition = self.directory / f"{self._spilled_books}.jsonl"
+                    self._partitions[book] = partition
+                with open(partition, "a", encoding="utf-8") as file:
+                    file.writelines(
+                        json.dumps(
+                            [
+                                clipping.clipping_type,
+                                clipping.timestamp,
+                                clipping.content,
+                                *clipping.location,
+                                clipping.page,
+                            ],
+                            ensure_ascii=False,
+                        )
+                        + "\n"
+                        for clipping in clippings
+                    )
+                stats.count("clippings spilled", len(clippings))
+        self._buffers.clear()
+        self._buffered_size = 0
+
+    def __getitem__(self, book: Book) -> list[Clipping]:
+        clippings = []
+        if (partition := self._partitions[book]) is not None:
+            with open(partition, encoding="utf-8") as file:
+                for line in file:
+                    clipping_type, timestamp, content, start, end, page = json.loads(
+                        line
+                    )
+                    clippings.append(
+                        Clipping(
+                            book=book,
+                            clipping_type=sys.intern(clipping_type),
+                            timestamp=timestamp,
+                            content=content,
+                            location=(start, end),
+                            page=page,
+                        )
+                    )
+        clippings.extend(self._buffers.get(book, ()))
+        return clippings
+
+    def __iter__(self) -> Iterator[Book]:
+        return iter(self._partitions)
+
+    def __len__(self) -> int:
+        return len(self._partitions)
+
+    def close(self) -> None:
+        """Remove partition files."""
+        self._temporary_directory.cleanup()
+
+    def __enter__(self) -> "PartitionedClippings":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class TransformedClippings(Mapping[Book, list[Clipping]]):
+    """View of a mapping, transforming clippings of each book when it is accessed."""
+
+    def __init__(
+        self,
+        mapping: Mapping[Book, list[Clipping]],
+        transform: Callable[[list[Clipping]], list[Clipping]],
+    ) -> None:
+        self.mapping = mapping
+        self.transform = transform
+
+    def __getitem__(self, book: Book) -> list[Clipping]:
+        return self.transform(self.mapping[book])
+
+    def __iter__(self) -> Iterator[Book]:
+        return iter(self.mapping)
+
+    def __len__(self) -> int:
+        return len(self.mapping)
+
+
+def group_clippings(
+    clippings: Iterable[Clipping],
+    memory_limit: int = MEMORY_LIMIT,
+    directory: Path | None = None,
+) -> PartitionedClippings:
+    """Group clippings by book like `sort_clippings`, in bounded memory.
+
+    Parameters
+    ----------
+    clippings : Iterable[Clipping]
+        clippings, e.g. from `parse_my_clippings`
+    memory_limit : int, optional
+        estimated size in bytes of clippings kept in memory, by default
+        MEMORY_LIMIT
+    directory : Path | None, optional
+        directory for partition files, by default system temporary directory
+
+    Returns
+    -------
+    PartitionedClippings
+        mapping of books to clippings, which should be closed after use
+    """
+    grouped = PartitionedClippings(memory_limit, directory)
+    bookmarks = 0
+    with stats.timer("group_clippings"):
+        try:
+            for clipping in clippings:
+                if clipping.clipping_type == "Bookmark":
+                    bookmarks += 1
+                    continue
+                grouped.append(clipping)
+        except BaseException:
+            # Partitions spilled so far would be left until interpreter exit
+            grouped.close()
+            raise
+    stats.count("bookmarks skipped", bookmarks)
+    return grouped
@@ -0,0 +1,251 @@
+"""Module with local HTTP server keeping parsed clippings in memory."""
+
+from clipping import Book, Clipping
+import checkpoint
+import kindle_parser
+import templates
+
+import json
+import os
+import threading
+import unicodedata
+from dataclasses import asdict, dataclass, field
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+HOST = "127.0.0.1"
+PORT = 8000
+
+
+@dataclass
+class Snapshot:
+    """Clippings parsed from a single version of the file.
+
+    Snapshot is never modified after it is published, apart from markdown
+    cache, so requests can use it while the next one is being parsed.
+    """
+
+    mapping: dict[Book, list[Clipping]]
+    markdown: dict[Book, str] = field(default_factory=dict)
+
+
+class ClippingCache:
+    """Clippings of the file, parsed again only when the file changes.
+
+    Size and modification time of the file are checked on each access. When
+    they change, clippings added since the previous version are parsed in a
+    background thread, while requests are still served from the previous
+    snapshot. When parsing fails, its error is kept in `error` and the same
+    version of the file is not parsed again.
+    """
+
+    def __init__(
+        self,
+        file_location: Path,
+        order: str = "location",
+        template: templates.Template | None = None,
+    ) -> None:
+        if order not in kindle_parser.SORT_KEYS:
+            raise ValueError(f"Unknown order of clippings: {order}")
+        # Clippings are parsed again from byte offsets of the checkpoint
+        if kindle_parser.detect_compression(file_location) is not None:
+            raise ValueError(f"Compressed file cannot be served: {file_location}")
+        self.file_location = file_location
+        self.order = order
+        self.render = templates.compile_template(template or templates.Template())
+        self._checkpoint: checkpoint.Checkpoint | None = None
+        self._signature: tuple[int, int] | None = None
+        self._failed_signature: tuple[int, int] | None = None
+        self.error: str | None = None
+        self._reloading = threading.Lock()
+        self.snapshot = Snapshot({})
+        self.reload()
+
+    def _file_signature(self) -> tuple[int, int]:
+        status = os.stat(self.file_location)
+        return status.st_size, status.st_mtime_ns
+
+    def reload(self) -> None:
+        """Parse clippings added to the file since the last reload.
+
+        Books which did not receive new clippings are taken from the previous
+        snapshot; when the file was edited, it is parsed again as a whole.
+
+        Raises
+        ------
+        ValueError
+            when a clipping cannot be parsed; error is also kept in `error`
+        """
+        with self._reloading:
+            signature = self._file_signature()
+            if signature in (self._signature, self._failed_signature):
+                return
+            try:
+                updated, self._checkpoint = checkpoint.parse_my_clippings_incrementally(
+                    self.file_location, self._checkpoint
+                )
+            except Exception as error:
+                self._failed_signature = signature
+                self.error = f"{type(error).__name__}: {error}"
+                raise
+            mapping = {
+                book: clippings
+                for book, clippings in self.snapshot.mapping.items()
+                if book in self._checkpoint.ranges
+            }
+            mapping.update(kindle_parser.order_clippings(updated, self.order))
+            self.snapshot = Snapshot(mapping)
+            self._signature = signature
+            self._failed_signature = self.error = None
+
+    def get(self) -> Snapshot:
+        """Return the current snapshot, starting reload when file has changed.
+
+        Returns
+        -------
+        Snapshot
+            the latest parsed snapshot
+        """
+        try:
+            changed = self._file_signature() not in (
+                self._signature,
+                self._failed_signature,
+            )
+        except OSError:
+            changed = False
+        if changed and not self._reloading.locked():
+            threading.Thread(target=self.reload, daemon=True).start()
+        return self.snapshot
+
+    def markdown(self, snapshot: Snapshot, book: Book) -> str:
+        """Return rendered markdown file of the book, rendering it once per snapshot.
+
+        Parameters
+        ----------
+        snapshot : Snapshot
+            snapshot containing the book
+        book : Book
+            book to be rendered
+
+        Returns
+        -------
+        str
+            content of markdown file
+        """
+        if (content := snapshot.markdown.get(book)) is None:
+            content = snapshot.markdown[book] = self.render(
+                book, snapshot.mapping[book]
+            )
+        return content
+
+
+class ClippingRequestHandler(BaseHTTPRequestHandler):
+    """Handler of JSON API of the server.
+
+    Endpoints:
+
+        GET /books
+        GET /status
+        GET /clippings?author=...&title=...
+        GET /markdown?author=...&title=...
+
+    Author may be omitted for books without one.
+    """
+
+    server: "ClippingServer"
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        # Parameters are compared with parsed titles, so they are normalized alike
+        query = {
+            name: unicodedata.normalize(kindle_parser.NORMALIZATION, values[0])
+            for name, values in parse_qs(url.query).items()
+        }
+        snapshot = self.server.cache.get()
+
+        if url.path == "/books":
+            self._send_json(
+                [
+                    {**asdict(book), "count": len(clippings)}
+                    for book, clippings in snapshot.mapping.items()
+                ]
+            )
+            return
+        if url.path == "/status":
+            # Error of the last reload; books are served from the last
+            # successfully parsed version of the file meanwhile
+            self._send_json(
+                {"books": len(snapshot.mapping), "error": self.server.cache.error}
+            )
+            return
+        if url.path not in ("/clippings", "/markdown"):
+            self._send_error(HTTPStatus.NOT_FOUND, f"Unknown path {url.path}")
+            return
+
+        book = Book(author=query.get("author", ""), title=query.get("title", ""))
+        if book not in snapshot.mapping:
+            self._send_error(HTTPStatus.NOT_FOUND, f"Unknown book {book}")
+        elif url.path == "/clippings":
+            self._send_json([asdict(clipping) for clipping in snapshot.mapping[book]])
+        else:
+            content = self.server.cache.markdown(snapshot, book)
+            self._send(HTTPStatus.OK, "text/markdown; charset=utf-8", content)
+
+    def _send(self, status: HTTPStatus, content_type: str, content: str) -> None:
+        body = content.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, data: object) -> None:
+        content = json.dumps(data, ensure_ascii=False)
+        self._send(HTTPStatus.OK, "application/json; charset=utf-8", content)
+
+    def _send_error(self, status: HTTPStatus, message: str) -> None:
+        content = json.dumps({"error": message}, ensure_ascii=False)
+        self._send(status, "application/json; charset=utf-8", content)
+
+
+class ClippingServer(ThreadingHTTPServer):
+    """HTTP server answering requests with clippings from the cache."""
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], cache: ClippingCache) -> None:
+        super().__init__(address, ClippingRequestHandler)
+        self.cache = cache
+
+
+def serve(
+    file_location: Path,
+    host: str = HOST,
+    port: int = PORT,
+    order: str = "location",
+    template: templates.Template | None = None,
+) -> None:
+    """Parse clippings and serve them until interrupted.
+
+    Parameters
+    ----------
+    file_location : Path
+        path to Kindle file with clippings
+    host : str, optional
+        address to listen on, by default HOST
+    port : int, optional
+        port to listen on, by default PORT
+    order : str, optional
+        order of clippings in each book, by default `location`
+    template : templates.Template | None, optional
+        template of markdown files, by default the default template
+    """
+    cache = ClippingCache(file_location, order, template)
+    with ClippingServer((host, port), cache) as server:
+        print(f"Serving {file_location} on http://{host}:{server.server_port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
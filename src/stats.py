@@ -0,0 +1,195 @@
+"""Module with optional instrumentation of kindleparse pipeline stages.
+
+Statistics are collected only inside `collect()` block. Otherwise `ACTIVE` is
+None and instrumented code takes its usual path, after a single check.
+"""
+
+import json
+from collections.abc import Generator, Iterable, Iterator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class Stats:
+    """Time spent in pipeline stages and counters of processed items.
+
+    Timers measure self time: time of a stage which runs nested inside another
+    stage (e.g. parsing clippings consumed by `sort_clippings`) is subtracted
+    from the outer one.
+    """
+
+    timers: dict[str, float] = field(default_factory=dict)
+    counters: dict[str, int] = field(default_factory=dict)
+    _open_timers: list[float] = field(default_factory=list, repr=False)
+
+    def add_time(self, name: str, seconds: float) -> None:
+        """Add time spent in a stage.
+
+        Parameters
+        ----------
+        name : str
+            name of the stage
+        seconds : float
+            time spent in the stage
+        """
+        self.timers[name] = self.timers.get(name, 0.0) + seconds
+        if self._open_timers:
+            self._open_timers[-1] += seconds
+
+    def count(self, name: str, value: int = 1) -> None:
+        """Increase counter.
+
+        Parameters
+        ----------
+        name : str
+            name of the counter
+        value : int, optional
+            increment, by default 1
+        """
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def timer(self, name: str) -> Generator[None, None, None]:
+        """Measure time spent in the block as a stage.
+
+        Parameters
+        ----------
+        name : str
+            name of the stage
+        """
+        self._open_timers.append(0.0)
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = perf_counter() - start
+            nested = self._open_timers.pop()
+            self.timers[name] = self.timers.get(name, 0.0) + elapsed - nested
+            if self._open_timers:
+                self._open_timers[-1] += elapsed
+
+    def timed(self, name: str, iterable: Iterable[T]) -> Iterator[T]:
+        """Measure time spent on getting items from iterable as a stage.
+
+        Parameters
+        ----------
+        name : str
+            name of the stage
+        iterable : Iterable[T]
+            iterable, e.g. generator reading a file
+
+        Yields
+        ------
+        Iterator[T]
+            items of iterable
+        """
+        iterator = iter(iterable)
+        while True:
+            start = perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_time(name, perf_counter() - start)
+                return
+            self.add_time(name, perf_counter() - start)
+            yield item
+
+    def merge(self, other: "Stats") -> None:
+        """Add timers and counters collected elsewhere, e.g. in a worker process.
+
+        Time of other statistics is not subtracted from stages open here, as it
+        was spent in parallel with them.
+
+        Parameters
+        ----------
+        other : Stats
+            statistics to be added
+        """
+        for name, seconds in other.timers.items():
+            self.timers[name] = self.timers.get(name, 0.0) + seconds
+        for name, value in other.counters.items():
+            self.count(name, value)
+
+    def as_dict(self) -> dict[str, dict]:
+        return {"timers": dict(self.timers), "counters": dict(self.counters)}
+
+    def format(self, output_format: str = "text") -> str:
+        """Return statistics formatted as text table or JSON.
+
+        Parameters
+        ----------
+        output_format : str, optional
+            `text` or `json`, by default `text`
+
+        Returns
+        -------
+        str
+            formatted statistics
+        """
+        if output_format == "json":
+            return json.dumps(self.as_dict(), indent=2)
+        width = max(map(len, [*self.timers, *self.counters, ""]))
+        lines = ["Time spent:"]
+        lines += [
+            f"  {name:<{width}} {value:>10.4f} s" for name, value in self.timers.items()
+        ]
+        lines += ["Counters:"]
+        lines += [
+            f"  {name:<{width}} {value:>10}" for name, value in self.counters.items()
+        ]
+        return "\n".join(lines)
+
+
+ACTIVE: Stats | None = None
+
+
+@contextmanager
+def collect() -> Generator[Stats, None, None]:
+    """Collect statistics of everything run inside the block.
+
+    Yields
+    ------
+    Generator[Stats, None, None]
+        statistics, filled in while the block runs
+    """
+    global ACTIVE
+    previous, ACTIVE = ACTIVE, Stats()
+    try:
+        yield ACTIVE
+    finally:
+        ACTIVE = previous
+
+
+def timer(name: str) -> AbstractContextManager[None]:
+    """Measure time of the block as a stage, when statistics are collected.
+
+    Parameters
+    ----------
+    name : str
+        name of the stage
+
+    Returns
+    -------
+    AbstractContextManager[None]
+        context manager measuring time, or doing nothing
+    """
+    return nullcontext() if ACTIVE is None else ACTIVE.timer(name)
+
+
+def count(name: str, value: int = 1) -> None:
+    """Increase counter, when statistics are collected.
+
+    Parameters
+    ----------
+    name : str
+        name of the counter
+    value : int, optional
+        increment, by default 1
+    """
+    if ACTIVE is not None:
+        ACTIVE.count(name, value)
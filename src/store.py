@@ -0,0 +1,451 @@
+"""Module with SQLite store of parsed clippings."""
+
+from clipping import Book, Clipping
+import timestamps
+
+import re
+import sqlite3
+import unicodedata
+from collections import defaultdict
+from collections.abc import Iterable
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+
+BATCH_SIZE = 10_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    id INTEGER PRIMARY KEY,
+    author TEXT NOT NULL,
+    title TEXT NOT NULL,
+    UNIQUE (author, title)
+);
+CREATE TABLE IF NOT EXISTS clippings (
+    id INTEGER PRIMARY KEY,
+    book_id INTEGER NOT NULL REFERENCES books (id),
+    clipping_type TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    added_on TEXT,
+    content TEXT NOT NULL,
+    location_start INTEGER,
+    location_end INTEGER,
+    page INTEGER
+);
+CREATE UNIQUE INDEX IF NOT EXISTS clippings_natural_key ON clippings (
+    book_id,
+    clipping_type,
+    timestamp,
+    IFNULL(location_start, -1),
+    IFNULL(location_end, -1),
+    IFNULL(page, -1)
+);
+CREATE INDEX IF NOT EXISTS clippings_book ON clippings (book_id, location_start);
+CREATE INDEX IF NOT EXISTS clippings_type ON clippings (clipping_type);
+CREATE INDEX IF NOT EXISTS clippings_added_on ON clippings (added_on);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    clipping_id INTEGER NOT NULL REFERENCES clippings (id),
+    PRIMARY KEY (term, clipping_id)
+) WITHOUT ROWID;
+"""
+# Version of the schema stored in `user_version`; stores created before search
+# index was added have version 0 and their clippings are indexed when opened
+SCHEMA_VERSION = 1
+
+SELECT_CLIPPINGS = """
+SELECT books.author, books.title, clipping_type, timestamp, content,
+       location_start, location_end, page
+FROM clippings JOIN books ON books.id = clippings.book_id
+"""
+
+
+def open_store(database: Path | str) -> sqlite3.Connection:
+    """Open (and create, if needed) SQLite store of clippings.
+
+    Parameters
+    ----------
+    database : Path | str
+        path to database file, or `:memory:`
+
+    Returns
+    -------
+    sqlite3.Connection
+        connection to the store
+    """
+    connection = sqlite3.connect(database)
+    connection.executescript(SCHEMA)
+    (version,) = connection.execute("PRAGMA user_version").fetchone()
+    if version < SCHEMA_VERSION:
+        with connection:
+            _index_clippings(connection, 0)
+            connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return connection
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into terms of the search index.
+
+    Terms are case folded and stripped of diacritics, so `dorosli` matches
+    `Dorośli`, regardless of normalization form of the text.
+
+    Parameters
+    ----------
+    text : str
+        content of clipping or search query
+
+    Returns
+    -------
+    list[str]
+        terms in order of the text, with repetitions
+    """
+    text = unicodedata.normalize("NFKD", text.casefold())
+    if not text.isascii():
+        text = "".join(char for char in text if not unicodedata.combining(char))
+    return re.findall(r"\w+", text)
+
+
+def _index_clippings(connection: sqlite3.Connection, after_id: int) -> None:
+    """Add postings of clippings inserted after given ID to the search index.
+
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+        connection to the store
+    after_id : int
+        ID of the last clipping which is already indexed
+    """
+    rows = connection.execute(
+        "SELECT id, content FROM clippings WHERE id > ?", (after_id,)
+    ).fetchall()
+    connection.executemany(
+        "INSERT OR IGNORE INTO postings (term, clipping_id) VALUES (?, ?)",
+        (
+            (term, clipping_id)
+            for clipping_id, content in rows
+            for term in set(tokenize(content))
+        ),
+    )
+
+
+def _added_on(timestamp: str) -> str | None:
+    """Convert Kindle's timestamp to ISO format used for date range queries.
+
+    Parameters
+    ----------
+    timestamp : str
+        timestamp, e.g. `Tuesday, 5 May 2020 23:26:59`
+
+    Returns
+    -------
+    str | None
+        timestamp in ISO format or None when it has unknown format
+    """
+    parsed = timestamps.parse_timestamp(timestamp)
+    return parsed.isoformat() if parsed else None
+
+
+def _book_id(connection: sqlite3.Connection, book: Book) -> int:
+    """Return ID of the book, inserting it when it is not stored yet.
+
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+        connection to the store
+    book : Book
+        book to be found
+
+    Returns
+    -------
+    int
+        ID of the book
+    """
+    connection.execute(
+        "INSERT OR IGNORE INTO books (author, title) VALUES (?, ?)",
+        (book.author, book.title),
+    )
+    (book_id,) = connection.execute(
+        "SELECT id FROM books WHERE author = ? AND title = ?",
+        (book.author, book.title),
+    ).fetchone()
+    return book_id
+
+
+def ingest_clippings(
+    connection: sqlite3.Connection,
+    clippings: Iterable[Clipping],
+    batch_size: int = BATCH_SIZE,
+) -> int:
+    """Insert clippings into the store in a single transaction.
+
+    Clippings already present in the store (same book, type, timestamp, location
+    and page) are skipped. Newly inserted clippings are added to the search index.
+
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+        connection to the store
+    clippings : Iterable[Clipping]
+        clippings to be inserted
+    batch_size : int, optional
+        number of clippings inserted with single `executemany`, by default
+        BATCH_SIZE
+
+    Returns
+    -------
+    int
+        number of newly inserted clippings
+    """
+    book_ids: dict[Book, int] = {}
+    clippings = iter(clippings)
+    inserted = 0
+    with connection:
+        (last_id,) = connection.execute(
+            "SELECT IFNULL(MAX(id), 0) FROM clippings"
+        ).fetchone()
+        while batch := list(islice(clippings, batch_size)):
+            rows = []
+            for clipping in batch:
+                if (book_id := book_ids.get(clipping.book)) is None:
+                    book_id = book_ids[clipping.book] = _book_id(
+                        connection, clipping.book
+                    )
+                rows.append(
+                    (
+                        book_id,
+                        clipping.clipping_type,
+                        clipping.timestamp,
+                        _added_on(clipping.timestamp),
+                        clipping.content,
+                        clipping.location[0],
+                        clipping.location[1],
+                        clipping.page,
+                    )
+                )
+            changes = connection.total_changes
+            connection.executemany(
+                "INSERT OR IGNORE INTO clippings (book_id, clipping_type, timestamp, "
+                "added_on, content, location_start, location_end, page) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            inserted += connection.total_changes - changes
+        _index_clippings(connection, last_id)
+    return inserted
+
+
+def _to_clipping(row: tuple) -> Clipping:
+    """Convert row selected with SELECT_CLIPPINGS to Clipping.
+
+    Parameters
+    ----------
+    row : tuple
+        row from the store
+
+    Returns
+    -------
+    Clipping
+        clipping with its book
+    """
+    author, title, clipping_type, timestamp, content, start, end, page = row
+    return Clipping(
+        book=Book(author=author, title=title),
+        clipping_type=clipping_type,
+        timestamp=timestamp,
+        content=content,
+        location=(start, end),
+        page=page,
+    )
+
+
+def get_books(connection: sqlite3.Connection) -> list[Book]:
+    """Return all books in the store.
+
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+        connection to the store
+
+    Returns
+    -------
+    list[Book]
+        stored books
+    """
+    rows = connection.execute("SELECT author, title FROM books ORDER BY id")
+    return [Book(author=author, title=title) for author, title in rows]
+
+
+def get_book_clippings(connection: sqlite3.Connection, book: Book) -> list[Clipping]:
+    """Return clippings of the book, in order of insertion.
+
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+        connection to the store
+    book : Book
+        book of clippings
+
+    Returns
+    -------
+    list[Clipping]
+        clippings of the book
+    """
+    rows = connection.execute(
+        SELECT_CLIPPINGS
+        + "WHERE books.author = ? AND books.title = ? ORDER BY clippings.id",
+        (book.author, book.title),
+    )
+    return [_to_clipping(row) for row in rows]
+
+
+def get_clippings_between(
+    connection: sqlite3.Connection, since: datetime, until: datetime
+) -> list[Clipping]:
+    """Return clippings added in given period, in chronological order.
+
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+        connection to the store
+    since : datetime
+        beginning of the period (inclusive)
+    until : datetime
+        end of the period (exclusive)
+
+    Returns
+    -------
+    list[Clipping]
+        clippings added in given period
+    """
+    rows = connection.execute(
+        SELECT_CLIPPINGS
+        + "WHERE added_on >= ? AND added_on < ? ORDER BY added_on, clippings.id",
+        (since.isoformat(), until.isoformat()),
+    )
+    return [_to_clipping(row) for row in rows]
+
+
+def get_clippings_by_type(
+    connection: sqlite3.Connection, clipping_type: str
+) -> list[Clipping]:
+    """Return clippings of given type, e.g. `Highlight`, in order of insertion.
+
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+        connection to the store
+    clipping_type : str
+        type of clippings
+
+    Returns
+    -------
+    list[Clipping]
+        clippings of given type
+    """
+    rows = connection.execute(
+        SELECT_CLIPPINGS + "WHERE clipping_type = ? ORDER BY clippings.id",
+        (clipping_type,),
+    )
+    return [_to_clipping(row) for row in rows]
+
+
+def load_books(
+    connection: sqlite3.Connection, books: Iterable[Book] | None = None
+) -> dict[Book, list[Clipping]]:
+    """Return mapping of books to their clippings, ready for `dump_book_to_markdown`.
+
+    Bookmarks are skipped, the same way as in `sort_clippings`.
+
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+        connection to the store
+    books : Iterable[Book] | None, optional
+        books to be loaded, by default all stored books
+
+    Returns
+    -------
+    dict[Book, list[Clipping]]
+        mapping of books to clippings
+    """
+    if books is not None:
+        mapping = {}
+        for book in books:
+            clippings = [
+                clipping
+                for clipping in get_book_clippings(connection, book)
+                if clipping.clipping_type != "Bookmark"
+            ]
+            if clippings:
+                mapping[book] = clippings
+        return mapping
+
+    mapping = defaultdict(list)
+    rows = connection.execute(
+        SELECT_CLIPPINGS + "WHERE clipping_type != 'Bookmark' ORDER BY clippings.id"
+    )
+    for row in rows:
+        clipping = _to_clipping(row)
+        mapping[clipping.book].append(clipping)
+    return mapping
+
+
+def search_clippings(
+    connection: sqlite3.Connection,
+    query: str,
+    book: str | None = None,
+    author: str | None = None,
+    clipping_type: str | None = None,
+    limit: int | None = None,
+) -> list[Clipping]:
+    """Return clippings containing all words of the query, in order of insertion.
+
+    Only the search index and stored clippings are read, not the source file.
+
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+        connection to the store
+    query : str
+        words to be found, in any order
+    book : str | None, optional
+        part of the title of the book, by default any book
+    author : str | None, optional
+        part of the name of the author, by default any author
+    clipping_type : str | None, optional
+        type of clippings, e.g. `Highlight`, by default any type
+    limit : int | None, optional
+        maximal number of returned clippings, by default all of them
+
+    Returns
+    -------
+    list[Clipping]
+        matching clippings
+    """
+    # Postings of the longest (usually the rarest) term are scanned in order of
+    # clippings, checking the others, so the scan stops as soon as limit is hit
+    terms = sorted(set(tokenize(query)), key=len, reverse=True)
+    if not terms:
+        return []
+    conditions = ["postings.term = ?"]
+    conditions += [
+        "EXISTS (SELECT 1 FROM postings AS other WHERE other.term = ? "
+        "AND other.clipping_id = postings.clipping_id)"
+    ] * (len(terms) - 1)
+    parameters: list = list(terms)
+    for column, value in [("books.title", book), ("books.author", author)]:
+        if value is not None:
+            conditions.append(f"{column} LIKE ? ESCAPE '\\'")
+            escaped = re.sub(r"([%_\\])", r"\\\1", unicodedata.normalize("NFKD", value))
+            parameters.append(f"%{escaped}%")
+    if clipping_type is not None:
+        conditions.append("clipping_type = ?")
+        parameters.append(clipping_type)
+    sql = (
+        f"{SELECT_CLIPPINGS}JOIN postings ON postings.clipping_id = clippings.id "
+        f"WHERE {' AND '.join(conditions)} ORDER BY postings.clipping_id"
+    )
+    if limit is not None:
+        sql += " LIMIT ?"
+        parameters.append(limit)
+    return [_to_clipping(row) for row in connection.execute(sql, parameters)]
@@ -0,0 +1,145 @@
+"""Module with templates used to render markdown files of books."""
+
+from clipping import Book, Clipping
+import timestamps
+
+import json
+import string
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+
+DEFAULT_HEADER = (
+    "# {book}\n\n"
+    "**First note**: {first_note.timestamp}\n"
+    "**Last note**: {last_note.timestamp}\n\n"
+    "## Notes & Highlights from Kindle\n\n"
+)
+DEFAULT_CLIPPINGS = {
+    "Note": "- {clipping.content}\n\n",
+    "Highlight": "> {clipping.content}\n\n",
+}
+
+HEADER_FIELDS = {"book", "first_note", "last_note", "count"}
+CLIPPING_FIELDS = {"book", "clipping"}
+
+BookRenderer = Callable[[Book, list[Clipping]], str]
+
+
+@dataclass(frozen=True)
+class Template:
+    """Template of markdown file of a book, using `str.format` syntax.
+
+    Header may use `book`, `first_note`, `last_note` (clippings with the earliest
+    and latest timestamp) and `count` fields. Template of each clipping type may
+    use `book` and `clipping` fields, e.g. `> {clipping.content}`.
+    """
+
+    header: str = DEFAULT_HEADER
+    clippings: dict[str, str] = field(default_factory=lambda: dict(DEFAULT_CLIPPINGS))
+
+
+def _validate(template: str, fields: set[str]) -> None:
+    """Check that template uses only allowed fields.
+
+    Parameters
+    ----------
+    template : str
+        template in `str.format` syntax
+    fields : set[str]
+        names of allowed fields
+
+    Raises
+    ------
+    ValueError
+        when template is malformed or uses unknown field
+    """
+    for _, field_name, _, _ in string.Formatter().parse(template):
+        if field_name is None:
+            continue
+        root = field_name.partition(".")[0].partition("[")[0]
+        if root not in fields:
+            raise ValueError(
+                f"Unknown field {{{field_name}}} in template: {template!r}"
+            )
+
+
+def compile_template(template: Template) -> BookRenderer:
+    """Compile template into function rendering a book.
+
+    Templates are validated and turned into bound `str.format` methods once,
+    and each clipping type is mapped to its method, so rendering does only a
+    lookup and a single format call per clipping.
+
+    Parameters
+    ----------
+    template : Template
+        template to be compiled
+
+    Returns
+    -------
+    BookRenderer
+        function rendering book and its (non-empty) list of clippings to string
+
+    Raises
+    ------
+    ValueError
+        when template is malformed or uses unknown field
+    """
+    _validate(template.header, HEADER_FIELDS)
+    for clipping_template in template.clippings.values():
+        _validate(clipping_template, CLIPPING_FIELDS)
+    format_header = template.header.format
+    formatters = {
+        clipping_type: clipping_template.format
+        for clipping_type, clipping_template in template.clippings.items()
+    }
+
+    def render(book: Book, clippings: list[Clipping]) -> str:
+        # Ties (e.g. unknown timestamps) are resolved by order of clippings
+        first_note = min(clippings, key=timestamps.clipping_time)
+        last_note = max(reversed(clippings), key=timestamps.clipping_time)
+        header = format_header(
+            book=book, first_note=first_note, last_note=last_note, count=len(clippings)
+        )
+        try:
+            parts = [
+                formatters[clipping.clipping_type](book=book, clipping=clipping)
+                for clipping in clippings
+            ]
+        except KeyError as error:
+            raise ValueError(f"Unknown type of clipping: {error.args[0]}") from None
+        return header + "".join(parts)
+
+    return render
+
+
+def load_template(template_file: Path) -> Template:
+    """Load template from JSON file.
+
+    File may contain `header` string and `clippings` object mapping clipping
+    types to their templates. Missing parts are taken from default template.
+
+    Parameters
+    ----------
+    template_file : Path
+        path to JSON file
+
+    Returns
+    -------
+    Template
+        loaded template
+
+    Raises
+    ------
+    ValueError
+        when file is not a valid template
+    """
+    with open(template_file, encoding="utf-8") as file:
+        data = json.load(file)
+    if not isinstance(data, dict):
+        raise ValueError(f"Template in {template_file} has to be a JSON object")
+    return Template(
+        header=data.get("header", DEFAULT_HEADER),
+        clippings={**DEFAULT_CLIPPINGS, **data.get("clippings", {})},
+    )
@@ -0,0 +1,198 @@
+"""Module with cached parsing of Kindle's timestamps."""
+
+from clipping import Clipping
+
+import re
+import unicodedata
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from functools import cached_property, lru_cache
+
+
+@dataclass(eq=True, frozen=True)
+class TimestampFormat:
+    """Format of `Added on` timestamp, split into date and time parts.
+
+    Date part (e.g. `Tuesday, 5 May 2020`) is shared by all clippings from the
+    same day, so it is parsed separately from time part (e.g. `23:26:59`).
+    """
+
+    date_format: str
+    time_format: str
+
+    @property
+    def time_words(self) -> int:
+        return self.time_format.count(" ") + 1
+
+    def parse(self, timestamp: str) -> datetime:
+        """Parse timestamp with this format.
+
+        Raises
+        ------
+        ValueError
+            when timestamp does not match the format
+        """
+        date_text, *time_words = timestamp.rsplit(" ", self.time_words)
+        return datetime.combine(
+            _parse_date(date_text, self.date_format),
+            _parse_time(" ".join(time_words), self.time_format),
+        )
+
+
+@dataclass(eq=True, frozen=True)
+class LocalizedTimestampFormat:
+    """Timestamp with day and month names of another language.
+
+    Names are given explicitly instead of using `%A` and `%B` of `strptime`,
+    which depend on the locale of the process. `pattern` contains fields
+    `{weekday}`, `{day}`, `{month}`, `{year}` and `{time}` (24-hour
+    `HH:MM:SS`), e.g. `{weekday}, {day}. {month} {year} {time}` for
+    `Dienstag, 5. Mai 2020 23:26:59`.
+    """
+
+    pattern: str
+    weekdays: tuple[str, ...]
+    # From January to December
+    months: tuple[str, ...]
+
+    def __post_init__(self) -> None:
+        if len(self.weekdays) != 7 or len(self.months) != 12:
+            raise ValueError("Timestamp format needs 7 weekdays and 12 months")
+        fields = ("{weekday}", "{day}", "{month}", "{year}", "{time}")
+        if any(self.pattern.count(field) != 1 for field in fields):
+            raise ValueError(f"Timestamp pattern has to contain each of {fields}")
+
+    @cached_property
+    def _expression(self) -> re.Pattern[str]:
+        def names(words: tuple[str, ...]) -> str:
+            words = tuple(unicodedata.normalize("NFC", word) for word in words)
+            return "|".join(map(re.escape, sorted(words, key=len, reverse=True)))
+
+        groups = {
+            "weekday": f"(?:{names(self.weekdays)})",
+            "day": r"(?P<day>\d{1,2})",
+            "month": f"(?P<month>{names(self.months)})",
+            "year": r"(?P<year>\d{4})",
+            "time": r"(?P<hour>\d{1,2}):(?P<minute>\d{2}):(?P<second>\d{2})",
+        }
+        parts = re.split(r"\{(weekday|day|month|year|time)\}", self.pattern)
+        # Literal text and fields alternate in parts
+        expression = "".join(
+            groups[part] if number % 2 else re.escape(part)
+            for number, part in enumerate(parts)
+        )
+        return re.compile(expression, re.IGNORECASE)
+
+    @cached_property
+    def _month_numbers(self) -> dict[str, int]:
+        return {
+            unicodedata.normalize("NFC", month).casefold(): number
+            for number, month in enumerate(self.months, start=1)
+        }
+
+    def parse(self, timestamp: str) -> datetime:
+        """Parse timestamp with this format.
+
+        Timestamp may be in any Unicode normalization form.
+
+        Raises
+        ------
+        ValueError
+            when timestamp does not match the format
+        """
+        match = self._expression.fullmatch(unicodedata.normalize("NFC", timestamp))
+        if match is None:
+            raise ValueError(f"Timestamp {timestamp} does not match {self.pattern}")
+        return datetime(
+            int(match["year"]),
+            self._month_numbers[match["month"].casefold()],
+            *map(int, match.group("day", "hour", "minute", "second")),
+        )
+
+
+TIMESTAMP_FORMATS: dict[str, TimestampFormat | LocalizedTimestampFormat] = {
+    # Tuesday, 5 May 2020 23:26:59
+    "en_GB": TimestampFormat(date_format="%A, %d %B %Y", time_format="%H:%M:%S"),
+    # Tuesday, May 5, 2020 11:26:59 PM
+    "en_US": TimestampFormat(date_format="%A, %B %d, %Y", time_format="%I:%M:%S %p"),
+}
+
+# Format which matched most recently is tried first, as files use single format
+_last_format = next(iter(TIMESTAMP_FORMATS.values()))
+
+
+@lru_cache(maxsize=16 * 1024)
+def _parse_date(text: str, date_format: str) -> date:
+    return datetime.strptime(text, date_format).date()
+
+
+@lru_cache(maxsize=128 * 1024)
+def _parse_time(text: str, time_format: str) -> time:
+    return datetime.strptime(text, time_format).time()
+
+
+def register_timestamp_format(
+    name: str, timestamp_format: TimestampFormat | LocalizedTimestampFormat
+) -> None:
+    """Add format to the formats recognized by `parse_timestamp`.
+
+    Format registered again under the same name replaces the previous one.
+
+    Parameters
+    ----------
+    name : str
+        name of the format, e.g. name of reader format using it
+    timestamp_format : TimestampFormat | LocalizedTimestampFormat
+        format to be registered
+    """
+    global _last_format
+    TIMESTAMP_FORMATS[name] = timestamp_format
+    _last_format = next(iter(TIMESTAMP_FORMATS.values()))
+    # Timestamps cached as unknown may match the new format
+    parse_timestamp.cache_clear()
+
+
+@lru_cache(maxsize=64 * 1024)
+def parse_timestamp(timestamp: str) -> datetime | None:
+    """Convert Kindle's timestamp into datetime.
+
+    Results are cached for each distinct timestamp, and date and time parts are
+    cached separately, so `strptime` is called once for each day and each time
+    of day. Formats are tried starting with the one that matched last.
+
+    Parameters
+    ----------
+    timestamp : str
+        timestamp, e.g. `Tuesday, 5 May 2020 23:26:59`
+
+    Returns
+    -------
+    datetime | None
+        parsed timestamp or None when it does not match any known format
+    """
+    global _last_format
+    for timestamp_format in [_last_format, *TIMESTAMP_FORMATS.values()]:
+        try:
+            parsed = timestamp_format.parse(timestamp)
+        except ValueError:
+            continue
+        _last_format = timestamp_format
+        return parsed
+    return None
+
+
+def clipping_time(clipping: Clipping) -> datetime:
+    """Return time of creation of clipping, used as a sort key.
+
+    Parameters
+    ----------
+    clipping : Clipping
+        clipping with timestamp
+
+    Returns
+    -------
+    datetime
+        parsed timestamp, or `datetime.max` when it is unknown, so such
+        clippings go last
+    """
+    return parse_timestamp(clipping.timestamp) or datetime.max
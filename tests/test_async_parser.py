@@ -0,0 +1,59 @@
+from src import async_parser
+from src.kindle_parser import parse_my_clippings, sort_clippings
+from dataclasses import asdict
+from pathlib import Path
+import asyncio
+import pytest
+
+SOURCE = Path("tests/resources/My Clippings - example.txt")
+
+
+async def split_into_chunks(data, chunk_size):
+    for start in range(0, len(data), chunk_size):
+        await asyncio.sleep(0)
+        yield data[start : start + chunk_size]
+
+
+async def collect(clippings):
+    return [asdict(clipping) async for clipping in clippings]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1024 * 1024])
+def test_parse_clippings(chunk_size):
+    expected = [asdict(clipping) for clipping in parse_my_clippings(SOURCE)]
+    chunks = split_into_chunks(SOURCE.read_bytes(), chunk_size)
+    assert asyncio.run(collect(async_parser.parse_clippings(chunks))) == expected
+    clippings = async_parser.parse_my_clippings(SOURCE, chunk_size)
+    assert asyncio.run(collect(clippings)) == expected
+
+
+def test_parse_clippings_concurrently():
+    expected = [asdict(clipping) for clipping in parse_my_clippings(SOURCE)]
+
+    async def parse_uploads():
+        return await asyncio.gather(
+            *(
+                collect(async_parser.parse_my_clippings(SOURCE, chunk_size=16))
+                for _ in range(10)
+            )
+        )
+
+    assert asyncio.run(parse_uploads()) == [expected] * 10
+
+
+@pytest.mark.parametrize("concurrency", [1, 3])
+def test_dump_book_to_markdown(tmp_path, concurrency):
+    mapping = sort_clippings(parse_my_clippings(SOURCE))
+    summary = asyncio.run(
+        async_parser.dump_book_to_markdown(mapping, tmp_path, concurrency)
+    )
+    assert (summary.written, summary.skipped) == (1, 0)
+    assert (tmp_path / "Anne Frank - Dziennik.md").exists()
+
+    summary = asyncio.run(async_parser.dump_book_to_markdown(mapping, tmp_path))
+    assert (summary.written, summary.skipped) == (0, 1)
+
+
+def test_dump_book_to_markdown_missing_directory(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(async_parser.dump_book_to_markdown({}, tmp_path / "missing"))
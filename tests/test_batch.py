@@ -0,0 +1,74 @@
+from src import batch
+from pathlib import Path
+import os
+import pytest
+
+SOURCE = Path("tests/resources/My Clippings - example.txt")
+
+
+@pytest.fixture
+def users(tmp_path):
+    for user in ("alice", "bob", "carol/kindle"):
+        (tmp_path / "users" / user).mkdir(parents=True)
+        (tmp_path / "users" / user / "My Clippings.txt").write_bytes(
+            SOURCE.read_bytes()
+        )
+    broken = tmp_path / "users" / "bob" / "My Clippings.txt"
+    broken.write_text("Dziennik (Anne Frank)\n- Your Note on page x\n\nNote")
+    return tmp_path / "users"
+
+
+def test_find_jobs(users, tmp_path):
+    jobs = batch.find_jobs(users, tmp_path / "output")
+    assert [job.output_dir for job in jobs] == [
+        tmp_path / "output" / "alice",
+        tmp_path / "output" / "bob",
+        tmp_path / "output" / "carol" / "kindle",
+    ]
+
+
+def test_load_jobs(tmp_path):
+    manifest_file = tmp_path / "manifest.tsv"
+    manifest_file.write_text("alice.txt\tout/alice\n\n/data/bob.txt\t/out/bob\n")
+    assert batch.load_jobs(manifest_file) == [
+        batch.BatchJob(tmp_path / "alice.txt", tmp_path / "out" / "alice"),
+        batch.BatchJob(Path("/data/bob.txt"), Path("/out/bob")),
+    ]
+    manifest_file.write_text("alice.txt out/alice\n")
+    with pytest.raises(ValueError):
+        batch.load_jobs(manifest_file)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_run_batch(users, tmp_path, workers):
+    jobs = batch.find_jobs(users, tmp_path / "output")
+    results = list(batch.run_batch(jobs, workers))
+
+    assert [result.job for result in results] == jobs
+    assert [result.error is None for result in results] == [True, False, True]
+    assert "ValueError" in results[1].error
+    assert [result.clippings for result in results] == [3, 0, 3]
+    assert (
+        tmp_path / "output" / "carol" / "kindle" / "Anne Frank - Dziennik.md"
+    ).exists()
+
+    summary = batch.BatchSummary(results, seconds=1.0)
+    assert len(summary.failed) == 1
+    assert summary.format().startswith("Files: 3, succeeded: 2, failed: 1")
+
+
+def process_jobs_or_crash(jobs, *args):
+    if any("bob" in str(job.input_file) for job in jobs):
+        os._exit(1)
+    return [batch.process_job(job, *args) for job in jobs]
+
+
+def test_run_batch_with_crashed_worker(users, tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, "_process_jobs", process_jobs_or_crash)
+    jobs = batch.find_jobs(users, tmp_path / "output")
+    results = list(batch.run_batch(jobs, workers=2))
+
+    assert [result.job for result in results] == jobs
+    assert "BrokenProcessPool" in results[1].error
+    summary = batch.BatchSummary(results, seconds=1.0)
+    assert summary.format().startswith("Files: 3")
@@ -0,0 +1,33 @@
+from benchmarks.corpus import generate_corpus
+from benchmarks.run import compare_results
+from src.kindle_parser import parse_my_clippings
+from collections import Counter
+
+
+def test_generate_corpus(tmp_path):
+    corpus = tmp_path / "My Clippings.txt"
+    generate_corpus(500, corpus, seed=1)
+    clippings = list(parse_my_clippings(corpus))
+
+    assert len(clippings) == 500
+    assert set(Counter(clipping.clipping_type for clipping in clippings)) == {
+        "Highlight",
+        "Note",
+        "Bookmark",
+    }
+    assert {clipping.location == (None, None) for clipping in clippings} == {
+        True,
+        False,
+    }
+
+    same_seed = tmp_path / "Same seed.txt"
+    generate_corpus(500, same_seed, seed=1)
+    assert same_seed.read_bytes() == corpus.read_bytes()
+
+
+def test_compare_results():
+    baseline = {"corpora": {"1000": {"stages": {"parse": {"seconds": 1.0}}}}}
+    current = {"corpora": {"1000": {"stages": {"parse": {"seconds": 1.05}}}}}
+    assert compare_results(baseline, current, 0.1) == []
+    current["corpora"]["1000"]["stages"]["parse"]["seconds"] = 1.5
+    assert len(compare_results(baseline, current, 0.1)) == 1
@@ -0,0 +1,98 @@
+from src.checkpoint import (
+    load_checkpoint,
+    parse_my_clippings_incrementally,
+    save_checkpoint,
+)
+from src.kindle_parser import parse_my_clippings, sort_clippings
+from dataclasses import asdict
+from pathlib import Path
+
+NEW_CLIPPING = """Rozmyślania (Marek Aureliusz)
+- Your Note on page 48 | location 736 | Added on Thursday, 28 January 2021 15:26:14
+
+Swietna mantra
+==========
+"""
+
+DZIENNIK_CLIPPING = """Dziennik (Anne Frank)
+- Your Note on page 81 | location 1230 | Added on Thursday, 4 February 2021 20:00:00
+
+Kolejna notatka
+==========
+"""
+
+
+def as_dicts(mapping):
+    return {
+        (book.author, book.title): [asdict(clipping) for clipping in clippings]
+        for book, clippings in mapping.items()
+    }
+
+
+def full_parse(file_location):
+    return as_dicts(sort_clippings(parse_my_clippings(file_location)))
+
+
+def write_clippings(file_location, text):
+    file_location.write_bytes(text.encode("utf-8"))
+
+
+def test_parse_my_clippings_incrementally(tmp_path):
+    source = Path("tests/resources/My Clippings - example.txt")
+    clippings_file = tmp_path / "My Clippings.txt"
+    base = source.read_text(encoding="utf-8").rstrip() + "\n==========\n"
+    write_clippings(clippings_file, base)
+
+    mapping, checkpoint = parse_my_clippings_incrementally(clippings_file, None)
+    assert as_dicts(mapping) == full_parse(clippings_file)
+    assert checkpoint.offset == len(base.rstrip().encode("utf-8"))
+
+    mapping, checkpoint = parse_my_clippings_incrementally(clippings_file, checkpoint)
+    assert mapping == {}
+
+    write_clippings(clippings_file, base + NEW_CLIPPING)
+    mapping, checkpoint = parse_my_clippings_incrementally(clippings_file, checkpoint)
+    assert [author for author, _ in as_dicts(mapping)] == ["Marek Aureliusz"]
+
+    write_clippings(clippings_file, base + NEW_CLIPPING + DZIENNIK_CLIPPING)
+    mapping, checkpoint = parse_my_clippings_incrementally(clippings_file, checkpoint)
+    expected = full_parse(clippings_file)
+    assert as_dicts(mapping) == {
+        ("Anne Frank", "Dziennik"): expected[("Anne Frank", "Dziennik")]
+    }
+    assert len(expected[("Anne Frank", "Dziennik")]) == 4
+
+
+def test_parse_my_clippings_incrementally_changed_prefix(tmp_path):
+    clippings_file = tmp_path / "My Clippings.txt"
+    write_clippings(clippings_file, NEW_CLIPPING + DZIENNIK_CLIPPING)
+    _, checkpoint = parse_my_clippings_incrementally(clippings_file, None)
+
+    write_clippings(clippings_file, DZIENNIK_CLIPPING + NEW_CLIPPING)
+    mapping, _ = parse_my_clippings_incrementally(clippings_file, checkpoint)
+    assert as_dicts(mapping) == full_parse(clippings_file)
+
+    write_clippings(clippings_file, DZIENNIK_CLIPPING)
+    mapping, _ = parse_my_clippings_incrementally(clippings_file, checkpoint)
+    assert as_dicts(mapping) == full_parse(clippings_file)
+
+
+def test_save_and_load_checkpoint(tmp_path):
+    clippings_file = tmp_path / "My Clippings.txt"
+    write_clippings(clippings_file, NEW_CLIPPING + DZIENNIK_CLIPPING)
+    _, checkpoint = parse_my_clippings_incrementally(clippings_file, None)
+
+    checkpoint_file = tmp_path / "checkpoint.json"
+    save_checkpoint(checkpoint, checkpoint_file)
+    loaded = load_checkpoint(checkpoint_file)
+    assert (loaded.offset, loaded.digest) == (checkpoint.offset, checkpoint.digest)
+    assert [(asdict(book), ranges) for book, ranges in loaded.ranges.items()] == [
+        (asdict(book), ranges) for book, ranges in checkpoint.ranges.items()
+    ]
+
+
+def test_load_checkpoint_malformed(tmp_path):
+    checkpoint_file = tmp_path / "checkpoint.json"
+    assert load_checkpoint(checkpoint_file) is None
+    checkpoint_file.write_text("{}")
+    assert load_checkpoint(checkpoint_file) is None
@@ -0,0 +1,46 @@
+from src.clipping import ClippingTable, intern_book
+from src.kindle_parser import parse_clipping, parse_my_clippings
+from dataclasses import asdict
+import pytest
+
+
+def test_intern_book():
+    assert intern_book("Anne Frank", "Dziennik") is intern_book(
+        "Anne Frank", "Dziennik"
+    )
+
+
+def test_clipping_table():
+    clippings = list(parse_my_clippings("tests/resources/My Clippings - example.txt"))
+    page_only = parse_clipping(
+        """Boating Pollution Economics & Impacts
+- Your Highlight on page 1-1 | Added on Friday, 30 October 2020 14:53:27
+
+Can preventing pollution save money?"""
+    )
+    table = ClippingTable(clippings)
+    table.append(page_only)
+
+    assert len(table) == 4
+    assert len(table.books) == 2
+    assert table.clipping_types == ["Note", "Highlight"]
+    assert [asdict(clipping) for clipping in table] == [
+        asdict(clipping) for clipping in clippings + [page_only]
+    ]
+    assert asdict(table[-1]) == asdict(page_only)
+    assert table[0].book is table[1].book
+    with pytest.raises(IndexError):
+        table[4]
+
+
+def test_clipping_table_bytes():
+    clippings = list(parse_my_clippings("tests/resources/My Clippings - example.txt"))
+    data = ClippingTable(clippings).to_bytes()
+    table = ClippingTable.from_bytes(data)
+    assert [asdict(clipping) for clipping in table] == [
+        asdict(clipping) for clipping in clippings
+    ]
+    assert table[0].book is table[2].book
+    assert len(ClippingTable.from_bytes(ClippingTable().to_bytes())) == 0
+    with pytest.raises(ValueError):
+        ClippingTable.from_bytes(data[:-1])
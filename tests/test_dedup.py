@@ -0,0 +1,64 @@
+from src.clipping import Book, Clipping
+from src.dedup import deduplicate_highlights
+
+BOOK = Book(author="Antoine de Saint-Exupery", title="Mały Książę")
+
+
+def highlight(content, location, page=None, clipping_type="Highlight"):
+    return Clipping(
+        book=BOOK,
+        clipping_type=clipping_type,
+        timestamp="Tuesday, 5 May 2020 23:26:59",
+        content=content,
+        location=location,
+        page=page,
+    )
+
+
+def test_deduplicate_highlights():
+    clippings = [
+        highlight("Wszyscy dorośli byli kiedyś dziećmi.", (6, 6)),
+        highlight("Wszyscy dorośli", (6, 6), clipping_type="Note"),
+        highlight("byli kiedyś", (6, 6)),
+        highlight(
+            "Wszyscy dorośli byli kiedyś dziećmi. Choć niewielu z nich o tym pamięta.",
+            (6, 7),
+        ),
+        highlight("Idąc prosto przed siebie nie można zajść daleko ...", (86, 86)),
+        highlight("Idąc prosto", (86, 86)),
+        highlight("Inny tekst", (5, 8)),
+        highlight("Strona", (None, None), page=3),
+        highlight("Strona trzecia", (None, None), page=3),
+    ]
+    mapping, dropped = deduplicate_highlights({BOOK: clippings})
+
+    assert dropped == 3
+    assert [clipping.content for clipping in mapping[BOOK]] == [
+        "Wszyscy dorośli",
+        "Wszyscy dorośli byli kiedyś dziećmi. Choć niewielu z nich o tym pamięta.",
+        "Idąc prosto przed siebie nie można zajść daleko ...",
+        "Idąc prosto",
+        "Inny tekst",
+        "Strona trzecia",
+    ]
+
+
+def test_deduplicate_exact_duplicates():
+    clippings = [highlight("Ten sam tekst", (10, 12)) for _ in range(3)]
+    mapping, dropped = deduplicate_highlights({BOOK: clippings})
+    assert dropped == 2
+    assert mapping[BOOK] == clippings[-1:]
+
+
+def test_deduplicate_nested_highlights():
+    # Each highlight is covered by all earlier ones, but only the last one is
+    # later in the file and contains them
+    clippings = [
+        highlight(f"tekst {index}", (index, 100 - index)) for index in range(40)
+    ]
+    clippings.append(
+        highlight(" ".join(f"tekst {index}" for index in range(40)), (0, 100))
+    )
+    mapping, dropped = deduplicate_highlights({BOOK: clippings})
+    assert dropped == 40
+    assert mapping[BOOK] == clippings[-1:]
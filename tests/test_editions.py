@@ -0,0 +1,63 @@
+from src import editions
+from src.clipping import Book, Clipping
+from dataclasses import asdict
+import json
+import random
+
+FIRST = Book(author="Frank Herbert", title="Dune")
+SECOND = Book(author="", title="Dune (Z-Library)")
+OTHER = Book(author="Anne Frank", title="Dziennik")
+
+
+def random_texts(seed, count):
+    generator = random.Random(seed)
+    words = [f"word{number}" for number in range(5000)]
+    return [" ".join(generator.choices(words, k=20)) for _ in range(count)]
+
+
+def clippings(book, texts):
+    return [
+        Clipping(
+            book=book,
+            clipping_type="Highlight",
+            timestamp="Sunday, 2 May 2021 10:11:12",
+            content=text,
+            location=(number, number),
+        )
+        for number, text in enumerate(texts)
+    ]
+
+
+def test_estimate_similarity():
+    texts = random_texts(1, 40)
+    first = editions.book_signature(clippings(FIRST, texts))
+    assert editions.estimate_similarity(first, first) == 1.0
+    second = editions.book_signature(clippings(SECOND, texts[:30]))
+    assert 0.6 < editions.estimate_similarity(first, second) < 0.9
+    other = editions.book_signature(clippings(OTHER, random_texts(2, 40)))
+    assert editions.estimate_similarity(first, other) < 0.1
+    assert editions.book_signature(clippings(OTHER, ["too short"])) is None
+
+
+def test_merge_same_books(tmp_path):
+    texts = random_texts(1, 40)
+    mapping = {
+        SECOND: clippings(SECOND, texts[10:] + random_texts(3, 5)),
+        OTHER: clippings(OTHER, random_texts(2, 40)),
+        FIRST: clippings(FIRST, texts),
+    }
+    result, merges = editions.merge_same_books(mapping)
+
+    assert list(result) == [FIRST, OTHER]
+    assert len(result[FIRST]) == 75
+    assert all(clipping.book == FIRST for clipping in result[FIRST])
+    assert [asdict(clipping) for clipping in result[OTHER]] == [
+        asdict(clipping) for clipping in mapping[OTHER]
+    ]
+    assert [(merge.book, list(merge.merged)) for merge in merges] == [(FIRST, [SECOND])]
+
+    report_file = tmp_path / "merges.json"
+    editions.save_report(merges, report_file)
+    report = json.loads(report_file.read_text(encoding="utf-8"))
+    assert report[0]["title"] == "Dune"
+    assert report[0]["merged"][0]["title"] == "Dune (Z-Library)"
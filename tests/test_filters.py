@@ -0,0 +1,159 @@
+from src.clipping import Book
+from src.async_parser import parse_clippings
+from src.filters import ClippingFilter, filter_clippings
+from src.kindle_parser import parse_my_clippings
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+import asyncio
+import pytest
+
+BOOKMARK = """==========
+Boating Pollution Economics & Impacts
+- Your Bookmark on page 3 | Added on Friday, 30 October 2020 14:50:00
+
+
+==========
+Boating Pollution Economics & Impacts
+- Your Highlight on page 1-1 | Added on Friday, 30 October 2020 14:53:27
+
+Can preventing pollution save money?
+"""
+
+
+@pytest.fixture
+def clippings_file(tmp_path):
+    source = Path("tests/resources/My Clippings - example.txt")
+    file = tmp_path / "My Clippings.txt"
+    content = source.read_bytes().rstrip() + b"\n" + BOOKMARK.encode()
+    file.write_bytes(b"\xef\xbb\xbf" + content.replace(b"\n", b"\r\n"))
+    return file
+
+
+@pytest.mark.parametrize(
+    "clipping_filter, expected",
+    [
+        (ClippingFilter(), 4),
+        (ClippingFilter(book="dziennik"), 3),
+        (ClippingFilter(author="Frank", clipping_types=("Note",)), 2),
+        (ClippingFilter(book="Boating", author="Frank"), 0),
+        (ClippingFilter(since=datetime(2021, 2, 3, 23, 4, 43)), 2),
+        (ClippingFilter(until=datetime(2021, 1, 1)), 1),
+    ],
+)
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_parse_my_clippings_filter(clippings_file, clipping_filter, expected, jobs):
+    all_clippings = list(parse_my_clippings(clippings_file))
+    assert len(all_clippings) == 5
+    result = [
+        asdict(clipping)
+        for clipping in parse_my_clippings(
+            clippings_file, jobs=jobs, clipping_filter=clipping_filter
+        )
+    ]
+    assert len(result) == expected
+    assert result == [
+        asdict(clipping)
+        for clipping in all_clippings
+        if clipping_filter.matches(
+            clipping.book, clipping.clipping_type, clipping.timestamp
+        )
+    ]
+
+
+POLISH = """Mały Książę (Antoine de Saint-Exupéry)
+- Your Highlight at location 6-6 | Added on Tuesday, 5 May 2020 23:26:59
+
+Wszyscy dorośli byli kiedyś dziećmi.
+==========
+Dziennik (Anne Frank)
+- Your Note on page 81 | Added on Wednesday, 3 February 2021 23:00:55
+
+Żółw
+==========
+"""
+
+
+@pytest.mark.parametrize(
+    "clipping_filter",
+    [
+        ClippingFilter(book="Mały Książę"),
+        ClippingFilter(book="książę"),
+        ClippingFilter(author="Exupéry"),
+    ],
+)
+@pytest.mark.parametrize("normalization", ["NFKD", "NFC", None])
+def test_filter_non_ascii_title(tmp_path, clipping_filter, normalization):
+    clippings_file = tmp_path / "My Clippings.txt"
+    clippings_file.write_text(POLISH, encoding="utf-8")
+
+    async def parse_async():
+        async def chunks():
+            yield POLISH.encode()
+
+        return [
+            clipping
+            async for clipping in parse_clippings(
+                chunks(), normalization, clipping_filter
+            )
+        ]
+
+    for jobs in (1, 2):
+        (clipping,) = parse_my_clippings(
+            clippings_file,
+            jobs=jobs,
+            normalization=normalization,
+            clipping_filter=clipping_filter,
+        )
+        assert clipping.location == (6, 6)
+    assert asyncio.run(parse_async()) == [clipping]
+    all_clippings = list(
+        parse_my_clippings(clippings_file, normalization=normalization)
+    )
+    assert list(filter_clippings(all_clippings, clipping_filter, normalization)) == [
+        clipping
+    ]
+
+
+GERMAN = """Der Process (Franz Kafka)
+- Ihre Markierung auf Seite 12 | Position 170-171 | Hinzugefügt am Dienstag, 5. Mai 2020 23:26:59
+
+Jemand musste Josef K. verleumdet haben.
+==========
+Der Process (Franz Kafka)
+- Ihre Notiz bei Position 171 | Hinzugefügt am Donnerstag, 12. März 2020 08:01:02
+
+Verhaftet
+==========
+"""
+
+
+@pytest.fixture
+def german_clippings_file(tmp_path):
+    file = tmp_path / "My Clippings.txt"
+    file.write_text(GERMAN, encoding="utf-8")
+    return file
+
+
+@pytest.mark.parametrize(
+    "since, expected", [(datetime(2020, 1, 1), 2), (datetime(2020, 4, 1), 1)]
+)
+def test_filter_german_clippings_since(german_clippings_file, since, expected):
+    clippings = list(
+        parse_my_clippings(
+            german_clippings_file, clipping_filter=ClippingFilter(since=since)
+        )
+    )
+    assert len(clippings) == expected
+    assert clippings[0].content == "Jemand musste Josef K. verleumdet haben."
+
+
+def test_clipping_filter_matches():
+    book = Book(author="Anne Frank", title="Dziennik")
+    timestamp = "Wednesday, 3 February 2021 23:00:55"
+    assert ClippingFilter(book="DZIEN").matches(book, "Note", timestamp)
+    assert not ClippingFilter().matches(book, "Bookmark", timestamp)
+    assert not ClippingFilter(author="Dziennik").matches(book, "Note", timestamp)
+    assert not ClippingFilter(since=datetime(2021, 1, 1)).matches(book, "Note", "?")
+    assert ClippingFilter(book="Dziennik").may_match_title_line("Dziennik (Anne Frank)")
+    assert not ClippingFilter(author="Herbert").may_match_title_line("Dune (Frank)")
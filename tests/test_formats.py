@@ -0,0 +1,164 @@
+# Same module as used by kindle_parser, not a copy imported as `src.formats`
+from src.kindle_parser import formats, parse_clipping, parse_my_clippings
+from src import kindle_parser
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+import json
+import multiprocessing
+import pytest
+import unicodedata
+
+
+def nfkd(text: str) -> str:
+    # Clippings are normalized while they are read from the file
+    return unicodedata.normalize("NFKD", text)
+
+
+def test_german_clipping():
+    clipping = parse_clipping(
+        nfkd(
+            "Der Process (Franz Kafka)\n"
+            "- Ihre Markierung auf Seite 12 | Position 170-171 | "
+            "Hinzugefügt am Dienstag, 5. Mai 2020 23:26:59\n\n"
+            "Jemand musste Josef K. verleumdet haben.\n"
+        )
+    )
+    assert clipping.book.author == "Franz Kafka"
+    assert clipping.clipping_type == "Highlight"
+    assert clipping.location == (170, 171)
+    assert clipping.page == 12
+    assert clipping.timestamp == nfkd("Dienstag, 5. Mai 2020 23:26:59")
+
+
+@pytest.mark.parametrize("normalization", ["NFC", "NFD", None])
+def test_german_clipping_other_normalization(normalization):
+    text = (
+        "Der Process (Franz Kafka)\n"
+        "- Ihre Notiz bei Position 171 | Hinzugefügt am Dienstag\n\n"
+        "Schön\n"
+    )
+    if normalization:
+        text = unicodedata.normalize(normalization, text)
+    clipping = parse_clipping(text, normalization)
+    assert clipping.clipping_type == "Note"
+    assert clipping.content == text.split("\n")[3]
+
+
+def test_italian_bookmark():
+    clipping = parse_clipping(
+        "Il nome della rosa (Umberto Eco)\n"
+        "- Il tuo segnalibro alla posizione 321 | "
+        "Aggiunto in data martedì 5 maggio 2020 23:26:59\n\n\n"
+    )
+    assert clipping.clipping_type == "Bookmark"
+    assert clipping.location == (321, 321)
+
+
+def test_unknown_clipping_type_of_translated_format():
+    with pytest.raises(ValueError):
+        parse_clipping(
+            "Der Process (Franz Kafka)\n"
+            "- Ihre Unbekannt bei Position 170 | Hinzugefügt am Dienstag\n\n"
+            "Jemand\n"
+        )
+
+
+def test_load_format(tmp_path):
+    format_file = tmp_path / "format.json"
+    format_file.write_text(
+        json.dumps(
+            {
+                "name": "kindle_es",
+                "prefixes": ["- Tu "],
+                "clipping_types": {"subrayado": "Highlight", "nota": "Note"},
+                "at_location": "en la posición ",
+                "on_page": "en la página ",
+                "location_separator": " | posición ",
+                "timestamp_separator": " | Añadido el ",
+                "timestamp_format": {
+                    "pattern": "{weekday}, {day} de {month} de {year} {time}",
+                    "weekdays": [
+                        "lunes",
+                        "martes",
+                        "miércoles",
+                        "jueves",
+                        "viernes",
+                        "sábado",
+                        "domingo",
+                    ],
+                    "months": [
+                        "enero",
+                        "febrero",
+                        "marzo",
+                        "abril",
+                        "mayo",
+                        "junio",
+                        "julio",
+                        "agosto",
+                        "septiembre",
+                        "octubre",
+                        "noviembre",
+                        "diciembre",
+                    ],
+                },
+            }
+        ),
+        encoding="utf-8",
+    )
+    formats.load_format(format_file)
+    try:
+        clipping = parse_clipping(
+            nfkd(
+                "Rayuela (Julio Cortázar)\n"
+                "- Tu subrayado en la posición 6-7 | "
+                "Añadido el martes, 5 de mayo de 2020 23:26:59\n\n"
+                "¿Encontraría a la Maga?\n"
+            )
+        )
+        time = formats.timestamps.parse_timestamp(clipping.timestamp)
+    finally:
+        del formats.FORMATS["kindle_es"]
+        del formats.timestamps.TIMESTAMP_FORMATS["kindle_es"]
+        for prefixes in formats._PREFIXES.values():
+            del prefixes["- Tu "]
+    assert clipping.clipping_type == "Highlight"
+    assert clipping.location == (6, 7)
+    assert time == datetime(2020, 5, 5, 23, 26, 59)
+
+
+def test_registered_format_in_spawned_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        kindle_parser,
+        "ProcessPoolExecutor",
+        partial(ProcessPoolExecutor, mp_context=multiprocessing.get_context("spawn")),
+    )
+    clippings_file = tmp_path / "My Clippings.txt"
+    clippings_file.write_text(
+        "Rayuela (Julio Cortázar)\n"
+        "- Tu subrayado en la posición 6-7 | Añadido el martes\n\n"
+        "¿Encontraría a la Maga?\n"
+        "==========\n" * 3,
+        encoding="utf-8",
+    )
+    formats.register_format(
+        formats.ReaderFormat(
+            "kindle_es",
+            prefixes=("- Tu ",),
+            clipping_types={"subrayado": "Highlight"},
+            at_location="en la posición ",
+            timestamp_separator=" | Añadido el ",
+        )
+    )
+    try:
+        clippings = list(parse_my_clippings(clippings_file, jobs=2))
+    finally:
+        del formats.FORMATS["kindle_es"]
+        for prefixes in formats._PREFIXES.values():
+            del prefixes["- Tu "]
+    assert [clipping.location for clipping in clippings] == [(6, 7)] * 3
+
+
+def test_conflicting_prefix():
+    with pytest.raises(ValueError):
+        formats.register_format(formats.ReaderFormat("other", prefixes=("- Your ",)))
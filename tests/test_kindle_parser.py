@@ -1,4 +1,5 @@
 import pytest
+from src import kindle_parser
 from src.kindle_parser import (
     parse_clipping,
     parse_my_clippings,
@@ -6,7 +7,11 @@ from src.kindle_parser import (
     dump_book_to_markdown,
 )
 from src.clipping import Clipping, Book
-from dataclasses import asdict
+import os
+import unicodedata
+import zipfile
+from dataclasses import asdict, replace
+from pathlib import Path
 
 
 @pytest.mark.parametrize(
@@ -343,3 +348,226 @@ def test_dump_book_to_markdown_file_list(tmp_path):
 
 
 # TODO: Add test case for verification of created file's content
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1024 * 1024])
+def test_parse_my_clippings_chunk_size(chunk_size):
+    file_location = "tests/resources/My Clippings - example.txt"
+    expected = [asdict(clipping) for clipping in parse_my_clippings(file_location)]
+    result = [
+        asdict(clipping)
+        for clipping in parse_my_clippings(file_location, chunk_size=chunk_size)
+    ]
+    assert result == expected
+
+
+def test_parse_my_clippings_crlf(tmp_path):
+    source = Path("tests/resources/My Clippings - example.txt")
+    crlf_file = tmp_path / "My Clippings.txt"
+    crlf_file.write_bytes(b"\xef\xbb\xbf" + source.read_bytes().replace(b"\n", b"\r\n"))
+    expected = [asdict(clipping) for clipping in parse_my_clippings(source)]
+    assert [asdict(clipping) for clipping in parse_my_clippings(crlf_file)] == expected
+
+
+@pytest.mark.parametrize(
+    "raw",
+    [
+        b"Plain ASCII (Author)\r\n",
+        "\ufeffMały Książę (Antoine de Saint-Exupéry)\r\n".encode(),
+        "\ufeff\u201cQuoted\u201d (Author)\n".encode(),
+        "e\u0301\ufeff\u0316 ﬁ".encode(),
+    ],
+)
+@pytest.mark.parametrize("normalization", ["NFC", "NFKD", None])
+def test_decode_clipping_normalization(raw, normalization):
+    text = raw.decode().replace("\r\n", "\n")
+    if normalization:
+        text = unicodedata.normalize(normalization, text)
+    decoded = kindle_parser._decode_clipping(raw, normalization)
+    assert decoded == text.replace("\ufeff", "")
+
+
+def test_parse_clipping_title_with_parentheses():
+    clipping = parse_clipping(
+        """Dune (Dune Chronicles, Book 1) (Frank Herbert)
+- Your Highlight at location 84-85 | Added on Sunday, 2 May 2021 10:11:12
+
+Fear is the mind-killer."""
+    )
+    assert asdict(clipping.book) == {
+        "author": "Frank Herbert",
+        "title": "Dune (Dune Chronicles, Book 1)",
+    }
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "Some title\n",
+        "Dziennik (Anne Frank)\n- Your Note on page x | Added on Monday\n\nNote",
+        "Dziennik (Anne Frank)\n- Your Note at location 1 | Added on Monday\nNote",
+        "Dziennik\n- Your Highlight at location 6-7 | Added on Monday\n\nText",
+        "Dziennik (Anne Frank)\n- Your Note on page 1 | position 5 | Added on X\n\nA",
+    ],
+)
+def test_parse_clipping_unknown_format(text):
+    with pytest.raises(ValueError):
+        parse_clipping(text)
+
+
+@pytest.mark.parametrize("jobs", [2, 3])
+def test_parse_my_clippings_in_parallel(tmp_path, monkeypatch, jobs):
+    source = Path("tests/resources/My Clippings - example.txt")
+    big_file = tmp_path / "My Clippings.txt"
+    big_file.write_bytes((source.read_bytes().rstrip() + b"\n==========\n") * 50)
+    monkeypatch.setattr(kindle_parser, "SHARD_SIZE", 1000)
+
+    expected = [asdict(clipping) for clipping in parse_my_clippings(big_file)]
+    result = [asdict(clipping) for clipping in parse_my_clippings(big_file, jobs=jobs)]
+    assert len(result) == 150
+    assert result == expected
+
+
+def test_dump_book_to_markdown_skips_unchanged(tmp_path):
+    clippings = list(parse_my_clippings("tests/resources/My Clippings - example.txt"))
+    note = Clipping(
+        book=Book(author="Marek Aureliusz", title="Rozmyślania"),
+        clipping_type="Note",
+        timestamp="Thursday, 28 January 2021 15:26:14",
+        content="Swietna mantra",
+        location=(736, 736),
+        page=48,
+    )
+    summary = dump_book_to_markdown(sort_clippings(clippings + [note]), tmp_path)
+    assert (summary.written, summary.skipped) == (2, 0)
+
+    book_file = tmp_path / "Anne Frank - Dziennik.md"
+    os.utime(book_file, ns=(0, 0))
+    changed_note = replace(note, content="Swietna mantra!")
+    summary = dump_book_to_markdown(
+        sort_clippings(clippings + [changed_note]), tmp_path
+    )
+    assert (summary.written, summary.skipped) == (1, 1)
+    assert book_file.stat().st_mtime_ns == 0
+    assert (
+        "Swietna mantra!" in (tmp_path / "Marek Aureliusz - Rozmyślania.md").read_text()
+    )
+
+    book_file.unlink()
+    summary = dump_book_to_markdown(sort_clippings(clippings), tmp_path)
+    assert (summary.written, summary.skipped) == (1, 0)
+
+
+@pytest.mark.parametrize(
+    "order, expected",
+    [
+        ("location", ["b", "c", "a", "d"]),
+        ("page", ["c", "b", "a", "d"]),
+        ("time", ["a", "b", "c", "d"]),
+    ],
+)
+def test_order_clippings(order, expected):
+    book = Book(author="Anne Frank", title="Dziennik")
+    clippings = [
+        Clipping(
+            book, "Note", "Friday, 5 February 2021 10:00:00", "a", (None, None), 3
+        ),
+        Clipping(book, "Note", "Friday, 5 February 2021 10:00:01", "b", (20, 21), 2),
+        Clipping(book, "Note", "Friday, 5 February 2021 12:00:00", "c", (30, 30), 1),
+        Clipping(book, "Note", "unknown", "d", (None, None), None),
+    ]
+    result = kindle_parser.order_clippings({book: clippings}, order)
+    assert [clipping.content for clipping in result[book]] == expected
+
+    with pytest.raises(ValueError):
+        kindle_parser.order_clippings({book: clippings}, "title")
+
+
+def test_render_book_first_and_last_note():
+    book = Book(author="Anne Frank", title="Dziennik")
+    clippings = [
+        Clipping(book, "Note", "Friday, 5 February 2021 12:00:00", "a", (1, 1)),
+        Clipping(book, "Note", "Friday, 5 February 2021 10:00:00", "b", (2, 2)),
+        Clipping(book, "Note", "Friday, 5 February 2021 11:00:00", "c", (3, 3)),
+    ]
+    assert kindle_parser.render_book(book, clippings).splitlines()[2:4] == [
+        "**First note**: Friday, 5 February 2021 10:00:00",
+        "**Last note**: Friday, 5 February 2021 12:00:00",
+    ]
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_dump_book_to_markdown_workers(tmp_path, workers):
+    clippings = [
+        Clipping(
+            book=Book(author=f"Author {number % 7}", title=f"Title {number % 7}"),
+            clipping_type="Highlight",
+            timestamp="Tuesday, 5 May 2020 23:26:59",
+            content=f"Highlight {number}",
+            location=(number, number),
+        )
+        for number in range(50)
+    ]
+    mapping = sort_clippings(clippings)
+    summary = dump_book_to_markdown(mapping, tmp_path, workers=workers)
+
+    assert summary.written == 7
+    assert sorted(path.name for path in tmp_path.glob("*.md")) == sorted(
+        f"{book}.md" for book in mapping
+    )
+    assert not list(tmp_path.glob("*.tmp"))
+    for book, book_clippings in mapping.items():
+        assert (tmp_path / f"{book}.md").read_text(
+            encoding="utf-8"
+        ) == kindle_parser.render_book(book, book_clippings)
+
+
+def test_dump_book_to_markdown_missing_directory(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        dump_book_to_markdown({}, tmp_path / "missing")
+
+
+@pytest.mark.parametrize(
+    "module, name",
+    [("gzip", "clippings.txt.gz"), ("bz2", "clippings.bz2"), ("lzma", "clippings")],
+)
+def test_parse_my_clippings_compressed(tmp_path, module, name):
+    source = Path("tests/resources/My Clippings - example.txt")
+    compressed_file = tmp_path / name
+    compressed_file.write_bytes(__import__(module).compress(source.read_bytes()))
+    expected = [asdict(clipping) for clipping in parse_my_clippings(source)]
+    for jobs in (1, 2):
+        result = parse_my_clippings(compressed_file, chunk_size=16, jobs=jobs)
+        assert [asdict(clipping) for clipping in result] == expected
+
+
+def test_dump_book_to_markdown_zip(tmp_path):
+    clippings = list(parse_my_clippings("tests/resources/My Clippings - example.txt"))
+    mapping = sort_clippings(clippings)
+    archive_file = tmp_path / "vault.zip"
+    archive_file.write_bytes(b"old archive")
+
+    summary = dump_book_to_markdown(mapping, archive_file)
+    assert summary.written == 1
+    with zipfile.ZipFile(archive_file) as archive:
+        assert archive.namelist() == ["Anne Frank - Dziennik.md"]
+        assert archive.read("Anne Frank - Dziennik.md").decode(
+            "utf-8"
+        ) == kindle_parser.render_book(*next(iter(mapping.items())))
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["vault.zip"]
+
+
+@pytest.mark.parametrize("umask, expected", [(0o022, 0o644), (0o077, 0o600)])
+def test_dump_book_to_markdown_file_mode(tmp_path, umask, expected):
+    mapping = sort_clippings(
+        parse_my_clippings("tests/resources/My Clippings - example.txt")
+    )
+    previous = os.umask(umask)
+    try:
+        dump_book_to_markdown(mapping, tmp_path)
+        dump_book_to_markdown(mapping, tmp_path / "vault.zip")
+    finally:
+        os.umask(previous)
+    for name in ("Anne Frank - Dziennik.md", "vault.zip"):
+        assert (tmp_path / name).stat().st_mode & 0o777 == expected
@@ -0,0 +1,62 @@
+from src.clipping import Book, Clipping
+from src.merge import kindle_parser, merge_clippings, merge_my_clippings
+from pathlib import Path
+import pytest
+
+BOOK = Book(author="Antoine de Saint-Exupery", title="Mały Książę")
+
+
+def clipping(content, timestamp, location=(6, 6)):
+    return Clipping(
+        book=BOOK,
+        clipping_type="Highlight",
+        timestamp=f"Tuesday, 5 May 2020 {timestamp}",
+        content=content,
+        location=location,
+        page=None,
+    )
+
+
+def test_merge_clippings():
+    paperwhite = [
+        clipping("Wszyscy dorośli", "10:00:00"),
+        clipping("Idąc prosto", "12:00:00", (86, 86)),
+    ]
+    oasis = [
+        clipping("Wszyscy dorośli", "09:00:00"),
+        clipping("Wszyscy dorośli", "11:00:00", (7, 7)),
+        clipping("Idąc prosto", "13:00:00", (86, 86)),
+    ]
+    result = list(merge_clippings([paperwhite, oasis]))
+    assert result == [oasis[0], oasis[1], paperwhite[1]]
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_merge_my_clippings(tmp_path, jobs, monkeypatch):
+    # Files are split into many shards, parsed by a single shared pool
+    monkeypatch.setattr(kindle_parser, "SHARD_SIZE", 64)
+    pools = []
+    create_parser_pool = kindle_parser.create_parser_pool
+
+    def counted_pool(jobs):
+        pools.append(jobs)
+        return create_parser_pool(jobs)
+
+    monkeypatch.setattr(kindle_parser, "create_parser_pool", counted_pool)
+    source = Path("tests/resources/My Clippings - example.txt")
+    clippings = source.read_text(encoding="utf-8").split("==========\n")
+    first = tmp_path / "first.txt"
+    first.write_text("==========\n".join(clippings[:2]), encoding="utf-8")
+    second = tmp_path / "second.txt"
+    second.write_text("==========\n".join(clippings[1:]), encoding="utf-8")
+
+    result = [
+        (merged.clipping_type, merged.location)
+        for merged in merge_my_clippings([second, first], jobs=jobs)
+    ]
+    assert result == [
+        ("Note", (1194, 1194)),
+        ("Highlight", (1224, 1227)),
+        ("Note", (1226, 1226)),
+    ]
+    assert pools == ([2] if jobs > 1 else [])
@@ -0,0 +1,53 @@
+from src import parse_cache
+from src.parse_cache import parse_my_clippings_cached
+from src.kindle_parser import parse_my_clippings
+from dataclasses import asdict
+from pathlib import Path
+import os
+import pytest
+import shutil
+
+
+@pytest.fixture
+def clippings_file(tmp_path):
+    file_location = tmp_path / "My Clippings.txt"
+    shutil.copy(Path("tests/resources/My Clippings - example.txt"), file_location)
+    return file_location
+
+
+def parse(file_location, cache_file):
+    return [
+        asdict(clipping)
+        for clipping in parse_my_clippings_cached(file_location, cache_file)
+    ]
+
+
+def test_cache_hit_skips_parsing(clippings_file, tmp_path, monkeypatch):
+    cache_file = tmp_path / "clippings.cache"
+    expected = [asdict(clipping) for clipping in parse_my_clippings(clippings_file)]
+    assert parse(clippings_file, cache_file) == expected
+
+    def fail(*args, **kwargs):
+        raise AssertionError("file should not be parsed")
+
+    monkeypatch.setattr(parse_cache.kindle_parser, "parse_my_clippings", fail)
+    assert parse(clippings_file, cache_file) == expected
+    # Touched file with the same content is still cached
+    os.utime(clippings_file, ns=(0, 0))
+    assert parse(clippings_file, cache_file) == expected
+
+
+def test_cache_is_rebuilt(clippings_file, tmp_path):
+    cache_file = tmp_path / "clippings.cache"
+    parse(clippings_file, cache_file)
+
+    # Same size, different content
+    content = clippings_file.read_text(encoding="utf-8")
+    clippings_file.write_text(content.replace("zydach", "Zydach"), encoding="utf-8")
+    os.utime(clippings_file, ns=(0, 0))
+    assert parse(clippings_file, cache_file)[-1]["content"].endswith("Zydach")
+
+    cache_file.write_bytes(cache_file.read_bytes()[:-10])
+    assert len(parse(clippings_file, cache_file)) == 3
+    assert parse_cache.load_cache(cache_file, clippings_file) is not None
+    assert parse_cache.load_cache(cache_file, clippings_file, "NFC") is None
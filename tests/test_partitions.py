@@ -0,0 +1,68 @@
+from src.kindle_parser import (
+    dump_book_to_markdown,
+    order_clippings,
+    parse_my_clippings,
+    sort_clippings,
+)
+from src.partitions import group_clippings
+from dataclasses import asdict
+from pathlib import Path
+import pytest
+
+
+def as_dicts(mapping):
+    return {
+        str(book): [asdict(clipping) for clipping in clippings]
+        for book, clippings in mapping.items()
+    }
+
+
+@pytest.fixture
+def big_file(tmp_path):
+    source = Path("tests/resources/My Clippings - example.txt")
+    big_file = tmp_path / "My Clippings.txt"
+    big_file.write_bytes((source.read_bytes().rstrip() + b"\n==========\n") * 20)
+    return big_file
+
+
+@pytest.mark.parametrize("memory_limit", [1, 5000, 10**9])
+def test_group_clippings(big_file, tmp_path, memory_limit):
+    expected = sort_clippings(parse_my_clippings(big_file))
+    with group_clippings(
+        parse_my_clippings(big_file), memory_limit, tmp_path
+    ) as grouped:
+        assert as_dicts(grouped) == as_dicts(expected)
+        assert as_dicts(order_clippings(grouped, "time")) == as_dicts(
+            order_clippings(expected, "time")
+        )
+    assert not grouped.directory.exists()
+
+
+def test_dump_partitioned_clippings(big_file, tmp_path):
+    expected_dir = tmp_path / "expected"
+    expected_dir.mkdir()
+    dump_book_to_markdown(
+        order_clippings(sort_clippings(parse_my_clippings(big_file))), expected_dir
+    )
+    result_dir = tmp_path / "result"
+    result_dir.mkdir()
+    with group_clippings(parse_my_clippings(big_file), 1) as grouped:
+        dump_book_to_markdown(order_clippings(grouped), result_dir)
+
+    for expected_file in expected_dir.glob("*.md"):
+        assert (result_dir / expected_file.name).read_text(
+            encoding="utf-8"
+        ) == expected_file.read_text(encoding="utf-8")
+
+
+def test_group_clippings_removes_partitions_on_error(big_file, tmp_path):
+    partitions_dir = tmp_path / "partitions"
+    partitions_dir.mkdir()
+
+    def failing_clippings():
+        yield from parse_my_clippings(big_file)
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        group_clippings(failing_clippings(), 1, partitions_dir)
+    assert not list(partitions_dir.iterdir())
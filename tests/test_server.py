@@ -0,0 +1,123 @@
+from src import server as server_module
+from src.server import ClippingCache, ClippingServer
+import gzip
+import json
+import pytest
+import shutil
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+# Example file does not end with separator
+NEW_CLIPPING = """==========
+Dziennik (Anne Frank)
+- Your Highlight on page 81 | location 1230-1231 | Added on Wednesday, 3 February 2021 23:10:00
+
+Nowy fragment
+"""
+
+
+@pytest.fixture
+def clippings_file(tmp_path):
+    file_location = tmp_path / "My Clippings.txt"
+    shutil.copy(Path("tests/resources/My Clippings - example.txt"), file_location)
+    return file_location
+
+
+@pytest.fixture
+def server(clippings_file):
+    server = ClippingServer(("127.0.0.1", 0), ClippingCache(clippings_file))
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+    )
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def get(server, path):
+    url = f"http://127.0.0.1:{server.server_port}{path}"
+    with urllib.request.urlopen(url) as response:
+        return response.read().decode("utf-8")
+
+
+def test_serve_books_and_clippings(server):
+    assert json.loads(get(server, "/books")) == [
+        {"author": "Anne Frank", "title": "Dziennik", "count": 3}
+    ]
+    clippings = json.loads(get(server, "/clippings?author=Anne+Frank&title=Dziennik"))
+    assert [clipping["location"] for clipping in clippings] == [
+        [1194, 1194],
+        [1224, 1227],
+        [1226, 1226],
+    ]
+    markdown = get(server, "/markdown?author=Anne%20Frank&title=Dziennik")
+    assert markdown.startswith("# Anne Frank - Dziennik\n")
+
+
+@pytest.mark.parametrize("path", ["/other", "/clippings?title=Dziennik"])
+def test_serve_not_found(server, path):
+    with pytest.raises(urllib.error.HTTPError) as error:
+        get(server, path)
+    assert error.value.code == 404
+
+
+def test_cache_reloads_changed_file(server, clippings_file):
+    cache = server.cache
+    snapshot = cache.get()
+    with open(clippings_file, "a", encoding="utf-8") as file:
+        file.write(NEW_CLIPPING)
+
+    deadline = time.monotonic() + 5
+    while cache.get() is snapshot and time.monotonic() < deadline:
+        time.sleep(0.01)
+    (clippings,) = cache.get().mapping.values()
+    assert [clipping.content for clipping in clippings][-1] == "Nowy fragment"
+    assert "Nowy fragment" in get(server, "/markdown?author=Anne+Frank&title=Dziennik")
+
+
+def test_cache_rejects_compressed_file(tmp_path):
+    file_location = tmp_path / "My Clippings.txt.gz"
+    file_location.write_bytes(
+        gzip.compress(Path("tests/resources/My Clippings - example.txt").read_bytes())
+    )
+    with pytest.raises(ValueError):
+        ClippingCache(file_location)
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_cache_keeps_reload_error(server, clippings_file, monkeypatch):
+    cache = server.cache
+    calls = []
+    parse = server_module.checkpoint.parse_my_clippings_incrementally
+
+    def counted_parse(*args):
+        calls.append(args)
+        return parse(*args)
+
+    monkeypatch.setattr(
+        server_module.checkpoint, "parse_my_clippings_incrementally", counted_parse
+    )
+    content = clippings_file.read_bytes()
+    with open(clippings_file, "a", encoding="utf-8") as file:
+        file.write("==========\nDziennik (Anne Frank)\n- Your Note on page x\n\n")
+
+    deadline = time.monotonic() + 5
+    while cache.get() and cache.error is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert "ValueError" in json.loads(get(server, "/status"))["error"]
+    assert len(json.loads(get(server, "/books"))) == 1
+    assert len(calls) == 1
+
+    # File is replaced at once, so it is never parsed while truncated
+    fixed_file = clippings_file.with_suffix(".fixed")
+    fixed_file.write_bytes(content)
+    fixed_file.replace(clippings_file)
+    deadline = time.monotonic() + 5
+    while cache.get() and cache.error is not None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert json.loads(get(server, "/status")) == {"books": 1, "error": None}
+    assert len(calls) == 2
@@ -0,0 +1,62 @@
+# Same module as used by kindle_parser, not a copy imported as `src.stats`
+from src.kindle_parser import (
+    dump_book_to_markdown,
+    parse_my_clippings,
+    sort_clippings,
+    stats,
+)
+import json
+import time
+
+
+def test_collect_pipeline_stats(tmp_path):
+    assert stats.ACTIVE is None
+    with stats.collect() as collected:
+        mapping = sort_clippings(
+            parse_my_clippings("tests/resources/My Clippings - example.txt")
+        )
+        dump_book_to_markdown(mapping, tmp_path)
+    assert stats.ACTIVE is None
+
+    assert collected.counters["clippings parsed"] == 3
+    assert collected.counters["shape: on page | location"] == 3
+    assert collected.counters["bookmarks skipped"] == 0
+    assert collected.counters["books written"] == 1
+    assert collected.counters["bytes written"] == len(
+        (tmp_path / "Anne Frank - Dziennik.md").read_bytes()
+    )
+    assert set(collected.timers) >= {
+        "read and split",
+        "decode and normalize",
+        "parse_clipping",
+        "sort_clippings",
+        "render",
+        "dump_book_to_markdown",
+    }
+    assert json.loads(collected.format("json"))["counters"] == collected.counters
+    assert "clippings parsed" in collected.format()
+
+
+def test_collect_stats_of_parser_workers():
+    with stats.collect() as collected:
+        clippings = list(
+            parse_my_clippings("tests/resources/My Clippings - example.txt", jobs=2)
+        )
+    assert collected.counters["clippings parsed"] == len(clippings) == 3
+    assert collected.counters["shape: on page | location"] == 3
+    assert {"read and split", "parse_clipping"} <= set(collected.timers)
+
+
+def test_nested_timers_measure_self_time():
+    collected = stats.Stats()
+    with collected.timer("outer"):
+        with collected.timer("inner"):
+            time.sleep(0.02)
+    assert collected.timers["inner"] >= 0.02
+    assert collected.timers["outer"] < 0.01
+
+
+def test_disabled_stats():
+    with stats.timer("stage"):
+        stats.count("counter")
+    assert stats.ACTIVE is None
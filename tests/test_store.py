@@ -0,0 +1,134 @@
+from src.store import (
+    get_book_clippings,
+    get_books,
+    get_clippings_between,
+    get_clippings_by_type,
+    ingest_clippings,
+    load_books,
+    open_store,
+    search_clippings,
+    tokenize,
+)
+from src.kindle_parser import parse_my_clippings, sort_clippings
+from src.clipping import Book, Clipping
+from dataclasses import asdict, replace
+from datetime import datetime
+import pytest
+
+BOOKMARK = Clipping(
+    book=Book(author="", title="Market barriers towards electric boats"),
+    clipping_type="Bookmark",
+    timestamp="Friday, 30 October 2020 15:01:17",
+    content="",
+    location=(None, None),
+    page=1,
+)
+
+
+@pytest.fixture
+def connection():
+    connection = open_store(":memory:")
+    clippings = list(parse_my_clippings("tests/resources/My Clippings - example.txt"))
+    ingest_clippings(connection, clippings + [BOOKMARK], batch_size=2)
+    yield connection
+    connection.close()
+
+
+def test_ingest_clippings_deduplicates(connection):
+    clippings = list(parse_my_clippings("tests/resources/My Clippings - example.txt"))
+    assert ingest_clippings(connection, clippings + [BOOKMARK]) == 0
+    assert ingest_clippings(connection, [replace(BOOKMARK, page=2)]) == 1
+    assert len(get_books(connection)) == 2
+
+
+def test_get_book_clippings(connection):
+    clippings = get_book_clippings(connection, Book("Anne Frank", "Dziennik"))
+    expected = parse_my_clippings("tests/resources/My Clippings - example.txt")
+    assert [asdict(clipping) for clipping in clippings] == [
+        asdict(clipping) for clipping in expected
+    ]
+    assert get_book_clippings(connection, Book("Anne Frank", "Other")) == []
+
+
+def test_get_clippings_between(connection):
+    clippings = get_clippings_between(
+        connection, datetime(2021, 2, 3, 23, 1), datetime(2021, 2, 3, 23, 5, 1)
+    )
+    assert [clipping.timestamp for clipping in clippings] == [
+        "Wednesday, 3 February 2021 23:04:43"
+    ]
+
+
+def test_get_clippings_by_type(connection):
+    assert [
+        clipping.content for clipping in get_clippings_by_type(connection, "Note")
+    ] == [
+        "Ciekawe jakie to standardy wymusily te karteczki na zywnosc",
+        "Absolutne zaprzeczenie stereotypu o zydach",
+    ]
+    assert [
+        asdict(clipping) for clipping in get_clippings_by_type(connection, "Bookmark")
+    ] == [asdict(BOOKMARK)]
+
+
+def test_load_books(connection):
+    expected = {
+        (book.author, book.title): [asdict(clipping) for clipping in clippings]
+        for book, clippings in sort_clippings(
+            parse_my_clippings("tests/resources/My Clippings - example.txt")
+        ).items()
+    }
+    for books in [None, [Book("Anne Frank", "Dziennik"), BOOKMARK.book]]:
+        assert {
+            (book.author, book.title): [asdict(clipping) for clipping in clippings]
+            for book, clippings in load_books(connection, books).items()
+        } == expected
+
+
+def test_tokenize():
+    assert tokenize("Wszyscy DOROŚLI, byli-kiedyś!") == [
+        "wszyscy",
+        "dorosli",
+        "byli",
+        "kiedys",
+    ]
+
+
+def test_search_clippings(connection):
+    def search(query, **filters):
+        return [
+            clipping.location
+            for clipping in search_clippings(connection, query, **filters)
+        ]
+
+    assert search("mamy sie DOBRZE") == [(1224, 1227)]
+    assert search("po wojnie") == [(1224, 1227)]
+    assert search("zydach", author="frank", clipping_type="Note") == [(1226, 1226)]
+    assert search("zydach", clipping_type="Highlight") == []
+    assert search("zydach", book="Other") == []
+    assert search("zydach wojnie") == []
+    assert search("!!!") == []
+
+
+def test_search_index_is_updated(connection):
+    new_note = replace(BOOKMARK, clipping_type="Note", content="Nowe wojnie")
+    ingest_clippings(connection, [new_note])
+    assert len(search_clippings(connection, "wojnie")) == 2
+    assert len(search_clippings(connection, "wojnie", limit=1)) == 1
+
+
+def test_open_store_indexes_old_store(tmp_path):
+    database = tmp_path / "clippings.db"
+    connection = open_store(database)
+    ingest_clippings(
+        connection, parse_my_clippings("tests/resources/My Clippings - example.txt")
+    )
+    # Store created before search index was added
+    with connection:
+        connection.execute("DELETE FROM postings")
+        connection.execute("PRAGMA user_version = 0")
+    connection.close()
+
+    connection = open_store(database)
+    assert len(search_clippings(connection, "po wojnie")) == 1
+    connection.close()
@@ -0,0 +1,73 @@
+from src.clipping import Book, Clipping
+from src.templates import Template, compile_template, load_template
+from src.kindle_parser import parse_my_clippings, sort_clippings
+import json
+import pytest
+
+BOOK = Book(author="Marek Aureliusz", title="Rozmyślania")
+NOTE = Clipping(
+    book=BOOK,
+    clipping_type="Note",
+    timestamp="Thursday, 28 January 2021 15:26:14",
+    content="Swietna mantra",
+    location=(736, 736),
+    page=48,
+)
+
+
+def test_default_template():
+    mapping = sort_clippings(
+        parse_my_clippings("tests/resources/My Clippings - example.txt")
+    )
+    render = compile_template(Template())
+    for book, clippings in mapping.items():
+        expected = (
+            f"# {book}\n\n"
+            f"**First note**: {clippings[0].timestamp}\n"
+            f"**Last note**: {clippings[-1].timestamp}\n\n"
+            "## Notes & Highlights from Kindle\n\n"
+            + "".join(str(clipping) for clipping in clippings)
+        )
+        assert render(book, clippings) == expected
+
+
+def test_custom_template():
+    template = Template(
+        header="## {book.title} ({count})\n",
+        clippings={"Note": "* {clipping.content} (p. {clipping.page})\n"},
+    )
+    assert compile_template(template)(BOOK, [NOTE, NOTE]) == (
+        "## Rozmyślania (2)\n* Swietna mantra (p. 48)\n* Swietna mantra (p. 48)\n"
+    )
+
+
+def test_unknown_clipping_type():
+    render = compile_template(Template(clippings={"Highlight": "> x"}))
+    with pytest.raises(ValueError):
+        render(BOOK, [NOTE])
+
+
+@pytest.mark.parametrize(
+    "template",
+    [
+        Template(header="# {title}"),
+        Template(clippings={"Note": "- {content}"}),
+        Template(header="# {book"),
+    ],
+)
+def test_invalid_template(template):
+    with pytest.raises(ValueError):
+        compile_template(template)
+
+
+def test_load_template(tmp_path):
+    template_file = tmp_path / "template.json"
+    template_file.write_text(
+        json.dumps({"clippings": {"Highlight": '"{clipping.content}"\n'}})
+    )
+    template = load_template(template_file)
+    assert template.header == Template().header
+    assert template.clippings == {
+        "Note": "- {clipping.content}\n\n",
+        "Highlight": '"{clipping.content}"\n',
+    }
@@ -0,0 +1,52 @@
+# Same module as used by formats, with timestamps of German and Italian Kindle
+from src.kindle_parser import timestamps
+from src.timestamps import parse_timestamp
+from datetime import datetime
+import pytest
+import unicodedata
+
+
+@pytest.mark.parametrize(
+    "timestamp, expected",
+    [
+        ("Tuesday, 5 May 2020 23:26:59", datetime(2020, 5, 5, 23, 26, 59)),
+        ("Thursday, 28 January 2021 15:26:14", datetime(2021, 1, 28, 15, 26, 14)),
+        ("Tuesday, May 5, 2020 11:26:59 PM", datetime(2020, 5, 5, 23, 26, 59)),
+        ("Tuesday, 5 May 2020 08:00:00", datetime(2020, 5, 5, 8)),
+        ("yesterday", None),
+        ("", None),
+    ],
+)
+def test_parse_timestamp(timestamp, expected):
+    assert parse_timestamp(timestamp) == expected
+
+
+def test_parse_timestamp_is_cached():
+    parse_timestamp.cache_clear()
+    parse_timestamp("Friday, 30 October 2020 14:53:27")
+    parse_timestamp("Friday, 30 October 2020 14:53:27")
+    assert parse_timestamp.cache_info().hits == 1
+
+
+@pytest.mark.parametrize(
+    "timestamp, expected",
+    [
+        ("Dienstag, 5. Mai 2020 23:26:59", datetime(2020, 5, 5, 23, 26, 59)),
+        ("Donnerstag, 12. März 2020 08:01:02", datetime(2020, 3, 12, 8, 1, 2)),
+        ("martedì 5 maggio 2020 23:26:59", datetime(2020, 5, 5, 23, 26, 59)),
+        ("Dienstag, 5. Maggio 2020 23:26:59", None),
+        ("Dienstag, 31. Februar 2020 23:26:59", None),
+    ],
+)
+def test_parse_localized_timestamp(timestamp, expected):
+    assert timestamps.parse_timestamp(timestamp) == expected
+    # Timestamps are normalized while clippings are parsed
+    nfkd = unicodedata.normalize("NFKD", timestamp)
+    assert timestamps.parse_timestamp(nfkd) == expected
+
+
+def test_localized_timestamp_format_needs_all_names():
+    with pytest.raises(ValueError):
+        timestamps.LocalizedTimestampFormat(
+            "{weekday} {day} {month} {year} {time}", ("lundi",), ("janvier",)
+        )